@@ -1,20 +1,34 @@
 # back_end/Database/API/phones_API.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from back_end.Database.listing import RowStream
 from back_end.Database.phones import (
     create_phone, get_phones, list_phones, update_phone, delete_phone,
-    phones_not_stored, phones_by_condition, phone_stats, reassign_phone, regenerate_pid, phones_near_location
+    phones_not_stored, phones_by_condition, phone_stats, reassign_phone, regenerate_pid, phones_near_location,
+    free_slots_near_location, phones_in_box, import_phones, export_phones
 )
 
 phones_bp = Blueprint("phones", __name__)
 
 def handle_response(res):
     data, code = res if isinstance(res, tuple) else (res, 200)
+    if isinstance(data, RowStream):
+        # list endpoints: send rows as the cursor yields them instead of one big jsonify
+        response = Response(stream_with_context(data.render(current_app.json.dumps)),
+                            status=code, mimetype=data.mimetype)
+        response.call_on_close(data.close)
+        return response
     return jsonify(data), code
 
+def list_args():
+    return request.args.get("after"), request.args.get("limit"), request.args.get("fields")
+
+def atomic_arg():
+    return request.args.get("atomic", "").lower() in ("1", "true", "yes")
+
 # --- CRUD ---
 @phones_bp.route("/", methods=["GET"])
 def route_list_phones():
-    return handle_response(list_phones())
+    return handle_response(list_phones(*list_args()))
 
 @phones_bp.route("/<sid>", methods=["GET"])
 def route_get_phones(sid):
@@ -34,10 +48,20 @@ def route_update_phone(sid):
 def route_delete_phone(sid):
     return handle_response(delete_phone(sid))
 
+# --- Bulk ---
+@phones_bp.route("/import", methods=["POST"])
+def route_import_phones():
+    return handle_response(import_phones(request.get_data(), request.mimetype,
+                                         request.args.get("format"), atomic_arg()))
+
+@phones_bp.route("/export", methods=["GET"])
+def route_export_phones():
+    return handle_response(export_phones(request.args.get("format"), *list_args()))
+
 # --- Advanced ---
 @phones_bp.route("/not_stored", methods=["GET"])
 def route_phones_not_stored():
-    return handle_response(phones_not_stored())
+    return handle_response(phones_not_stored(*list_args()))
 
 @phones_bp.route("/condition/<cond>", methods=["GET"])
 def route_phones_by_condition(cond):
@@ -62,6 +86,24 @@ def api_phones_near_location():
     except Exception:
         return jsonify({"status": "error", "message": "Invalid x, y, or limit"}), 400
 
+@phones_bp.route("/free_nearby", methods=["GET"])
+def api_free_slots_near_location():
+    try:
+        x = int(request.args.get("x"))
+        y = int(request.args.get("y"))
+        limit = int(request.args.get("limit", 10))
+        return handle_response(free_slots_near_location(x, y, limit))
+    except Exception:
+        return jsonify({"status": "error", "message": "Invalid x, y, or limit"}), 400
+
+@phones_bp.route("/box", methods=["GET"])
+def api_phones_in_box():
+    try:
+        corners = [int(request.args.get(name)) for name in ("x1", "y1", "x2", "y2")]
+    except Exception:
+        return jsonify({"status": "error", "message": "Invalid x1, y1, x2, or y2"}), 400
+    return handle_response(phones_in_box(*corners, *list_args()))
+
 
 @phones_bp.route("/regenerate_pid/<sid>", methods=["PATCH"])
 def route_regenerate_pid(sid):
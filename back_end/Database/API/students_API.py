@@ -1,20 +1,33 @@
 # back_end/Database/API/students_API.py
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from back_end.Database.listing import RowStream
 from back_end.Database.students import (
     create_student, get_student, list_students, update_student, delete_student,
-    search_students, recently_modified_students
+    search_students, recently_modified_students, import_students, export_students
 )
 
 students_bp = Blueprint("students", __name__)
 
 def handle_response(res):
     data, code = res if isinstance(res, tuple) else (res, 200)
+    if isinstance(data, RowStream):
+        # list endpoints: send rows as the cursor yields them instead of one big jsonify
+        response = Response(stream_with_context(data.render(current_app.json.dumps)),
+                            status=code, mimetype=data.mimetype)
+        response.call_on_close(data.close)
+        return response
     return jsonify(data), code
 
+def list_args():
+    return request.args.get("after"), request.args.get("limit"), request.args.get("fields")
+
+def atomic_arg():
+    return request.args.get("atomic", "").lower() in ("1", "true", "yes")
+
 # --- CRUD ---
 @students_bp.route("/", methods=["GET"])
 def api_list_students():
-    return handle_response(list_students())
+    return handle_response(list_students(*list_args()))
 
 @students_bp.route("/<sid>", methods=["GET"])
 def api_get_student(sid):
@@ -34,11 +47,21 @@ def api_update_student(sid):
 def api_delete_student(sid):
     return handle_response(delete_student(sid))
 
+# --- Bulk ---
+@students_bp.route("/import", methods=["POST"])
+def api_import_students():
+    return handle_response(import_students(request.get_data(), request.mimetype,
+                                           request.args.get("format"), atomic_arg()))
+
+@students_bp.route("/export", methods=["GET"])
+def api_export_students():
+    return handle_response(export_students(request.args.get("format"), *list_args()))
+
 # --- Advanced ---
 @students_bp.route("/search", methods=["GET"])
 def api_search_students():
     query = request.args.get("q", "").strip()
-    return handle_response(search_students(query))
+    return handle_response(search_students(query, request.args.get("mode"), request.args.get("limit")))
 
 @students_bp.route("/recent", methods=["GET"])
 def api_recent_students():
@@ -0,0 +1,142 @@
+# back_end/Database/bulk.py
+# Bulk import plumbing shared by students.py and phones.py: CSV / NDJSON bodies in,
+# one multi-row INSERT per upload, and per-row errors out. Row numbers are the ones
+# the client sees: the data line in CSV (header excluded), the line in NDJSON.
+# Exports are listing.RowStream with fmt="csv" / "ndjson".
+import csv
+import io
+import json
+import psycopg2
+from psycopg2.extras import execute_values
+
+BULK_MAX_ROWS = 10000
+UPLOAD_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+def upload_format(mimetype, fmt=None):
+    """?format= wins over the Content-Type."""
+    fmt = (fmt or UPLOAD_FORMATS.get(mimetype) or "").lower()
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError("Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson")
+    return fmt
+
+
+def row_error(row, message):
+    return {"row": row, "message": str(message).strip()}
+
+
+def parse_upload(body, fmt):
+    """Raw body -> ([(row, dict)], [row errors]). Empty CSV cells become None."""
+    text = body.decode("utf-8-sig") if isinstance(body, bytes) else body
+    rows, errors = [], []
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        for n, record in enumerate(reader, 1):
+            if None in record:
+                errors.append(row_error(n, "More cells than header columns"))
+                continue
+            rows.append((n, {k.strip(): (v if v != "" else None) for k, v in record.items()}))
+    else:
+        for n, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                errors.append(row_error(n, f"Invalid JSON: {e}"))
+                continue
+            if not isinstance(record, dict):
+                errors.append(row_error(n, "Each line must be a JSON object"))
+                continue
+            rows.append((n, record))
+    if len(rows) + len(errors) > BULK_MAX_ROWS:
+        raise ValueError(f"Too many rows (max {BULK_MAX_ROWS} per upload)")
+    return rows, errors
+
+
+# ---------------- CELL VALUES ----------------
+def as_text(value, name, max_len=None, required=False):
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"{name} is required")
+        return None
+    value = str(value)
+    if max_len is not None and len(value) > max_len:
+        raise ValueError(f"{name} is longer than {max_len} characters")
+    return value
+
+
+def as_bool(value, name, default=False):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ("true", "t", "1", "yes", "y"):
+        return True
+    if text in ("false", "f", "0", "no", "n"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def as_point(value, name, bounds):
+    """[x, y] (or its JSON text, as CSV exports write it) inside 1..bounds."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise ValueError(f"{name} must be [x, y]")
+    if not (isinstance(value, list) and len(value) == 2 and all(isinstance(v, int) for v in value)):
+        raise ValueError(f"{name} must be [x, y]")
+    if not all(1 <= v <= limit for v, limit in zip(value, bounds)):
+        raise ValueError(f"{name} must be within 1..{bounds[0]} x 1..{bounds[1]}")
+    return value
+
+
+# ---------------- INSERT ----------------
+def insert_batch(cur, sql, values):
+    """
+    Runs `INSERT ... VALUES %s ON CONFLICT DO NOTHING RETURNING key, ...` for every value
+    in one statement. Returns ({key: returned row}, {value index: error}). If the statement
+    fails on something the caller's checks missed, the rows are retried one by one under
+    savepoints so only the offending rows are reported.
+    """
+    if not values:
+        return {}, {}
+    cur.execute("SAVEPOINT bulk_batch;")
+    try:
+        returned = execute_values(cur, sql, values, page_size=len(values), fetch=True)
+        cur.execute("RELEASE SAVEPOINT bulk_batch;")
+        return {row[0]: row for row in returned}, {}
+    except psycopg2.Error:
+        cur.execute("ROLLBACK TO SAVEPOINT bulk_batch;")
+
+    inserted, failed = {}, {}
+    for i, value in enumerate(values):
+        cur.execute("SAVEPOINT bulk_row;")
+        try:
+            for row in execute_values(cur, sql, [value], fetch=True):
+                inserted[row[0]] = row
+            cur.execute("RELEASE SAVEPOINT bulk_row;")
+        except psycopg2.Error as e:
+            cur.execute("ROLLBACK TO SAVEPOINT bulk_row;")
+            failed[i] = (e.diag.message_primary or str(e)).strip()
+    return inserted, failed
+
+
+def bulk_response(created, errors, committed=True):
+    """201 when every row went in, 207 when some did, 400 when none did."""
+    errors = sorted(errors, key=lambda e: e["row"])
+    data = {"inserted": len(created) if committed else 0, "created": created if committed else [], "errors": errors}
+    if not errors:
+        return {"status": "success", "data": data}, 201
+    if committed and created:
+        return {"status": "success", "data": data}, 207
+    return {"status": "error", "message": f"{len(errors)} row(s) rejected", "data": data}, 400
@@ -1,16 +1,268 @@
-from psycopg2 import pool
+import threading
+import time
+from collections import deque
+import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import connection as _pg_connection, TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+from back_end.stage_metrics import StageTimer
 
-db_pool = pool.SimpleConnectionPool(
-    1, 10,
-    host="localhost",
-    port=5432,
-    database="PhoneBoxDB",
-    user="admin",
-    password="admin"
-)
+DB_CONFIG = {
+    "host": "localhost",
+    "port": 5432,
+    "database": "PhoneBoxDB",
+    "user": "admin",
+    "password": "admin",
+}
 
-def get_conn():
-    return db_pool.getconn()
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 10
+ACQUIRE_TIMEOUT = 5.0    # seconds a caller waits for a free connection before PoolTimeout
+MAX_LIFETIME = 1800      # seconds before a connection is closed and replaced
+HEALTH_CHECK_IDLE = 30   # connections idle longer than this get a SELECT 1 before reuse
+
+
+class PoolTimeout(PoolError):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("event", "conn")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.conn = None
+
+    def hand_over(self, conn):
+        self.conn = conn
+        self.event.set()
+
+
+class PooledConnection(_pg_connection):
+    """psycopg2 connection that knows its age and which statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.prepared = set()
+        self.deallocate = False  # server-side statements went stale: DEALLOCATE ALL before the next PREPARE
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool (psycopg2's SimpleConnectionPool is not). Callers block up to
+    `acquire_timeout` when every connection is out; connections past `max_lifetime`
+    are recycled and long-idle ones are pinged before being handed out.
+    """
+
+    def __init__(self, minconn, maxconn, acquire_timeout=ACQUIRE_TIMEOUT,
+                 max_lifetime=MAX_LIFETIME, health_check_idle=HEALTH_CHECK_IDLE, **dsn):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self._dsn = dsn
+        self._lock = threading.Lock()
+        self._idle = []    # LIFO: the most recently used connection is the warmest
+        self._waiters = deque()
+        self._size = 0     # open connections plus slots being connected
+        self._in_use = 0
+        self.acquire_timer = StageTimer()
+        self.created = 0
+        self.timeouts = 0
+        self.expired = 0
+        self.unhealthy = 0
+        self.health_checks = 0
+
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self._dsn)
+        with self._lock:
+            self.created += 1
+        return conn
+
+    def _expired(self, conn):
+        return time.monotonic() - conn.created_at > self.max_lifetime
+
+    # ---------------- CHECKOUT ----------------
+    def getconn(self, timeout=None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        while True:
+            conn = self._checkout(start + timeout)
+            if conn is None:
+                # a slot was reserved: connect outside the lock
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif not self._healthy(conn):
+                with self._lock:
+                    self.unhealthy += 1
+                self._drop(conn)
+                continue
+            conn.last_used = time.monotonic()
+            self.acquire_timer.record((time.perf_counter() - start) * 1000)
+            return conn
+
+    def _checkout(self, deadline):
+        """An idle connection, or None if the caller may open a new one."""
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if conn.closed or self._expired(conn):
+                    self.expired += 1
+                    self._size -= 1
+                    conn.close()
+                    continue
+                self._in_use += 1
+                return conn
+            if self._size < self.maxconn:
+                self._size += 1
+                self._in_use += 1
+                return None
+            # queue up: returned connections go to the longest waiter first
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+
+        waiter.event.wait(max(0.0, deadline - time.perf_counter()))
+        with self._lock:
+            if not waiter.event.is_set():
+                self._waiters.remove(waiter)
+                self.timeouts += 1
+                raise PoolTimeout(f"No database connection free within {self.acquire_timeout}s")
+        return waiter.conn
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_idle:
+            return True
+        with self._lock:
+            self.health_checks += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ---------------- RETURN ----------------
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed and not self._expired(conn):
+            try:
+                if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()  # leave no transaction open between borrowers
+            except psycopg2.Error:
+                close = True
+            if not close:
+                with self._lock:
+                    if self._waiters:
+                        self._waiters.popleft().hand_over(conn)
+                    else:
+                        self._in_use -= 1
+                        self._idle.append(conn)
+                return
+        if self._expired(conn):
+            with self._lock:
+                self.expired += 1
+        self._drop(conn)
+
+    def _drop(self, conn):
+        try:
+            conn.close()
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().hand_over(None)  # the waiter opens a new connection
+            else:
+                self._size -= 1
+                self._in_use -= 1
+
+    def closeall(self):
+        with self._lock:
+            for conn in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle.clear()
+
+    def stats(self):
+        with self._lock:
+            size, idle, in_use = self._size, len(self._idle), self._in_use
+        return {"size": size, "idle": idle, "in_use": in_use, "max": self.maxconn,
+                "acquire": self.acquire_timer.snapshot(), "timeouts": self.timeouts,
+                "created": self.created, "expired": self.expired, "unhealthy": self.unhealthy,
+                "health_checks": self.health_checks}
+
+
+db_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    # created on first use so modules that import the data layer don't need a live database
+    global db_pool
+    if db_pool is None:
+        with _pool_lock:
+            if db_pool is None:
+                db_pool = ConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, **DB_CONFIG)
+    return db_pool
+
+def get_conn(timeout=None):
+    return _get_pool().getconn(timeout)
 
 def put_conn(conn):
-    db_pool.putconn(conn)
+    _get_pool().putconn(conn)
+
+def pool_stats():
+    return db_pool.stats() if db_pool is not None else None
+
+# ---------------- PREPARED STATEMENTS ----------------
+# name -> SQL with $1.. placeholders; each connection PREPAREs a statement on first use
+PREPARED = {}
+
+def prepared(name, sql):
+    PREPARED[name] = sql
+    return name
+
+def execute_prepared(cur, name, params=()):
+    """
+    EXECUTEs `name`, PREPAREing it on this connection first if needed. A schema change
+    (e.g. a column type swap) leaves prepared plans failing with "cached plan must not
+    change result type": the connection's statements are then deallocated and, if the
+    failed EXECUTE was the first statement of its transaction, retried once; otherwise
+    the error goes to the caller and the next use starts from a clean slate.
+    """
+    conn = cur.connection
+    fresh = conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+    try:
+        _execute_prepared(cur, conn, name, params)
+    except psycopg2.errors.FeatureNotSupported:
+        conn.prepared.clear()
+        conn.deallocate = True
+        if not fresh:
+            raise
+        conn.rollback()
+        _execute_prepared(cur, conn, name, params)
+
+
+def _execute_prepared(cur, conn, name, params):
+    if conn.deallocate:
+        cur.execute("DEALLOCATE ALL")
+        conn.deallocate = False
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {PREPARED[name]}")
+        conn.prepared.add(name)
+    if params:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(f"EXECUTE {name}")
@@ -0,0 +1,209 @@
+# back_end/Database/listing.py
+# Keyset-paginated, column-projected list queries streamed out STREAM_BATCH rows at a
+# time, so neither the database driver nor the API layer holds the whole table. Each
+# batch borrows a pool connection only for its own keyset query, so a slow client
+# holds no connection between chunks. Batches are separate snapshots, like pages the
+# client fetches with `after`. The API layers turn a RowStream into a chunked response:
+#   json    {"status": "success", "data": [...], "next_after": "<cursor or null>"}
+#   ndjson  one object per line (exports)
+#   csv     header line + one row per line (exports)
+import csv
+import io
+import json
+from dataclasses import fields as model_fields
+from datetime import datetime
+from back_end.Database.db import get_conn, put_conn
+from back_end.embeddings import embed_to_base64
+
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH = 500  # rows per keyset query and per response chunk
+CURSOR_SEP = "/"    # composite cursors: "E0001/<pid>"
+FORMATS = {"json": "application/json", "ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def parse_fields(spec, model, default):
+    """`fields=sid,first_name` -> column list; None/empty -> `default`."""
+    if not spec:
+        return list(default)
+    allowed = {f.name for f in model_fields(model)}
+    names = [name.strip() for name in spec.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return names
+
+
+def parse_format(fmt, default="json"):
+    fmt = (fmt or default).lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (use {', '.join(FORMATS)})")
+    return fmt
+
+
+def parse_limit(limit):
+    """None/empty -> no limit (stream every row); otherwise 1..MAX_PAGE_SIZE."""
+    if limit in (None, ""):
+        return None
+    limit = int(limit)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _jsonable(value):
+    # BYTEA columns (students.embed) go out as base64, like the typed rows
+    return embed_to_base64(value) if isinstance(value, memoryview) else value
+
+
+def csv_value(value):
+    """Cell text that bulk.parse_upload reads back: arrays as JSON, booleans as true/false."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return json.dumps(value, separators=(",", ":"))
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class RowStream:
+    """
+    One list query: `fields` of `table` ordered by the `key` columns, starting after the
+    `after` cursor. open() fetches the first batch (so errors surface before a response
+    starts), rows() yields dicts and fetches each further batch on a fresh connection.
+    """
+
+    def __init__(self, table, fields, key, where=None, params=(), after=None, limit=None, fmt="json"):
+        self.table = table
+        self.fields = fields
+        self.key = key
+        self.where = where
+        self.params = tuple(params)
+        self.after = after.split(CURSOR_SEP)[:len(key)] if after else None
+        self.limit = limit
+        self.fmt = fmt
+        self.mimetype = FORMATS[fmt]
+        self.count = 0      # rows yielded
+        self.fetched = 0    # rows read from the database
+        self.next_after = None
+        self._batch = None
+        self._done = False
+
+    def _query(self, size):
+        select = list(self.fields) + [k for k in self.key if k not in self.fields]
+        conds, params = [], list(self.params)
+        if self.where:
+            conds.append(self.where)
+        if self.after:
+            keys = self.key[:len(self.after)]
+            conds.append(f"({', '.join(keys)}) > ({', '.join(['%s'] * len(keys))})")
+            params.extend(self.after)
+        sql = f"SELECT {', '.join(select)} FROM {self.table}"
+        if conds:
+            sql += " WHERE " + " AND ".join(conds)
+        sql += f" ORDER BY {', '.join(self.key)} LIMIT %s"
+        params.append(size)
+        return sql, params
+
+    def _fetch(self):
+        """The next batch as dicts; the connection goes back before any row is sent."""
+        size = STREAM_BATCH if self.limit is None else min(STREAM_BATCH, self.limit - self.fetched)
+        last = self.limit is not None and self.fetched + size >= self.limit
+        # the last batch of a limited page asks for one extra row: next_after only if it exists
+        sql, params = self._query(size + 1 if last else size)
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                names = [desc[0] for desc in cur.description]
+                records = cur.fetchall()
+        finally:
+            put_conn(conn)
+        batch = [dict(zip(names, record)) for record in records]
+        if last and len(batch) > size:
+            batch.pop()
+            self.next_after = CURSOR_SEP.join(str(batch[-1][k]) for k in self.key)
+        if last or len(batch) < size:
+            self._done = True
+        if batch:
+            self.after = [batch[-1][k] for k in self.key]
+        self.fetched += len(batch)
+        return batch
+
+    def open(self):
+        self._batch = self._fetch()
+        return self
+
+    def rows(self):
+        try:
+            batch = self._batch
+            while batch:
+                self._batch = None
+                for row in batch:
+                    self.count += 1
+                    yield {name: _jsonable(row[name]) for name in self.fields}
+                batch = None if self._done else self._fetch()
+        finally:
+            self.close()
+
+    def render(self, dumps):
+        """Response body chunks in this stream's format; `dumps` is the API's JSON encoder."""
+        if self.fmt == "csv":
+            return self.csv_chunks()
+        if self.fmt == "ndjson":
+            return self.ndjson_chunks(dumps)
+        return self.chunks(dumps)
+
+    def chunks(self, dumps):
+        """JSON text of the response envelope, STREAM_BATCH rows per chunk."""
+        yield '{"status":"success","data":['
+        batch, sep = [], ""
+        for row in self.rows():
+            batch.append(dumps(row))
+            if len(batch) >= STREAM_BATCH:
+                yield sep + ",".join(batch)
+                batch, sep = [], ","
+        if batch:
+            yield sep + ",".join(batch)
+        yield '],"next_after":' + dumps(self.next_after) + "}"
+
+    def ndjson_chunks(self, dumps):
+        batch = []
+        for row in self.rows():
+            batch.append(dumps(row) + "\n")
+            if len(batch) >= STREAM_BATCH:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+
+    def csv_chunks(self):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(self.fields)
+        pending = 1
+        for row in self.rows():
+            writer.writerow([csv_value(row[name]) for name in self.fields])
+            pending += 1
+            if pending >= STREAM_BATCH:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+                pending = 0
+        if pending:
+            yield buf.getvalue()
+
+    def close(self):
+        """Stop fetching; holds no connection, so this is safe to call at any point."""
+        self._batch = None
+        self._done = True
+
+
+def open_listing(stream):
+    """(RowStream, 200) for the API layer, or an error response."""
+    try:
+        return stream.open(), 200
+    except Exception as e:
+        return {"status": "error", "message": str(e)}, 500
@@ -0,0 +1,131 @@
+# back_end/Database/migrate_embeddings.py
+# One-off migration of students.embed from FLOAT8[] to float32 BYTEA (see embeddings.py).
+# Rows are converted in sid-ordered batches into a side column, so a run can be stopped
+# and started again; the swap to the new column happens in one short transaction that
+# also re-converts anything written by the API while the batches ran.
+#
+#   python -m back_end.Database.migrate_embeddings [--batch 1000]
+import argparse
+from psycopg2.extras import execute_values
+from back_end.Database.db import get_conn, put_conn
+from back_end.embeddings import decode_embed, embed_to_bytes
+
+BATCH_SIZE = 1000
+SIDE_COLUMN = "embed_f32"
+
+
+def _embed_type(cur):
+    cur.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'students' AND column_name = 'embed';
+    """)
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _convert(cur, rows):
+    """(sid, FLOAT8[] as a list) rows -> side column. Returns the sids that failed."""
+    values, bad = [], []
+    for sid, embed in rows:
+        vec = decode_embed(embed)
+        if vec is None or vec.size == 0:
+            bad.append(sid)
+        else:
+            values.append((sid, embed_to_bytes(vec)))
+    if values:
+        # user triggers off: copying the embed must not bump modified_at
+        cur.execute("ALTER TABLE students DISABLE TRIGGER USER;")
+        execute_values(cur, f"""
+            UPDATE students SET {SIDE_COLUMN} = data.embed
+            FROM (VALUES %s) AS data(sid, embed)
+            WHERE students.sid = data.sid;
+        """, values)
+        cur.execute("ALTER TABLE students ENABLE TRIGGER USER;")
+    return bad
+
+
+def _sizes(cur):
+    cur.execute(f"SELECT COUNT(*), SUM(pg_column_size(embed)), SUM(pg_column_size({SIDE_COLUMN})) FROM students;")
+    return cur.fetchone()
+
+
+def migrate(batch=BATCH_SIZE):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            embed_type = _embed_type(cur)
+            if embed_type is None:
+                raise SystemExit("[-] students.embed not found")
+            if embed_type == "bytea":
+                print("[+] students.embed is already BYTEA, nothing to do.")
+                return
+
+            cur.execute(f"ALTER TABLE students ADD COLUMN IF NOT EXISTS {SIDE_COLUMN} BYTEA;")
+            cur.execute("SELECT NOW();")
+            started = cur.fetchone()[0]
+            conn.commit()
+
+            # ---------------- BATCHES ----------------
+            after, converted, bad = "", 0, []
+            while True:
+                cur.execute(f"""
+                    SELECT sid, embed FROM students
+                    WHERE {SIDE_COLUMN} IS NULL AND sid > %s
+                    ORDER BY sid
+                    LIMIT %s;
+                """, (after, batch))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                bad += _convert(cur, rows)
+                conn.commit()
+                converted += len(rows)
+                after = rows[-1][0]
+                print(f"[+] Converted {converted} embeddings (up to {after})")
+
+            if bad:
+                raise SystemExit(f"[-] Unreadable embed for {len(bad)} student(s), e.g. {bad[:5]}; fix them and rerun")
+
+            count, old_bytes, new_bytes = _sizes(cur)
+            conn.rollback()
+
+            # ---------------- SWAP ----------------
+            cur.execute("LOCK TABLE students IN ACCESS EXCLUSIVE MODE;")
+            cur.execute(f"""
+                SELECT sid, embed FROM students
+                WHERE {SIDE_COLUMN} IS NULL OR modified_at >= %s;
+            """, (started,))
+            late = cur.fetchall()
+            bad = _convert(cur, late)
+            if bad:
+                conn.rollback()
+                raise SystemExit(f"[-] Unreadable embed for {len(bad)} student(s), e.g. {bad[:5]}; fix them and rerun")
+            cur.execute("DROP TRIGGER IF EXISTS students_embed_modified ON students;")
+            cur.execute("ALTER TABLE students DROP COLUMN embed;")
+            cur.execute(f"ALTER TABLE students RENAME COLUMN {SIDE_COLUMN} TO embed;")
+            cur.execute("ALTER TABLE students ALTER COLUMN embed SET NOT NULL;")
+            cur.execute("""
+                CREATE TRIGGER students_embed_modified
+                BEFORE UPDATE ON students
+                FOR EACH ROW
+                WHEN (OLD.embed IS DISTINCT FROM NEW.embed)
+                EXECUTE FUNCTION update_modified_column();
+            """)
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+    print(f"[+] Migrated {count} students ({len(late)} re-converted during the swap)")
+    if count:
+        print(f"[+] students.embed: {old_bytes} -> {new_bytes} bytes "
+              f"({old_bytes / count:.0f} -> {new_bytes / count:.0f} per student)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    migrate(args.batch)
@@ -0,0 +1,106 @@
+# back_end/Database/migrate_phone_stats.py
+# Adds the phone_counts table and the statement triggers that keep it current (see
+# DBQuery.txt) to an existing database, then counts the phones already there. Safe to
+# run again: it only replaces the functions and triggers and recounts.
+#
+#   python -m back_end.Database.migrate_phone_stats
+from back_end.Database.db import get_conn, put_conn
+from back_end.Database.phones import rebuild_phone_counts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS phone_counts (
+    model VARCHAR(50) NOT NULL,
+    cond VARCHAR(30) NOT NULL,
+    total BIGINT NOT NULL DEFAULT 0,
+    stored BIGINT NOT NULL DEFAULT 0,
+    in_use BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (model, cond)
+);
+
+CREATE OR REPLACE FUNCTION count_phones()
+RETURNS TRIGGER AS $$
+DECLARE
+    changes TEXT;
+BEGIN
+    -- new_rows / old_rows are the statement's transition tables: +1 / -1 per phone
+    changes := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT model, cond, is_stored, 1 AS sign FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT model, cond, is_stored, -1 AS sign FROM old_rows'
+        ELSE 'SELECT model, cond, is_stored, 1 AS sign FROM new_rows
+              UNION ALL SELECT model, cond, is_stored, -1 FROM old_rows'
+    END;
+    EXECUTE format($sql$
+        INSERT INTO phone_counts AS c (model, cond, total, stored, in_use)
+        SELECT model, COALESCE(cond, ''), SUM(sign),
+               COALESCE(SUM(sign) FILTER (WHERE is_stored), 0),
+               COALESCE(SUM(sign) FILTER (WHERE NOT is_stored), 0)
+        FROM (%s) AS changes
+        GROUP BY 1, 2
+        HAVING SUM(sign) <> 0
+            OR SUM(sign) FILTER (WHERE is_stored) <> 0
+            OR SUM(sign) FILTER (WHERE NOT is_stored) <> 0
+        ORDER BY 1, 2
+        ON CONFLICT (model, cond) DO UPDATE
+        SET total = c.total + EXCLUDED.total,
+            stored = c.stored + EXCLUDED.stored,
+            in_use = c.in_use + EXCLUDED.in_use
+    $sql$, changes);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION reset_phone_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM phone_counts;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS phones_count_insert ON phones;
+CREATE TRIGGER phones_count_insert
+AFTER INSERT ON phones
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION count_phones();
+
+DROP TRIGGER IF EXISTS phones_count_update ON phones;
+CREATE TRIGGER phones_count_update
+AFTER UPDATE ON phones
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION count_phones();
+
+DROP TRIGGER IF EXISTS phones_count_delete ON phones;
+CREATE TRIGGER phones_count_delete
+AFTER DELETE ON phones
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION count_phones();
+
+DROP TRIGGER IF EXISTS phones_count_truncate ON phones;
+CREATE TRIGGER phones_count_truncate
+AFTER TRUNCATE ON phones
+FOR EACH STATEMENT
+EXECUTE FUNCTION reset_phone_counts();
+"""
+
+
+def migrate():
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+    total = rebuild_phone_counts()
+    print(f"[+] phone_counts ready: {total} phones counted")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,51 @@
+# back_end/Database/migrate_search.py
+# Adds the student search indexes to a database: the prefix indexes (also in DBQuery.txt,
+# for existing databases) and the optional trigram index, which only lives here. The
+# trigram index needs the pg_trgm contrib extension and is skipped, with a warning, where
+# it can't be installed; name-substring search then stays a scan while typeahead prefix
+# search is still indexed. Run it on fresh installs too to get the trigram index. Safe
+# to run again.
+#
+#   python -m back_end.Database.migrate_search
+import psycopg2
+from back_end.Database.db import get_conn, put_conn
+
+PREFIX_INDEXES = """
+CREATE INDEX IF NOT EXISTS students_sid_prefix_idx ON students ((sid::text) COLLATE "C");
+CREATE INDEX IF NOT EXISTS students_full_name_prefix_idx
+    ON students ((lower(first_name || ' ' || COALESCE(last_name, ''))) COLLATE "C");
+CREATE INDEX IF NOT EXISTS students_last_name_prefix_idx ON students ((lower(last_name)) COLLATE "C");
+"""
+
+TRIGRAM_INDEX = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS students_full_name_trgm_idx
+    ON students USING gin (lower(first_name || ' ' || COALESCE(last_name, '')) gin_trgm_ops);
+"""
+
+
+def migrate():
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(PREFIX_INDEXES)
+            conn.commit()
+            print("[+] Prefix search indexes ready.")
+            try:
+                cur.execute(TRIGRAM_INDEX)
+                conn.commit()
+                print("[+] Trigram search index ready.")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"[-] pg_trgm unavailable, name substring search stays a scan: {e.diag.message_primary or e}")
+            cur.execute("ANALYZE students;")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+
+if __name__ == "__main__":
+    migrate()
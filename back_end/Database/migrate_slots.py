@@ -0,0 +1,118 @@
+# back_end/Database/migrate_slots.py
+# Adds the free_slots table, its triggers and the location GiST indexes (see DBQuery.txt)
+# to an existing database and fills free_slots from phones.location. Safe to run again:
+# it only replaces the functions and triggers and rebuilds the free list.
+#
+#   python -m back_end.Database.migrate_slots
+from back_end.Database.db import get_conn, put_conn
+from back_end.Database.phones import slot_allocator, GRID_SIZE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS free_slots (
+    y SMALLINT NOT NULL,
+    x SMALLINT NOT NULL,
+    PRIMARY KEY (y, x)
+);
+
+CREATE INDEX IF NOT EXISTS free_slots_point_idx ON free_slots USING gist (point(x, y));
+CREATE INDEX IF NOT EXISTS phones_location_point_idx ON phones USING gist (point(location[1], location[2]));
+
+CREATE OR REPLACE FUNCTION claim_free_slots(n INTEGER)
+RETURNS TABLE (x SMALLINT, y SMALLINT) AS $$
+DECLARE
+    slot RECORD;
+BEGIN
+    -- a cursor loop keeps the (y, x) index scan whatever n is
+    FOR slot IN
+        SELECT s.y, s.x FROM free_slots s
+        ORDER BY s.y, s.x
+        LIMIT n
+        FOR UPDATE SKIP LOCKED
+    LOOP
+        DELETE FROM free_slots f WHERE f.y = slot.y AND f.x = slot.x;
+        x := slot.x;
+        y := slot.y;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION auto_assign_location()
+RETURNS TRIGGER AS $$
+DECLARE
+    slot RECORD;
+BEGIN
+    IF NEW.location IS NULL THEN
+        SELECT * INTO slot FROM claim_free_slots(1);
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'No available locations left in grid (% x %)', 500, 500;
+        END IF;
+        NEW.location := ARRAY[slot.x, slot.y];
+    ELSE
+        DELETE FROM free_slots WHERE x = NEW.location[1] AND y = NEW.location[2];
+        IF EXISTS (SELECT 1 FROM phones WHERE location = NEW.location) THEN
+            RAISE EXCEPTION 'Location % is already taken', NEW.location;
+        END IF;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION move_location()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.location IS NOT NULL THEN
+        DELETE FROM free_slots WHERE x = NEW.location[1] AND y = NEW.location[2];
+    END IF;
+    IF OLD.location IS NOT NULL THEN
+        INSERT INTO free_slots (y, x) VALUES (OLD.location[2], OLD.location[1])
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION release_location()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF OLD.location IS NOT NULL THEN
+        INSERT INTO free_slots (y, x) VALUES (OLD.location[2], OLD.location[1])
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS phones_before_update_location ON phones;
+CREATE TRIGGER phones_before_update_location
+BEFORE UPDATE ON phones
+FOR EACH ROW
+WHEN (OLD.location IS DISTINCT FROM NEW.location)
+EXECUTE FUNCTION move_location();
+
+DROP TRIGGER IF EXISTS phones_after_delete_location ON phones;
+CREATE TRIGGER phones_after_delete_location
+AFTER DELETE ON phones
+FOR EACH ROW
+EXECUTE FUNCTION release_location();
+"""
+
+
+def migrate():
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA)  # no parameters, so RAISE's % placeholders pass through
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        put_conn(conn)
+
+    free = slot_allocator.rebuild()
+    print(f"[+] free_slots ready: {free} of {GRID_SIZE[0] * GRID_SIZE[1]} slots free")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,97 @@
+# back_end/Database/models.py
+# Typed rows returned by the data layer. The column lists drive the SELECTs, so a query
+# never returns a column the model doesn't know about. Flask's jsonify (and asgi_main)
+# serialize dataclasses as plain objects, so API responses keep their shape.
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from typing import List, Optional
+from back_end.embeddings import embed_to_base64
+
+
+@dataclass
+class Student:
+    sid: str
+    last_name: Optional[str]
+    first_name: str
+    embed: Optional[str]  # base64 of the float32 BYTEA column
+    created_at: Optional[datetime]
+    modified_at: Optional[datetime]
+
+    def __post_init__(self):
+        if isinstance(self.embed, memoryview):
+            self.embed = embed_to_base64(self.embed)
+
+
+@dataclass
+class Phone:
+    pid: str
+    sid: str
+    model: str
+    imei: str
+    cond: Optional[str]
+    admin_note: Optional[str]
+    stud_note: Optional[str]
+    is_stored: bool
+    location: Optional[List[int]]
+    created_at: Optional[datetime]
+    modified_at: Optional[datetime]
+
+
+@dataclass
+class PhoneDistance(Phone):
+    distance: float
+
+
+@dataclass
+class FreeSlot:
+    location: List[int]
+    distance: float
+
+
+@dataclass
+class ConditionCount:
+    cond: Optional[str]
+    total: int = 0
+    stored: int = 0
+    in_use: int = 0
+
+
+@dataclass
+class ModelCount:
+    model: str
+    total: int = 0
+    stored: int = 0
+    in_use: int = 0
+
+
+@dataclass
+class PhoneStats:
+    total: int = 0
+    stored: int = 0
+    in_use: int = 0
+    damaged: int = 0
+    broken: int = 0
+    by_condition: List[ConditionCount] = field(default_factory=list)
+    by_model: List[ModelCount] = field(default_factory=list)
+
+
+def columns(model):
+    """Comma-separated column list of a model, for SELECT clauses."""
+    return ", ".join(f.name for f in fields(model))
+
+
+def fetch_one(cur, model):
+    row = cur.fetchone()
+    if row is None:
+        return None
+    names = [desc[0] for desc in cur.description]
+    return model(**dict(zip(names, row)))
+
+
+def fetch_all(cur, model):
+    names = [desc[0] for desc in cur.description]
+    return [model(**dict(zip(names, row))) for row in cur.fetchall()]
+
+
+STUDENT_COLUMNS = columns(Student)
+PHONE_COLUMNS = columns(Phone)
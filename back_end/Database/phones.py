@@ -1,11 +1,141 @@
 # back_end/Database/phones.py
-from back_end.Database.db import get_conn, put_conn
+from back_end.Database.db import get_conn, put_conn, prepared, execute_prepared
+from back_end.Database.models import (
+    Phone, PhoneDistance, PhoneStats, ConditionCount, ModelCount, FreeSlot, PHONE_COLUMNS, fetch_all
+)
+from back_end.Database.listing import RowStream, parse_fields, parse_limit, parse_format, open_listing
+from back_end.Database.bulk import (
+    parse_upload, upload_format, row_error, as_text, as_bool, as_point, insert_batch, bulk_response
+)
+from back_end.stage_metrics import StageTimer
+from psycopg2.extras import execute_values
+
+# hot path: a student's phones
+PHONES_BY_SID = prepared("phones_by_sid", f"SELECT {PHONE_COLUMNS} FROM phones WHERE sid = $1")
+
+# location as a point: the expression the GiST indexes in DBQuery.txt are built on, so
+# <-> (nearest first) and <@ (inside a box) are index scans
+LOCATION_POINT = "point(location[1], location[2])"
+SLOT_POINT = "point(x, y)"
+
+PHONES_NEARBY = prepared("phones_nearby", f"""
+    SELECT {PHONE_COLUMNS}, {LOCATION_POINT} <-> point($1, $2) AS distance
+    FROM phones
+    WHERE location IS NOT NULL
+    ORDER BY {LOCATION_POINT} <-> point($1, $2)
+    LIMIT $3
+""")
+FREE_SLOTS_NEARBY = prepared("free_slots_nearby", f"""
+    SELECT x, y, {SLOT_POINT} <-> point($1, $2) AS distance
+    FROM free_slots
+    ORDER BY {SLOT_POINT} <-> point($1, $2)
+    LIMIT $3
+""")
+
+# lists page by (sid, pid): after=E0001 starts at the next student, after=E0001/<pid> mid-student
+PHONE_LIST_KEY = ("sid", "pid")
+PHONE_LIST_FIELDS = tuple(PHONE_COLUMNS.split(", "))
+PHONE_CONDITIONS = ("New", "Good", "Fair", "Damaged", "Broken")  # the cond CHECK in DBQuery.txt
+
+
+def _phone_listing(after, limit, fields, where=None):
+    try:
+        stream = RowStream("phones", parse_fields(fields, Phone, PHONE_LIST_FIELDS), key=PHONE_LIST_KEY,
+                           where=where, after=after, limit=parse_limit(limit))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    return open_listing(stream)
+
+# ------------------ Storage slots ------------------
+GRID_SIZE = (500, 500)  # (x, y); matches the location CHECK and free_slots in DBQuery.txt
+
+
+class SlotsExhausted(Exception):
+    pass
+
+
+class SlotAllocator:
+    """
+    Cabinet slots come from the free_slots table (one row per empty slot). A claim is an
+    index lookup on the lowest free rows, concurrent claims skip each other's rows instead
+    of racing for one slot, and a claim rolls back with the transaction that made it.
+    Triggers on phones put slots back when a phone is moved or deleted.
+    """
+
+    def __init__(self):
+        self.claim_timer = StageTimer()
+        self.claimed = 0
+        self.exhausted = 0
+
+    def claim(self, cur, count=1, partial=False):
+        """
+        `count` free slots as [x, y] in cur's transaction; the caller rolls back on error.
+        With `partial`, fewer slots are returned instead of raising when the grid runs out.
+        """
+        with self.claim_timer.measure():
+            cur.execute("SELECT x, y FROM claim_free_slots(%s) ORDER BY y, x;", (count,))
+            slots = [[x, y] for x, y in cur.fetchall()]
+        self.claimed += len(slots)
+        if len(slots) < count:
+            self.exhausted += 1
+            if not partial:
+                raise SlotsExhausted(f"No available locations left in grid ({GRID_SIZE[0]} x {GRID_SIZE[1]})")
+        return slots
+
+    def release(self, cur, slots):
+        """Hands back slots taken in cur's transaction that ended up without a phone."""
+        if slots:
+            execute_values(cur, """
+                INSERT INTO free_slots (x, y)
+                SELECT v.x, v.y FROM (VALUES %s) AS v(x, y)
+                WHERE NOT EXISTS (SELECT 1 FROM phones WHERE location = ARRAY[v.x, v.y]::SMALLINT[])
+                ON CONFLICT DO NOTHING;
+            """, [tuple(slot) for slot in slots])
+
+    def rebuild(self):
+        """Refills free_slots from phones.location, e.g. after a migration or manual edits."""
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE phones IN SHARE MODE;")
+                cur.execute("TRUNCATE free_slots;")
+                cur.execute("""
+                    INSERT INTO free_slots (y, x)
+                    SELECT y, x
+                    FROM generate_series(1, %s) AS y, generate_series(1, %s) AS x
+                    WHERE NOT EXISTS (SELECT 1 FROM phones WHERE location = ARRAY[x, y]::SMALLINT[]);
+                """, (GRID_SIZE[1], GRID_SIZE[0]))
+                free = cur.rowcount
+            conn.commit()
+            return free
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            put_conn(conn)
+
+    def free_count(self):
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM free_slots;")
+                return cur.fetchone()[0]
+        finally:
+            put_conn(conn)
+
+    def stats(self):
+        return {"claimed": self.claimed, "exhausted": self.exhausted, "claim": self.claim_timer.snapshot()}
+
+
+slot_allocator = SlotAllocator()
+
 
 # ------------------ CRUD ------------------
 def create_phone(data):
     conn = get_conn()
     try:
         with conn.cursor() as cur:
+            location = data.get("location") or slot_allocator.claim(cur)[0]
             cur.execute("""
                 INSERT INTO phones (sid, model, imei, cond, admin_note, stud_note, is_stored, location)
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
@@ -13,7 +143,7 @@ def create_phone(data):
             """, (
                 data["sid"], data["model"], data.get("imei"),
                 data.get("cond"), data.get("admin_note"), data.get("stud_note"),
-                data.get("is_stored", False), data.get("location") if data.get("location") else None  # allow NULL; trigger will auto-assign
+                data.get("is_stored", False), location
             ))
             pid = cur.fetchone()[0]
             conn.commit()
@@ -31,30 +161,19 @@ def get_phones(sid):
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT * FROM phones WHERE sid = %s;", (sid,))
-            rows = cur.fetchall()
+            execute_prepared(cur, PHONES_BY_SID, (sid,))
+            data = fetch_all(cur, Phone)
 
-            if not rows:
+            if not data:
                 return {"status": "error", "message": "No phones found"}, 404
 
-            columns = [desc[0] for desc in cur.description]
-            data = [dict(zip(columns, r)) for r in rows]
-
             return {"status": "success", "data": data}, 200
     finally:
         put_conn(conn)
 
 
-def list_phones():
-    conn = get_conn()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM phones ORDER BY sid;")
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
-    finally:
-        put_conn(conn)
+def list_phones(after=None, limit=None, fields=None):
+    return _phone_listing(after, limit, fields)
 
 
 def update_phone(pid, data):
@@ -101,48 +220,199 @@ def delete_phone(pid):
         put_conn(conn)
 
 
-# ------------------ Advanced ------------------
-def phones_not_stored():
+# ------------------ Bulk ------------------
+def _validate_phone(data):
+    cond = as_text(data.get("cond"), "cond")
+    if cond is not None and cond not in PHONE_CONDITIONS:
+        raise ValueError(f"cond must be one of {', '.join(PHONE_CONDITIONS)}")
+    return [
+        as_text(data.get("sid"), "sid", 5, required=True),
+        as_text(data.get("model"), "model", 50, required=True),
+        as_text(data.get("imei"), "imei", 20, required=True),
+        cond,
+        as_text(data.get("admin_note"), "admin_note"),
+        as_text(data.get("stud_note"), "stud_note"),
+        as_bool(data.get("is_stored"), "is_stored"),
+        as_point(data.get("location"), "location", GRID_SIZE),
+    ]
+
+
+def import_phones(body, mimetype=None, fmt=None, atomic=False):
+    """
+    CSV / NDJSON upload -> one INSERT for every valid row, in one transaction. Rows
+    without a location get slots from one bulk claim; unknown students, duplicate
+    IMEIs and taken locations are reported per row instead of failing the upload.
+    With `atomic` any error rolls back the whole upload.
+    """
+    try:
+        rows, errors = parse_upload(body, upload_format(mimetype, fmt))
+    except (ValueError, UnicodeDecodeError) as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    candidates = []
+    for n, data in rows:
+        try:
+            candidates.append((n, _validate_phone(data)))
+        except ValueError as e:
+            errors.append(row_error(n, e))
+
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT * FROM phones WHERE is_stored = FALSE ORDER BY sid;")
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
+            # what the database would reject, checked for the whole upload at once
+            cur.execute("SELECT sid FROM students WHERE sid = ANY(%s);", ([v[0] for _, v in candidates],))
+            known_sids = {sid for (sid,) in cur.fetchall()}
+            cur.execute("SELECT imei FROM phones WHERE imei = ANY(%s);", ([v[2] for _, v in candidates],))
+            taken_imeis = {imei for (imei,) in cur.fetchall()}
+            explicit = [v[7] for _, v in candidates if v[7] is not None]
+            cur.execute("""
+                SELECT p.location FROM phones p
+                JOIN unnest(%s::int[], %s::int[]) AS u(x, y) ON p.location = ARRAY[u.x, u.y]::SMALLINT[];
+            """, ([loc[0] for loc in explicit], [loc[1] for loc in explicit]))
+            taken_slots = {tuple(loc) for (loc,) in cur.fetchall()}
+
+            accepted = []
+            for n, value in candidates:
+                sid, imei, location = value[0], value[2], value[7]
+                if sid not in known_sids:
+                    errors.append(row_error(n, f"Student {sid} not found"))
+                elif imei in taken_imeis:
+                    errors.append(row_error(n, f"IMEI {imei} already registered"))
+                elif location is not None and tuple(location) in taken_slots:
+                    errors.append(row_error(n, f"Location {location} is already taken"))
+                else:
+                    taken_imeis.add(imei)
+                    if location is not None:
+                        taken_slots.add(tuple(location))
+                    accepted.append((n, value))
+
+            if atomic and errors:
+                conn.rollback()
+                return bulk_response([], errors, committed=False)
+
+            # one claim for every phone that needs a slot
+            needs_slot = [value for _, value in accepted if value[7] is None]
+            slots = slot_allocator.claim(cur, len(needs_slot), partial=True) if needs_slot else []
+            for value, slot in zip(needs_slot, slots):
+                value[7] = slot
+            values, rows_of = [], []
+            for n, value in accepted:
+                if value[7] is None:
+                    errors.append(row_error(n, f"No available locations left in grid ({GRID_SIZE[0]} x {GRID_SIZE[1]})"))
+                else:
+                    values.append(tuple(value))
+                    rows_of.append(n)
+
+            inserted, failed = insert_batch(cur, """
+                INSERT INTO phones (sid, model, imei, cond, admin_note, stud_note, is_stored, location)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+                RETURNING imei, pid, location;
+            """, values)
+            created, unused = [], []
+            for i, value in enumerate(values):
+                row = inserted.get(value[2])
+                if row is not None:
+                    created.append({"row": rows_of[i], "pid": row[1], "location": row[2]})
+                    continue
+                errors.append(row_error(rows_of[i], failed.get(i, "Conflicts with an existing phone")))
+                unused.append(value[7])  # claimed, or dropped from free_slots by the insert trigger
+            slot_allocator.release(cur, unused)
+
+            if atomic and errors:
+                conn.rollback()
+                return bulk_response([], errors, committed=False)
+            conn.commit()
+            return bulk_response(created, errors)
+    except Exception as e:
+        conn.rollback()
+        return {"status": "error", "message": str(e)}, 400
     finally:
         put_conn(conn)
 
 
+def export_phones(fmt=None, after=None, limit=None, fields=None):
+    try:
+        stream = RowStream("phones", parse_fields(fields, Phone, PHONE_LIST_FIELDS), key=PHONE_LIST_KEY,
+                           after=after, limit=parse_limit(limit), fmt=parse_format(fmt, "csv"))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    return open_listing(stream)
+
+
+# ------------------ Advanced ------------------
+def phones_not_stored(after=None, limit=None, fields=None):
+    return _phone_listing(after, limit, fields, where="is_stored = FALSE")
+
+
 def phones_by_condition(cond):
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT * FROM phones WHERE cond = %s ORDER BY sid;", (cond,))
-            rows = cur.fetchall()
-            if not rows:
+            cur.execute(f"SELECT {PHONE_COLUMNS} FROM phones WHERE cond = %s ORDER BY sid;", (cond,))
+            data = fetch_all(cur, Phone)
+            if not data:
                 return {"status": "success", "data": [], "message": f"No phones with condition '{cond}'"}, 200
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
+            return {"status": "success", "data": data}, 200
     finally:
         put_conn(conn)
 
 
 def phone_stats():
+    """
+    Totals plus per-condition and per-model breakdowns, read from phone_counts (one row
+    per model and condition, kept current by statement triggers on phones), so the cost
+    follows the number of models, not the number of phones.
+    """
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT model, NULLIF(cond, ''), total, stored, in_use
+                FROM phone_counts
+                WHERE total > 0;
+            """)
+            rows = cur.fetchall()
+    finally:
+        put_conn(conn)
+
+    stats, by_condition, by_model = PhoneStats(), {}, {}
+    for model, cond, total, stored, in_use in rows:
+        for counts in (stats,
+                       by_condition.setdefault(cond, ConditionCount(cond)),
+                       by_model.setdefault(model, ModelCount(model))):
+            counts.total += total
+            counts.stored += stored
+            counts.in_use += in_use
+    stats.damaged = by_condition["Damaged"].total if "Damaged" in by_condition else 0
+    stats.broken = by_condition["Broken"].total if "Broken" in by_condition else 0
+    stats.by_condition = [by_condition[c] for c in PHONE_CONDITIONS + (None,) if c in by_condition]
+    stats.by_model = sorted(by_model.values(), key=lambda m: (-m.total, m.model))
+    return {"status": "success", "data": stats}, 200
+
+
+def rebuild_phone_counts():
+    """Recounts phone_counts from phones, e.g. after a migration or with the triggers disabled."""
     conn = get_conn()
     try:
         with conn.cursor() as cur:
+            cur.execute("LOCK TABLE phones IN SHARE MODE;")
+            cur.execute("DELETE FROM phone_counts;")
             cur.execute("""
-                SELECT COUNT(*) AS total,
-                       COUNT(*) FILTER (WHERE is_stored) AS stored,
-                       COUNT(*) FILTER (WHERE NOT is_stored) AS in_use,
-                       COUNT(*) FILTER (WHERE cond = 'Damaged') AS damaged,
-                       COUNT(*) FILTER (WHERE cond = 'Broken') AS broken
-                FROM phones;
+                INSERT INTO phone_counts (model, cond, total, stored, in_use)
+                SELECT model, COALESCE(cond, ''), COUNT(*),
+                       COUNT(*) FILTER (WHERE is_stored),
+                       COUNT(*) FILTER (WHERE NOT is_stored)
+                FROM phones
+                GROUP BY 1, 2;
             """)
-            result = cur.fetchone()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": dict(zip(columns, result))}, 200
+            cur.execute("SELECT COALESCE(SUM(total), 0)::BIGINT FROM phone_counts;")
+            total = cur.fetchone()[0]
+        conn.commit()
+        return total
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         put_conn(conn)
 
@@ -180,15 +450,31 @@ def phones_near_location(x, y, limit=10):
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT *, sqrt(power(location[1] - %s, 2) + power(location[2] - %s, 2)) AS distance
-                FROM phones
-                ORDER BY distance
-                LIMIT %s;
-            """, (x, y, limit))
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
+            execute_prepared(cur, PHONES_NEARBY, (x, y, limit))
+            return {"status": "success", "data": fetch_all(cur, PhoneDistance)}, 200
+
+    finally:
+        put_conn(conn)
+
 
+def free_slots_near_location(x, y, limit=10):
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            execute_prepared(cur, FREE_SLOTS_NEARBY, (x, y, limit))
+            data = [FreeSlot(location=[sx, sy], distance=distance) for sx, sy, distance in cur.fetchall()]
+            return {"status": "success", "data": data}, 200
     finally:
-        put_conn(conn)
\ No newline at end of file
+        put_conn(conn)
+
+
+def phones_in_box(x1, y1, x2, y2, after=None, limit=None, fields=None):
+    """Phones with a location inside the rectangle (corners inclusive), stored or in use; streamed like list_phones."""
+    box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+    where = f"{LOCATION_POINT} <@ box(point(%s, %s), point(%s, %s))"
+    try:
+        stream = RowStream("phones", parse_fields(fields, Phone, PHONE_LIST_FIELDS), key=PHONE_LIST_KEY,
+                           where=where, params=box, after=after, limit=parse_limit(limit))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    return open_listing(stream)
@@ -0,0 +1,133 @@
+# back_end/Database/student_cache.py
+import threading
+import time
+from collections import OrderedDict
+from back_end.Database.db import get_conn, put_conn, prepared, execute_prepared
+from back_end.Database.models import STUDENT_COLUMNS
+from back_end.embeddings import l2_normalize, decode_embed
+
+CACHE_MAX_SIZE = 5000
+CACHE_TTL = 300  # seconds
+
+# hot path: badge lookups on a cache miss, and GET /api/students/<sid>
+STUDENT_BY_SID = prepared("student_by_sid", f"SELECT {STUDENT_COLUMNS} FROM students WHERE sid = $1")
+
+
+def _to_entry(student):
+    """Row with the raw BYTEA embed -> entry with it normalized once, for direct dot products."""
+    embed = decode_embed(student.get("embed"))
+    if embed is None or embed.size == 0:
+        return None
+    student = dict(student)
+    student["embed"] = l2_normalize(embed.astype("float32", copy=False))
+    return student
+
+
+class StudentCache:
+    """
+    LRU + TTL cache of students keyed by sid.
+    Entries hold a copy of the row with `embed` as a normalized float32 vector.
+    Loads run outside the lock; every invalidation bumps a generation counter, and a
+    load that started before the latest invalidation is returned but not cached, so
+    a row read just before an update or delete can't outlive it.
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # sid -> (expires_at, student)
+        self._generation = 0  # bumped by invalidate() / clear()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------- LOOKUP ----------------
+    def get(self, sid):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(sid)
+            if item is not None:
+                expires_at, student = item
+                if expires_at > now:
+                    self._entries.move_to_end(sid)
+                    self.hits += 1
+                    return student
+                del self._entries[sid]
+            self.misses += 1
+            generation = self._generation
+
+        student = self._load_one(sid)
+        if student is not None:
+            self.put(student, generation)
+        return student
+
+    def put(self, student, generation=None):
+        """Caches `student`, unless it was loaded before an invalidation (see `generation`)."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            sid = student["sid"]
+            self._entries[sid] = (time.monotonic() + self.ttl, student)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # ---------------- INVALIDATION ----------------
+    def invalidate(self, *sids):
+        with self._lock:
+            for sid in sids:
+                if sid is not None:
+                    self._entries.pop(sid, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    # ---------------- LOADING ----------------
+    def warm(self):
+        with self._lock:
+            generation = self._generation
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT sid, last_name, first_name, embed
+                    FROM students
+                    ORDER BY modified_at DESC
+                    LIMIT %s;
+                """, (self.max_size,))
+                rows = cur.fetchall()
+                columns = [desc[0] for desc in cur.description]
+        finally:
+            put_conn(conn)
+
+        count = 0
+        for r in reversed(rows):  # most recently modified end up most recently used
+            student = _to_entry(dict(zip(columns, r)))
+            if student is not None:
+                self.put(student, generation)
+                count += 1
+        return count
+
+    def _load_one(self, sid):
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                execute_prepared(cur, STUDENT_BY_SID, (sid,))
+                row = cur.fetchone()
+                if row is None:
+                    return None
+                columns = [desc[0] for desc in cur.description]
+        finally:
+            put_conn(conn)
+        # the raw row, not a Student: its embed stays the BYTEA buffer, no base64 round trip
+        return _to_entry(dict(zip(columns, row)))
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+student_cache = StudentCache()
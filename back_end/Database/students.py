@@ -1,10 +1,44 @@
 # back_end/Database/students.py
-from back_end.Database.db import get_conn, put_conn
+from back_end.Database.db import get_conn, put_conn, execute_prepared
+from back_end.Database.models import Student, STUDENT_COLUMNS, fetch_one, fetch_all
+from back_end.Database.listing import RowStream, parse_fields, parse_limit, parse_format, open_listing
+from back_end.Database.bulk import parse_upload, upload_format, row_error, as_text, insert_batch, bulk_response
+from back_end.Database.student_cache import student_cache, STUDENT_BY_SID
+from back_end.face_index import face_index
+from back_end.embeddings import decode_embed, embed_to_bytes, EMBED_DIM
 import re
+import time
+import numpy as np
+
+# list responses leave the 512-byte embed out unless asked for with fields=
+STUDENT_LIST_FIELDS = ("sid", "last_name", "first_name", "created_at", "modified_at")
+# exports carry every column, so an export can be imported again
+STUDENT_EXPORT_FIELDS = ("sid", "last_name", "first_name", "embed", "created_at", "modified_at")
+SID_PATTERN = re.compile(r"^E\d{4}$")
+
+
+def _embed_param(embed):
+    """
+    API embed (base64, or a legacy "{...}" literal/list) -> (float32 bytes for BYTEA, vector).
+    Raises ValueError unless it decodes to EMBED_DIM finite floats.
+    """
+    if embed is None:
+        return None, None
+    vec = decode_embed(embed)
+    if vec is None or vec.size == 0:
+        raise ValueError("Invalid embed: expected base64 float32 bytes or a list of numbers")
+    if vec.shape != (EMBED_DIM,):
+        raise ValueError(f"Invalid embed: expected {EMBED_DIM} values, got {vec.size}")
+    if not np.isfinite(vec).all():
+        raise ValueError("Invalid embed: values must be finite")
+    return embed_to_bytes(vec), vec
+
+
 # ------------------ CRUD ------------------
 def create_student(data):
     conn = get_conn()
     try:
+        embed, vec = _embed_param(data["embed"])
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO students (sid, last_name, first_name, embed)
@@ -13,10 +47,13 @@ def create_student(data):
             """, (data["sid"],
                 data.get("last_name"),
                 data["first_name"],
-                data["embed"]
+                embed
             ))
             sid = cur.fetchone()[0]
             conn.commit()
+            student_cache.invalidate(sid)
+            if face_index.loaded:
+                face_index.upsert(sid, vec)
             return {"status": "success", "data": {"sid": sid}}, 201
     except Exception as e:
         conn.rollback()
@@ -29,31 +66,28 @@ def get_student(sid):
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT * FROM students WHERE sid = %s;", (sid,))
-            row = cur.fetchone()
-            if not row:
+            execute_prepared(cur, STUDENT_BY_SID, (sid,))
+            student = fetch_one(cur, Student)
+            if student is None:
                 return {"status": "error", "message": "Student not found"}, 404
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": dict(zip(columns, row))}, 200
+            return {"status": "success", "data": student}, 200
     finally:
         put_conn(conn)
 
 
-def list_students():
-    conn = get_conn()
+def list_students(after=None, limit=None, fields=None):
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT * FROM students ORDER BY sid;")
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
-    finally:
-        put_conn(conn)
+        stream = RowStream("students", parse_fields(fields, Student, STUDENT_LIST_FIELDS), key=("sid",),
+                           after=after, limit=parse_limit(limit))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    return open_listing(stream)
 
 
 def update_student(sid, data):
     conn = get_conn()
     try:
+        embed, vec = _embed_param(data.get("embed"))
         with conn.cursor() as cur:
             new_sid = data.get("sid") or None  # ignore empty string
             cur.execute("""
@@ -68,7 +102,7 @@ def update_student(sid, data):
                 new_sid,
                 data.get("last_name"),
                 data.get("first_name"),
-                data.get("embed"),
+                embed,
                 sid
             ))
 
@@ -77,6 +111,8 @@ def update_student(sid, data):
                 return {"status": "error", "message": "Student not found"}, 404
 
             conn.commit()
+            student_cache.invalidate(sid, result[0])
+            face_index.apply_update(sid, result[0], vec)
             return {"status": "success", "data": {"sid": result[0]}}, 200
 
     except Exception as e:
@@ -95,51 +131,222 @@ def delete_student(sid):
                 return {"status": "error", "message": "Student not found"}, 404
 
             conn.commit()
+            student_cache.invalidate(sid)
+            face_index.remove(sid)
             return {"status": "success", "data": {"sid": sid}}, 200
     finally:
         put_conn(conn)
 
 
+# ------------------ Bulk ------------------
+def import_students(body, mimetype=None, fmt=None, atomic=False):
+    """
+    CSV / NDJSON upload -> one INSERT for every valid row, in one transaction. Invalid
+    rows and sids that already exist are reported per row; with `atomic` any error
+    rolls back the whole upload.
+    """
+    try:
+        rows, errors = parse_upload(body, upload_format(mimetype, fmt))
+    except (ValueError, UnicodeDecodeError) as e:
+        return {"status": "error", "message": str(e)}, 400
+
+    values, rows_of, vecs, seen = [], [], {}, set()
+    for n, data in rows:
+        try:
+            sid = as_text(data.get("sid"), "sid", required=True)
+            if not SID_PATTERN.match(sid):
+                raise ValueError("sid must look like E1234")
+            if sid in seen:
+                raise ValueError(f"sid {sid} appears more than once in the upload")
+            embed, vec = _embed_param(data.get("embed"))
+            if embed is None:
+                raise ValueError("embed is required")
+            values.append((sid, as_text(data.get("last_name"), "last_name", 40),
+                           as_text(data.get("first_name"), "first_name", 80, required=True), embed))
+        except ValueError as e:
+            errors.append(row_error(n, e))
+            continue
+        seen.add(sid)
+        rows_of.append(n)
+        vecs[sid] = vec
+
+    if atomic and errors:
+        return bulk_response([], errors, committed=False)
+
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            inserted, failed = insert_batch(cur, """
+                INSERT INTO students (sid, last_name, first_name, embed)
+                VALUES %s
+                ON CONFLICT (sid) DO NOTHING
+                RETURNING sid;
+            """, values)
+            created = []
+            for i, value in enumerate(values):
+                sid = value[0]
+                if sid in inserted:
+                    created.append({"row": rows_of[i], "sid": sid})
+                else:
+                    errors.append(row_error(rows_of[i], failed.get(i, f"Student {sid} already exists")))
+            if atomic and errors:
+                conn.rollback()
+                return bulk_response([], errors, committed=False)
+            conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return {"status": "error", "message": str(e)}, 400
+    finally:
+        put_conn(conn)
+
+    sids = [c["sid"] for c in created]
+    student_cache.invalidate(*sids)
+    if face_index.loaded:
+        for sid in sids:
+            face_index.upsert(sid, vecs[sid])
+    return bulk_response(created, errors)
+
+
+def export_students(fmt=None, after=None, limit=None, fields=None):
+    try:
+        stream = RowStream("students", parse_fields(fields, Student, STUDENT_EXPORT_FIELDS), key=("sid",),
+                           after=after, limit=parse_limit(limit), fmt=parse_format(fmt, "csv"))
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
+    return open_listing(stream)
+
+
 # ------------------ Advanced ------------------
-def search_students(query):
-    if not query:
-        return {"status": "error", "message": "Missing search query"}, 400
+# Typeahead search matches the expressions the prefix / trigram indexes are built on
+# (DBQuery.txt, migrate_search.py).
+# The prefix indexes are COLLATE "C" so one index both narrows a LIKE 'abc%' and hands
+# rows back in order, whatever the database collation is.
+FULL_NAME = "lower(first_name || ' ' || COALESCE(last_name, ''))"
+SID_KEY = '(sid::text) COLLATE "C"'
+NAME_KEY = f'({FULL_NAME}) COLLATE "C"'
+LAST_NAME_KEY = '(lower(last_name)) COLLATE "C"'
+SEARCH_COLUMNS = ", ".join(STUDENT_LIST_FIELDS)  # typeahead never sends the embed
+SEARCH_MODES = ("contains", "prefix")
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX = 50
+TRIGRAM_MIN_LEN = 3  # shorter patterns have no trigram to look up
+SID_PREFIX_PATTERN = re.compile(r"^E\d{0,4}$", re.IGNORECASE)
+NAME_PATTERN = re.compile(r"^[A-Za-z\s]+$")  # Only letters and spaces
+
+TRIGRAM_RECHECK = 60  # seconds before a missing trigram index is looked up again
+
+_trigram_index = (False, None)  # (students_full_name_trgm_idx exists?, monotonic time of the lookup)
+
 
-    query = query.strip()
+def _has_trigram_index(cur):
+    """
+    Once found the index is assumed to stay (the query works without it anyway); a miss
+    is looked up again after TRIGRAM_RECHECK, so migrate_search applies without a restart.
+    """
+    global _trigram_index
+    found, checked = _trigram_index
+    if not found and (checked is None or time.monotonic() - checked > TRIGRAM_RECHECK):
+        cur.execute("SELECT EXISTS (SELECT 1 FROM pg_indexes WHERE indexname = 'students_full_name_trgm_idx');")
+        _trigram_index = (cur.fetchone()[0], time.monotonic())
+    return _trigram_index[0]
 
-    # Regex patterns
-    sid_pattern = r"^E\d{4}$"  # SID like E1234
-    name_pattern = r"^[A-Za-z\s]+$"  # Only letters and spaces
 
-    # Decide if the query is SID or name
-    is_sid = bool(re.match(sid_pattern, query))
-    is_name = bool(re.match(name_pattern, query))
+def _prefix_hits(is_sid, is_name, trigram):
+    """
+    One branch per rank, each reading at most `limit` rows off its own index in key
+    order, so a one-letter prefix costs the same as a full name.
+    """
+    hits = []
+    if is_sid:
+        hits.append("SELECT sid, 0, 0, '' FROM students WHERE sid = %(sid)s")
+        hits.append(f"SELECT sid, 1, 0, {SID_KEY} FROM students WHERE {SID_KEY} LIKE %(sid_prefix)s "
+                    f"ORDER BY {SID_KEY} LIMIT %(limit)s")
+    if is_name:
+        hits.append(f"SELECT sid, 2, 0, {NAME_KEY} FROM students WHERE {NAME_KEY} LIKE %(prefix)s "
+                    f"ORDER BY {NAME_KEY} LIMIT %(limit)s")
+        hits.append(f"SELECT sid, 3, 0, {LAST_NAME_KEY} FROM students WHERE {LAST_NAME_KEY} LIKE %(prefix)s "
+                    f"ORDER BY {LAST_NAME_KEY} LIMIT %(limit)s")
+        if trigram:
+            hits.append(f"SELECT sid, 4, strpos({FULL_NAME}, %(term)s), {NAME_KEY} FROM students "
+                        f"WHERE {FULL_NAME} LIKE '%%' || %(term)s || '%%' "
+                        f"ORDER BY 3, 4 LIMIT %(limit)s")
+    return " UNION ALL ".join(f"({hit})" for hit in hits)
 
+
+def search_rows(cur, query, mode="contains", limit=None):
+    """
+    Runs a search on an open cursor. "contains" is the admin search the frontend has
+    always used: full Student rows (embed included) whose sid, first name or last name
+    contains the query, by sid. "prefix" is the opt-in typeahead: dicts without the
+    embed, ranked exact sid, sid prefix, name prefix, last-name prefix, then (with
+    pg_trgm) name substrings. Raises ValueError for a query that is neither a sid nor
+    a name.
+    """
+    if mode == "contains":
+        query = query.strip()
+    else:
+        query = " ".join(query.split())
+    is_sid = bool((SID_PREFIX_PATTERN if mode == "prefix" else SID_PATTERN).match(query))
+    is_name = bool(NAME_PATTERN.match(query))
     if not (is_sid or is_name):
-        return {"status": "error", "message": "Invalid search query format"}, 400
+        raise ValueError("Invalid search query format")
+
+    if mode == "contains":
+        if is_sid:
+            cur.execute(f"""
+                SELECT {STUDENT_COLUMNS}
+                FROM students
+                WHERE sid ILIKE %s
+                ORDER BY sid
+                LIMIT %s;
+            """, (f"%{query}%", limit))
+        else:
+            cur.execute(f"""
+                SELECT {STUDENT_COLUMNS}
+                FROM students
+                WHERE first_name ILIKE %s
+                   OR last_name ILIKE %s
+                ORDER BY sid
+                LIMIT %s;
+            """, (f"%{query}%", f"%{query}%", limit))
+        return fetch_all(cur, Student)
+
+    trigram = is_name and len(query) >= TRIGRAM_MIN_LEN and _has_trigram_index(cur)
+    cur.execute(f"""
+        WITH hits (sid, rank, pos, key) AS ({_prefix_hits(is_sid, is_name, trigram)})
+        SELECT {SEARCH_COLUMNS}, best.rank
+        FROM (
+            SELECT DISTINCT ON (sid) sid, rank, pos, key FROM hits ORDER BY sid, rank
+        ) best
+        JOIN students USING (sid)
+        ORDER BY best.rank, best.pos, best.key, sid
+        LIMIT %(limit)s;
+    """, {"sid": query.upper(), "sid_prefix": query.upper() + "%", "prefix": query.lower() + "%",
+          "term": query.lower(), "limit": limit})
+    names = [desc[0] for desc in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def search_students(query, mode=None, limit=None):
+    if not query:
+        return {"status": "error", "message": "Missing search query"}, 400
+
+    mode = mode or "contains"
+    if mode not in SEARCH_MODES:
+        return {"status": "error", "message": f"Unknown search mode: {mode} (use {', '.join(SEARCH_MODES)})"}, 400
+    try:
+        limit = parse_limit(limit)
+        if mode == "prefix":
+            limit = min(limit or TYPEAHEAD_LIMIT, TYPEAHEAD_MAX)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
 
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            if is_sid:
-                cur.execute("""
-                            SELECT *
-                            FROM students
-                            WHERE sid ILIKE %s
-                            ORDER BY sid;
-                            """, (f"%{query}%",))
-            else:  # treat as name search
-                cur.execute("""
-                            SELECT *
-                            FROM students
-                            WHERE first_name ILIKE %s
-                               OR last_name ILIKE %s
-                            ORDER BY sid;
-                            """, (f"%{query}%", f"%{query}%"))
-
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
+            return {"status": "success", "data": search_rows(cur, query.strip(), mode, limit)}, 200
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}, 400
     finally:
         put_conn(conn)
 
@@ -151,13 +358,11 @@ def recently_modified_students(since):
     conn = get_conn()
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT * FROM students
+            cur.execute(f"""
+                SELECT {STUDENT_COLUMNS} FROM students
                 WHERE modified_at > %s
                 ORDER BY modified_at DESC;
             """, (since,))
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
-            return {"status": "success", "data": [dict(zip(columns, r)) for r in rows]}, 200
+            return {"status": "success", "data": fetch_all(cur, Student)}, 200
     finally:
         put_conn(conn)
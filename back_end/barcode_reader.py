@@ -0,0 +1,126 @@
+# back_end/barcode_reader.py
+import threading
+import cv2
+from pyzbar.pyzbar import decode, ZBarSymbol
+from back_end.stage_metrics import StageTimer
+
+LOCATE_WIDTH = 480        # candidate search runs on a downscaled copy of the ROI
+MAX_CANDIDATES = 3        # biggest regions only; a badge shows one barcode
+MIN_CANDIDATE_AREA = 0.005  # of the downscaled ROI
+MIN_ASPECT = 1.5          # Code128 is wider than it is tall
+CANDIDATE_PAD = 0.15      # keep the quiet zone around the bars
+SYMBOLS = [ZBarSymbol.CODE128]
+
+
+class BarcodeReader:
+    """
+    Barcode stage for scan_worker. Each call:
+      1. downscales the ROI to grayscale and finds bar-like regions (strong horizontal
+         gradient, closed into blobs)
+      2. decodes those crops at the downscaled size
+      3. only if that fails, decodes the same crops from the full-resolution ROI
+      4. only if all of that fails (or nothing was found), decodes the whole ROI at full
+         resolution, as the reader did before the localizer
+    So a thin or small badge the localizer misses is still read, just at the old cost.
+    """
+
+    def __init__(self, locate_width=LOCATE_WIDTH):
+        self.locate_width = locate_width
+        self._lock = threading.Lock()
+        self.timer = StageTimer()
+        self.calls = 0
+        self.hits = 0
+        self.hits_by_path = {"downscaled": 0, "full": 0, "fallback": 0, "whole": 0}
+        self.candidates = 0
+
+    # ---------------- LOCATE ----------------
+    def locate(self, gray):
+        """Bounding boxes (x, y, w, h) of likely barcodes in a (small) grayscale image."""
+        grad_x = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3)
+        grad = cv2.subtract(cv2.convertScaleAbs(grad_x), cv2.convertScaleAbs(grad_y))
+        grad = cv2.blur(grad, (5, 5))
+        _, mask = cv2.threshold(grad, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+
+        # close the gaps between bars, then drop specks
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 5)))
+        mask = cv2.erode(mask, None, iterations=3)
+        mask = cv2.dilate(mask, None, iterations=3)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        min_area = MIN_CANDIDATE_AREA * gray.shape[0] * gray.shape[1]
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h >= min_area and w >= MIN_ASPECT * h:
+                boxes.append((x, y, w, h))
+        boxes.sort(key=lambda b: b[2] * b[3], reverse=True)
+        return boxes[:MAX_CANDIDATES]
+
+    @staticmethod
+    def _pad(box, shape):
+        x, y, w, h = box
+        px, py = int(w * CANDIDATE_PAD), int(h * CANDIDATE_PAD) + 2
+        x0, y0 = max(0, x - px), max(0, y - py)
+        x1, y1 = min(shape[1], x + w + px), min(shape[0], y + h + py)
+        return x0, y0, x1, y1
+
+    # ---------------- DECODE ----------------
+    def read(self, roi):
+        """Decoded sid string from a BGR ROI, or None."""
+        with self.timer.measure():
+            sid, path = self._read(roi)
+        with self._lock:
+            self.calls += 1
+            if sid is not None:
+                self.hits += 1
+                self.hits_by_path[path] += 1
+        return sid
+
+    def _read(self, roi):
+        h, w = roi.shape[:2]
+        scale = min(1.0, self.locate_width / w)
+        small = roi if scale == 1.0 else cv2.resize(roi, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        boxes = self.locate(small)
+        with self._lock:
+            self.candidates += len(boxes)
+        if not boxes:
+            sid = _first(decode(small, symbols=SYMBOLS))
+            if sid is not None or scale == 1.0:  # at scale 1 `small` already is the whole ROI
+                return sid, "fallback"
+            return self._read_whole(roi)
+
+        crops = [self._pad(box, small.shape) for box in boxes]
+        for x0, y0, x1, y1 in crops:
+            sid = _first(decode(small[y0:y1, x0:x1], symbols=SYMBOLS))
+            if sid is not None:
+                return sid, "downscaled"
+
+        if scale < 1.0:
+            # thin bars can vanish when downscaled: same crops at full resolution
+            for x0, y0, x1, y1 in crops:
+                x0, y0, x1, y1 = (int(v / scale) for v in (x0, y0, x1, y1))
+                crop = cv2.cvtColor(roi[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+                sid = _first(decode(crop, symbols=SYMBOLS))
+                if sid is not None:
+                    return sid, "full"
+        return self._read_whole(roi)
+
+    @staticmethod
+    def _read_whole(roi):
+        """Last resort: the full-resolution ROI, for badges the candidates didn't cover."""
+        sid = _first(decode(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), symbols=SYMBOLS))
+        return sid, ("whole" if sid is not None else None)
+
+    def stats(self):
+        with self._lock:
+            rate = self.hits / self.calls if self.calls else 0.0
+            return {"calls": self.calls, "hits": self.hits, "hit_rate": round(rate, 3),
+                    "hits_by_path": dict(self.hits_by_path), "candidates": self.candidates,
+                    "latency": self.timer.snapshot()}
+
+
+def _first(decoded):
+    return decoded[0].data.decode("utf-8").strip() if decoded else None
@@ -0,0 +1,94 @@
+# back_end/benchmarks/db_concurrency.py
+# Parallel GET /api/students/<sid> and GET /api/phones/ against a running server, with
+# the connection pool's own numbers (acquire wait, timeouts, recycled connections) from
+# /api/metrics before and after.
+#
+# Usage:
+#   python -m back_end.server.server_main            # or back_end.server.asgi_main
+#   python -m back_end.benchmarks.db_concurrency --url http://localhost:5000 \
+#       --concurrency 64 --requests 4000 [--phones-share 0.2] [--out result.json]
+#
+# Student sids are taken from GET /api/students/ once up front (or --sid, repeatable).
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from back_end.benchmarks.server_load import http_request, summarize
+
+
+def _pool_stats(base):
+    status, raw = http_request(base + "/api/metrics")
+    return json.loads(raw)["data"].get("db") if status == 200 else None
+
+
+def run(base, sids, requests, concurrency, phones_share=0.2, seed=0):
+    rnd = random.Random(seed)
+    plan = ["/api/phones/" if rnd.random() < phones_share else f"/api/students/{rnd.choice(sids)}"
+            for _ in range(requests)]
+    samples = {"student": [], "phones": []}
+    errors = {"student": 0, "phones": 0}
+
+    def one(path):
+        start = time.perf_counter()
+        try:
+            status, _ = http_request(base + path)
+        except Exception:
+            status = None
+        return path, (time.perf_counter() - start) * 1000, status
+
+    before = _pool_stats(base)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for path, ms, status in pool.map(one, plan):
+            kind = "phones" if path == "/api/phones/" else "student"
+            samples[kind].append(ms)
+            if status != 200:
+                errors[kind] += 1
+    wall = time.perf_counter() - start
+
+    return {
+        "url": base,
+        "concurrency": concurrency,
+        "requests": requests,
+        "wall_seconds": round(wall, 3),
+        "rps": round(requests / wall, 1),
+        "student_by_sid": summarize(samples["student"], errors["student"], wall),
+        "list_phones": summarize(samples["phones"], errors["phones"], wall),
+        "pool_before": before,
+        "pool_after": _pool_stats(base),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--sid", action="append", default=[], help="student id to request (repeatable)")
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--phones-share", type=float, default=0.2, help="fraction of requests that list phones")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    sids = args.sid
+    if not sids:
+        status, raw = http_request(base + "/api/students/")
+        if status != 200:
+            raise SystemExit(f"Could not list students ({status}); pass --sid")
+        sids = [row["sid"] for row in json.loads(raw)["data"]]
+    if not sids:
+        raise SystemExit("No students to request")
+
+    result = run(base, sids, args.requests, args.concurrency, args.phones_share)
+    report = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# back_end/benchmarks/embedding_format_bench.py
+# Per-student size and decode time of an embedding in the old FLOAT8[] / "{...}" text
+# forms against float32 BYTEA / base64. "fetch" is what the student cache and face index
+# pay per row read from Postgres, "api" is what create/update pay for the posted embed.
+# Usage: python -m back_end.benchmarks.embedding_format_bench [--db]
+#   --db  measures the stored sizes with pg_column_size instead of the FLOAT8[]/BYTEA layout
+import argparse
+import time
+import numpy as np
+from psycopg2.extensions import FLOATARRAY
+from back_end.embeddings import decode_embed, embed_to_base64, embed_to_bytes, parse_pg_array
+
+DIM = 128
+STUDENTS = 2000
+ARRAY_HEADER = 24  # varlena + ndim/flags/elemtype + one dimension and lower bound
+BYTEA_HEADER = 4
+
+
+def per_student_us(fn, values):
+    start = time.perf_counter()
+    for value in values:
+        fn(value)
+    return (time.perf_counter() - start) * 1e6 / len(values)
+
+
+def stored_sizes(vec):
+    from back_end.Database.db import get_conn, put_conn
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_column_size(%s::FLOAT8[]), pg_column_size(%s::BYTEA);",
+                        (vec.astype(np.float64).tolist(), embed_to_bytes(vec)))
+            return cur.fetchone()
+    finally:
+        put_conn(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vecs = rng.standard_normal((STUDENTS, DIM)).astype(np.float32)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    # what each path actually receives
+    pg_text = ["{" + ",".join(repr(x) for x in v.astype(np.float64).tolist()) + "}" for v in vecs]
+    api_literal = ["{" + ",".join(str(x) for x in v.tolist()) + "}" for v in vecs]
+    raw = [memoryview(embed_to_bytes(v)) for v in vecs]
+    b64 = [embed_to_base64(v) for v in vecs]
+
+    if args.db:
+        old_stored, new_stored = stored_sizes(vecs[0])
+    else:
+        old_stored, new_stored = ARRAY_HEADER + 8 * DIM, BYTEA_HEADER + 4 * DIM
+
+    print(f"{DIM}-dim embedding, {STUDENTS} students")
+    print(f"stored   | FLOAT8[] {old_stored:>5} B | BYTEA  {new_stored:>5} B | saved {old_stored - new_stored} B")
+    old_api = sum(len(s) for s in api_literal) / STUDENTS
+    new_api = sum(len(s) for s in b64) / STUDENTS
+    print(f"api body | literal  {old_api:>5.0f} B | base64 {new_api:>5.0f} B | saved {old_api - new_api:.0f} B")
+
+    old_fetch = per_student_us(lambda s: np.array(FLOATARRAY(s, None), dtype=np.float32), pg_text)
+    new_fetch = per_student_us(decode_embed, raw)
+    print(f"fetch    | FLOAT8[] {old_fetch:>6.1f} us | BYTEA  {new_fetch:>6.1f} us | {old_fetch / new_fetch:.0f}x")
+    old_parse = per_student_us(parse_pg_array, api_literal)
+    new_parse = per_student_us(decode_embed, b64)
+    print(f"api      | literal  {old_parse:>6.1f} us | base64 {new_parse:>6.1f} us | {old_parse / new_parse:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# back_end/benchmarks/face_index_bench.py
+# Usage: python -m back_end.benchmarks.face_index_bench
+import time
+import numpy as np
+from back_end.face_index import FaceIndex
+
+SIZES = (1_000, 10_000, 100_000)
+DIM = 128
+QUERIES = 200
+
+
+def random_unit(n, rng):
+    vecs = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def bench(n, rng):
+    enrolled = random_unit(n, rng)
+    index = FaceIndex()
+    index.load((f"E{i:06d}", enrolled[i]) for i in range(n))
+
+    queries = enrolled[rng.integers(0, n, QUERIES)]
+    timings = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings = np.array(timings)
+    print(f"{n:>8} faces | median {np.median(timings):.3f} ms | p99 {np.percentile(timings, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        bench(size, rng)
@@ -0,0 +1,63 @@
+# back_end/benchmarks/face_index_recall.py
+# Usage: python -m back_end.benchmarks.face_index_recall
+import tempfile
+import time
+import numpy as np
+from back_end.face_index import FaceIndex, IVFFaceIndex
+
+SIZES = (10_000, 100_000)
+DIM = 128
+QUERIES = 500
+NOISE = 0.06  # per-dimension noise on the enrolled vector, roughly a re-capture of the same face
+
+
+def random_unit(shape, rng):
+    vecs = rng.standard_normal(shape).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=-1, keepdims=True)
+
+
+def timed_search(index, queries):
+    results, timings = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(index.search(q, k=1)[0][0])
+        timings.append((time.perf_counter() - start) * 1000)
+    return results, np.array(timings)
+
+
+def bench(n, rng):
+    enrolled = random_unit((n, DIM), rng)
+    rows = [(f"E{i:06d}", enrolled[i]) for i in range(n)]
+    picks = rng.integers(0, n, QUERIES)
+    queries = enrolled[picks] + rng.normal(0, NOISE, (QUERIES, DIM)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = FaceIndex()
+    exact.load(rows)
+    truth, exact_ms = timed_search(exact, queries)
+
+    ivf = IVFFaceIndex()
+    start = time.perf_counter()
+    ivf.load(rows)
+    train_s = time.perf_counter() - start
+    approx, ivf_ms = timed_search(ivf, queries)
+    recall = np.mean([a == t for a, t in zip(approx, truth)])
+
+    with tempfile.TemporaryDirectory() as path:
+        ivf.save(path, watermark="bench")
+        reopened = IVFFaceIndex()
+        start = time.perf_counter()
+        assert reopened.open(path, watermark="bench")
+        open_ms = (time.perf_counter() - start) * 1000
+        reopened_results, _ = timed_search(reopened, queries[:50])
+        assert reopened_results == approx[:50]
+
+    print(f"{n:>8} faces | exact median {np.median(exact_ms):.3f} ms | "
+          f"ivf median {np.median(ivf_ms):.3f} ms | recall@1 {recall:.3f} | "
+          f"train {train_s:.1f} s | mmap open {open_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        bench(size, rng)
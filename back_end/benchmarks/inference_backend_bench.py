@@ -0,0 +1,77 @@
+# back_end/benchmarks/inference_backend_bench.py
+# Usage: python -m back_end.benchmarks.inference_backend_bench [image_or_video ...]
+# Compares the in-process thread backend with the shared-memory process backend.
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+import cv2
+import numpy as np
+from back_end.face_engine import FaceEngine
+from back_end.inference_pool import ProcessFaceEngine, PROCESSES
+from back_end.inference_service import InferenceService
+
+KIOSKS = 4
+DURATION = 20  # seconds per backend
+SCALED_WIDTH = 720
+
+
+def load_frames(paths, limit=64):
+    frames = []
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        while len(frames) < limit:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            scale = SCALED_WIDTH / frame.shape[1]
+            frames.append(cv2.resize(frame, (SCALED_WIDTH, int(frame.shape[0] * scale))))
+        cap.release()
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (405, SCALED_WIDTH, 3), dtype=np.uint8) for _ in range(8)]
+    return frames
+
+
+def kiosk(service, frames, key, stop, latencies, dropped):
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        future = service.submit(frames[i % len(frames)], key=key)
+        try:
+            future.result()
+            latencies.append((time.perf_counter() - start) * 1000)
+        except CancelledError:
+            dropped.append(1)
+        i += 1
+
+
+def run(name, service, frames):
+    service.engine.load()
+    service.start()
+    stop = threading.Event()
+    latencies, dropped = [], []
+    threads = [threading.Thread(target=kiosk, args=(service, frames, k, stop, latencies, dropped))
+               for k in range(KIOSKS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(DURATION)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    lat = np.array(latencies) if latencies else np.zeros(1)
+    print(f"{name:>8} | {len(latencies) / elapsed:6.1f} frames/s | "
+          f"p50 {np.percentile(lat, 50):7.1f} ms | p99 {np.percentile(lat, 99):7.1f} ms | dropped {len(dropped)}")
+
+
+if __name__ == "__main__":
+    frames = load_frames(sys.argv[1:])
+    run("thread", InferenceService(engine=FaceEngine()), frames)
+    process_engine = ProcessFaceEngine()
+    try:
+        run("process", InferenceService(engine=process_engine, workers=PROCESSES), frames)
+    finally:
+        process_engine.close()
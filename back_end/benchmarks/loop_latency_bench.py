@@ -0,0 +1,76 @@
+# back_end/benchmarks/loop_latency_bench.py
+# Usage: python -m back_end.benchmarks.loop_latency_bench
+# Event-loop lag with N WebRTC-style viewers pulling 30fps frames:
+#   polling  - the old recv(): threading.Event.wait(timeout=0.01) + asyncio.sleep(0.001), shared Event
+#   ring     - RingReader.read_async(), woken by call_soon_threadsafe from the capture thread
+import asyncio
+import threading
+import time
+import numpy as np
+from back_end.frame_ring import FrameRing
+
+VIEWERS = (1, 4)
+FPS = 30
+DURATION = 5  # seconds per run
+FRAME_SHAPE = (1080, 1920, 3)
+TICK = 0.001
+
+
+def capture(ring, event, stop):
+    frame = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    while not stop.is_set():
+        ring.write(frame, time.time())
+        event.set()
+        time.sleep(1 / FPS)
+
+
+async def polling_viewer(ring, event, counts, i):
+    while True:
+        while not event.wait(timeout=0.01):
+            await asyncio.sleep(0.001)
+        ring.latest()
+        event.clear()
+        counts[i] += 1
+
+
+async def ring_viewer(ring, event, counts, i):
+    reader = ring.reader()
+    while True:
+        await reader.read_async()
+        counts[i] += 1
+
+
+async def measure(viewer, n):
+    ring, event, stop = FrameRing(), threading.Event(), threading.Event()
+    counts = [0] * n
+    thread = threading.Thread(target=capture, args=(ring, event, stop), daemon=True)
+    thread.start()
+    tasks = [asyncio.create_task(viewer(ring, event, counts, i)) for i in range(n)]
+
+    lags = []
+    end = time.perf_counter() + DURATION
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - start - TICK) * 1000)
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    thread.join()
+
+    lags = np.array(lags)
+    per_viewer = ", ".join(f"{c / DURATION:.1f}" for c in counts)
+    print(f"{viewer.__name__:>15} x{n} | loop lag p50 {np.percentile(lags, 50):6.2f} ms | "
+          f"p99 {np.percentile(lags, 99):6.2f} ms | max {lags.max():6.2f} ms | fps per viewer [{per_viewer}]")
+
+
+async def main():
+    for n in VIEWERS:
+        await measure(polling_viewer, n)
+        await measure(ring_viewer, n)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
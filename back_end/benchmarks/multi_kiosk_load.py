@@ -0,0 +1,46 @@
+# back_end/benchmarks/multi_kiosk_load.py
+# Usage: python -m back_end.benchmarks.multi_kiosk_load clip1.mp4 clip2.mp4 ... [--copies 4] [--duration 60]
+# Drives one kiosk per recorded video (optionally several copies of each) through
+# the real capture loop, scan worker and shared inference service, without cameras.
+import argparse
+import time
+from back_end.inference_service import inference_service
+from back_end.kiosks import start_kiosks, get_state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--copies", type=int, default=1)
+    parser.add_argument("--duration", type=float, default=60)
+    args = parser.parse_args()
+
+    sources = {}
+    for copy in range(args.copies):
+        for i, video in enumerate(args.videos):
+            sources[f"load{i}_{copy}"] = video
+
+    inference_service.engine.load()
+    inference_service.start()
+    states = [s for s in start_kiosks(sources, debugwindow=False, debugroi=False) if s.kiosk_id in sources]
+
+    start = time.time()
+    while time.time() - start < args.duration:
+        for state in states:
+            # keep every kiosk scanning; the worker stops itself on badge timeout
+            if not state.scan_request["running"]:
+                state.update_last_barcode()
+                state.stop_requested = False
+                state.scan_request["running"] = True
+        time.sleep(1)
+
+    elapsed = time.time() - start
+    for kiosk_id in sources:
+        state = get_state(kiosk_id)
+        print(f"{kiosk_id:>12} | {state.frame_count / elapsed:5.1f} fps captured | {state.scan_results}")
+    print("inference:", inference_service.stats())
+    print("engine:", inference_service.engine.metrics())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# back_end/benchmarks/nearby_bench.py
+# Spatial lookups with the cabinet full: fills every free slot, frees a random 1% so the
+# free list is scattered, then times nearest phones, nearest free slots and a bounding
+# box through the data layer, next to the old compute-and-sort query. The benchmark
+# phones are deleted at the end. Needs at least one student to own the phones.
+# Usage: python -m back_end.benchmarks.nearby_bench [--queries 500] [--box 10]
+import argparse
+import random
+import time
+import numpy as np
+from back_end.Database.db import get_conn, put_conn
+from back_end.Database.phones import (
+    GRID_SIZE, PHONE_COLUMNS, phones_near_location, free_slots_near_location, phones_in_box, slot_allocator
+)
+from back_end.benchmarks.slot_fill_bench import Filler, IMEI_PREFIX
+
+FILL_BATCH = 5000
+HOLES = 0.01
+LEGACY_QUERIES = 20
+
+LEGACY_NEARBY = f"""
+    SELECT {PHONE_COLUMNS}, sqrt(power(location[1] - %s, 2) + power(location[2] - %s, 2)) AS distance
+    FROM phones
+    ORDER BY distance
+    LIMIT %s;
+"""
+
+
+def latency(fn, points):
+    timings = []
+    for x, y in points:
+        start = time.perf_counter()
+        fn(x, y)
+        timings.append((time.perf_counter() - start) * 1000)
+    return f"median {np.median(timings):.3f} ms | p99 {np.percentile(timings, 99):.3f} ms"
+
+
+def fill(conn, cur, sid, rnd):
+    filler = Filler(conn, cur, sid)
+    free = slot_allocator.free_count()
+    while free:
+        count = min(FILL_BATCH, free)
+        filler.insert(count)
+        free -= count
+    cur.execute("SELECT pid FROM phones WHERE imei LIKE %s;", (IMEI_PREFIX + "%",))
+    pids = [pid for (pid,) in cur.fetchall()]
+    holes = rnd.sample(pids, int(len(pids) * HOLES))
+    cur.execute("DELETE FROM phones WHERE pid = ANY(%s);", (holes,))
+    conn.commit()
+    # what autovacuum would have done by now: drop the claimed slots' dead index entries
+    conn.autocommit = True
+    try:
+        cur.execute("VACUUM ANALYZE free_slots;")
+        cur.execute("VACUUM ANALYZE phones;")
+    finally:
+        conn.autocommit = False
+    return len(pids) - len(holes)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--box", type=int, default=10, help="side of the bounding-box query")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    points = [(rnd.randint(1, GRID_SIZE[0]), rnd.randint(1, GRID_SIZE[1])) for _ in range(args.queries)]
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT sid FROM students ORDER BY sid LIMIT 1;")
+            row = cur.fetchone()
+            if row is None:
+                raise SystemExit("No students to own the phones; add one first")
+            added = fill(conn, cur, row[0], rnd)
+            cur.execute("SELECT COUNT(*) FROM phones WHERE location IS NOT NULL;")
+            print(f"{cur.fetchone()[0]} of {GRID_SIZE[0] * GRID_SIZE[1]} slots used "
+                  f"({added} benchmark phones), {args.queries} queries each")
+
+            def box(x, y):
+                stream, _ = phones_in_box(x, y, x + args.box - 1, y + args.box - 1)
+                for _ in stream.rows():
+                    pass
+
+            def legacy(x, y):
+                cur.execute(LEGACY_NEARBY, (x, y, 10))
+                cur.fetchall()
+
+            phones_near_location(1, 1)  # PREPARE on the pooled connection outside the timings
+            free_slots_near_location(1, 1)
+            print(f"nearest 10 phones     | {latency(lambda x, y: phones_near_location(x, y, 10), points)}")
+            print(f"nearest 10 free slots | {latency(lambda x, y: free_slots_near_location(x, y, 10), points)}")
+            print(f"{f'{args.box}x{args.box} box':<21} | {latency(box, points)}")
+            print(f"old nearby query      | {latency(legacy, points[:LEGACY_QUERIES])}")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM phones WHERE imei LIKE %s;", (IMEI_PREFIX + "%",))
+            print(f"removed {cur.rowcount} benchmark phones")
+        conn.commit()
+        put_conn(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# back_end/benchmarks/phone_stats_bench.py
+# /api/phones/stats read from phone_counts next to the old five COUNT(*) FILTER scan,
+# with a realistic spread of models and conditions, plus what the counting triggers
+# add to single and bulk inserts (timed with the triggers on, then disabled inside a
+# transaction that is rolled back). The benchmark phones are deleted at the end.
+# Needs at least one student to own the phones.
+# Usage: python -m back_end.benchmarks.phone_stats_bench [--phones 100000] [--queries 200]
+import argparse
+import random
+import time
+from psycopg2.extras import execute_values
+from back_end.Database.db import get_conn, put_conn
+from back_end.Database.phones import phone_stats, slot_allocator, PHONE_CONDITIONS
+from back_end.benchmarks.slot_fill_bench import timed_ms
+
+IMEI_PREFIX = "STAT"
+MODELS = [f"{brand} {n}" for brand in ("Pixel", "Galaxy S", "iPhone", "Moto G", "Redmi Note") for n in range(6, 16)]
+LOAD_BATCH = 5000
+SINGLE_INSERTS = 200
+BULK_ROWS = 5000
+COUNT_TRIGGERS = ("phones_count_insert", "phones_count_update", "phones_count_delete")
+
+LEGACY_STATS = """
+    SELECT COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE is_stored) AS stored,
+           COUNT(*) FILTER (WHERE NOT is_stored) AS in_use,
+           COUNT(*) FILTER (WHERE cond = 'Damaged') AS damaged,
+           COUNT(*) FILTER (WHERE cond = 'Broken') AS broken
+    FROM phones;
+"""
+INSERT_SQL = "INSERT INTO phones (sid, model, imei, cond, is_stored, location) VALUES %s"
+
+
+class PhoneMaker:
+    def __init__(self, sid, rnd):
+        self.sid = sid
+        self.rnd = rnd
+        self.serial = 0
+
+    def rows(self, slots):
+        rows = []
+        for slot in slots:
+            self.serial += 1
+            cond = self.rnd.choice(PHONE_CONDITIONS + (None,))
+            rows.append((self.sid, self.rnd.choice(MODELS), f"{IMEI_PREFIX}{self.serial:016d}", cond,
+                         self.rnd.random() < 0.7, slot))
+        return rows
+
+    def insert(self, cur, count):
+        rows = self.rows(slot_allocator.claim(cur, count))
+        execute_values(cur, INSERT_SQL, rows, page_size=len(rows))
+
+
+def write_costs(conn, cur, maker):
+    """(single insert ms, bulk insert ms) in a transaction that is rolled back."""
+    try:
+        single = timed_ms(lambda: maker.insert(cur, 1), SINGLE_INSERTS)
+        bulk = timed_ms(lambda: maker.insert(cur, BULK_ROWS), 3)
+        return single, bulk
+    finally:
+        conn.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--phones", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT sid FROM students ORDER BY sid LIMIT 1;")
+            row = cur.fetchone()
+            if row is None:
+                raise SystemExit("No students to own the phones; add one first")
+            maker = PhoneMaker(row[0], random.Random(0))
+
+            start = time.perf_counter()
+            for done in range(0, args.phones, LOAD_BATCH):
+                maker.insert(cur, min(LOAD_BATCH, args.phones - done))
+                conn.commit()
+            cur.execute("ANALYZE phones;")
+            conn.commit()
+            cur.execute("SELECT COUNT(*) FROM phones;")
+            total = cur.fetchone()[0]
+            stats = phone_stats()[0]["data"]
+            assert stats.total == total, "phone_counts out of step with phones"
+            print(f"{total} phones ({args.phones} loaded in {time.perf_counter() - start:.1f} s), "
+                  f"{len(stats.by_model)} models, {len(stats.by_condition)} conditions")
+
+            def legacy():
+                cur.execute(LEGACY_STATS)
+                cur.fetchone()
+
+            print(f"stats from phone_counts | median {timed_ms(phone_stats, args.queries):8.3f} ms "
+                  f"(with breakdowns)")
+            print(f"old COUNT(*) FILTER     | median {timed_ms(legacy, args.queries):8.3f} ms "
+                  f"(totals only)")
+
+            single, bulk = write_costs(conn, cur, maker)
+            for name in COUNT_TRIGGERS:
+                cur.execute(f"ALTER TABLE phones DISABLE TRIGGER {name};")
+            bare_single, bare_bulk = write_costs(conn, cur, maker)  # the rollback re-enables them
+            print(f"single insert           | {single:.3f} ms with counters, {bare_single:.3f} ms without")
+            print(f"{f'{BULK_ROWS}-row insert':<23} | {bulk:.1f} ms with counters, {bare_bulk:.1f} ms without")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM phones WHERE imei LIKE %s;", (IMEI_PREFIX + "%",))
+            print(f"removed {cur.rowcount} benchmark phones")
+        conn.commit()
+        put_conn(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# back_end/benchmarks/replay.py
+# Offline replay of recorded scans through process_frame + scan_worker on a fake clock.
+#
+# Usage:
+#   python -m back_end.benchmarks.replay clip.mp4 --fixture students.json [--realtime] [--out result.json]
+#   python -m back_end.benchmarks.replay frames_dir/ --fps 30 --enroll E1234=photo.jpg
+#
+# The fixture is {"E1234": {"first_name": ..., "last_name": ..., "embed": [...]}}; --enroll
+# adds a student whose embedding is computed from a photo. No Postgres or Flask is needed.
+#
+# Default (lockstep) mode writes the next frame only once the scan worker has read the
+# previous one and runs inference inline, so the fake-clock times measure the pipeline's
+# scheduling logic. --realtime paces frames at the source fps through the shared-style
+# InferenceService, so frames can be dropped and inference latency shows in the timings.
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+import cv2
+from back_end.embeddings import l2_normalize, decode_embed
+from back_end.inference_service import InferenceService, inference_service
+from back_end.scanner_loop import process_frame
+from back_end.scanner_state import ScannerState
+from back_end.scanner_worker import scan_worker
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FixtureStudents:
+    """Stands in for the student cache: sid -> row with a normalized float32 embed."""
+
+    def __init__(self, rows=None):
+        self._rows = {}
+        for sid, row in (rows or {}).items():
+            self.add(sid, row)
+
+    def add(self, sid, row):
+        row = dict(row, sid=sid)
+        row["embed"] = l2_normalize(decode_embed(row["embed"]))
+        self._rows[sid] = row
+
+    def get(self, sid):
+        return self._rows.get(sid)
+
+
+class SyncInference:
+    """Lockstep mode: the embedding is computed inline on the scan worker's thread."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def submit(self, img, key=None, timestamp=None):
+        future = Future()
+        future.set_result(self.engine.largest_face_embedding(img))
+        return future
+
+    def stats(self):
+        return {}
+
+
+def iter_frames(source, fps):
+    if os.path.isdir(source) or any(ch in source for ch in "*?["):
+        pattern = os.path.join(source, "*") if os.path.isdir(source) else source
+        paths = sorted(p for p in glob.glob(pattern) if p.lower().endswith(IMAGE_EXTS))
+        return fps, (cv2.imread(p) for p in paths)
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise SystemExit(f"Cannot open {source}")
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or fps
+
+    def frames():
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame
+        cap.release()
+
+    return video_fps, frames()
+
+
+def replay(source, students, fps=30.0, realtime=False):
+    engine = inference_service.engine
+    engine.load()
+
+    clock = FakeClock()
+    state = ScannerState("replay")
+    state.clock = clock
+    if realtime:
+        inference = InferenceService(engine=engine, clock=clock)
+        inference.start()
+    else:
+        inference = SyncInference(engine)
+
+    marks = {"time_to_barcode": None, "time_to_face_verify": None}
+
+    def on_status(results):
+        if results.get("barcode_verified") and marks["time_to_barcode"] is None:
+            marks["time_to_barcode"] = round(clock.now, 3)
+        if results.get("face_verified") and marks["time_to_face_verify"] is None:
+            marks["time_to_face_verify"] = round(clock.now, 3)
+
+    state.register_callback(on_status)
+    state.update_last_barcode()
+    state.scan_request["running"] = True
+    worker = threading.Thread(target=scan_worker, args=(state, inference, students.get), daemon=True)
+    worker.start()
+
+    while state.scan_pipeline is None and worker.is_alive():
+        time.sleep(0.001)
+    pipeline = state.scan_pipeline
+
+    fps, frames = iter_frames(source, fps)
+    fed = 0
+    wall_start = time.perf_counter()
+    for frame in frames:
+        if frame is None:
+            continue
+        if not worker.is_alive():
+            break
+        clock.now = fed / fps
+        process_frame(frame, clock.now, debug=False, state=state)
+        seq = state.raw_frames.seq
+        fed += 1
+        if realtime:
+            delay = wall_start + fed / fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            # every stage (and the fusion step after it) is done with this frame
+            while worker.is_alive() and not pipeline.settled(seq):
+                time.sleep(0.0005)
+
+    state.stop_requested = True
+    worker.join(timeout=5)
+
+    return {
+        "source": source,
+        "mode": "realtime" if realtime else "lockstep",
+        "fps": fps,
+        "frames_fed": fed,
+        "replayed_seconds": round(fed / fps, 3),
+        "wall_seconds": round(time.perf_counter() - wall_start, 3),
+        **marks,
+        "frames_dropped": state.frames_dropped,
+        "result": dict(state.scan_results),
+        "stages": state.stage_metrics.snapshot(),
+        "channels": pipeline.stats()["channels"] if pipeline is not None else None,
+        "barcode": state.barcode_reader.stats() if state.barcode_reader is not None else None,
+        "engine": engine.metrics(),
+        "inference": inference.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", help="video file, image directory or glob")
+    parser.add_argument("--fixture", help="JSON file of students keyed by sid")
+    parser.add_argument("--enroll", action="append", default=[], help="sid=photo.jpg, embed computed from the photo")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate for image sequences")
+    parser.add_argument("--realtime", action="store_true")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    students = FixtureStudents()
+    if args.fixture:
+        with open(args.fixture) as f:
+            students = FixtureStudents(json.load(f))
+    for spec in args.enroll:
+        sid, _, photo = spec.partition("=")
+        embed = inference_service.engine.largest_face_embedding(cv2.imread(photo))
+        if embed is None:
+            raise SystemExit(f"No face found in {photo}")
+        students.add(sid, {"first_name": sid, "last_name": "", "embed": embed})
+
+    # keep the pipeline's own prints out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        result = replay(args.source, students, args.fps, args.realtime)
+    report = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# back_end/benchmarks/server_load.py
+# Load test against a running server (Flask server_main or asgi_main): concurrent API
+# calls and WebRTC offers at the same time, reporting latency percentiles per endpoint.
+#
+# Usage:
+#   python -m back_end.server.asgi_main --source clip.mp4        # or server_main
+#   python -m back_end.benchmarks.server_load --url http://localhost:5000 \
+#       --concurrency 32 --requests 1000 --offers 20 [--out result.json]
+#
+# Each offer is a real aiortc peer (recvonly video); its time is offer POST -> answer
+# applied. Offers are closed again right after, so the server's peer set stays small.
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENDPOINTS = ["/api/metrics", "/api/students/", "/api/phones/stats", "/api/phones/not_stored"]
+
+
+def http_request(url, method="GET", body=None, timeout=30):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            return res.status, res.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def summarize(samples, errors, wall):
+    if not samples:
+        return {"count": 0, "errors": errors}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    return {"count": len(samples), "errors": errors, "rps": round(len(samples) / wall, 1),
+            "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99),
+            "max_ms": round(ordered[-1], 2), "mean_ms": round(statistics.fmean(ordered), 2)}
+
+
+def api_load(base, endpoints, requests, concurrency):
+    """Spreads `requests` GETs over the endpoints with `concurrency` client threads."""
+    results = {path: [] for path in endpoints}
+    errors = {path: 0 for path in endpoints}
+
+    def one(i):
+        path = endpoints[i % len(endpoints)]
+        start = time.perf_counter()
+        try:
+            status, _ = http_request(base + path)
+        except Exception:
+            status = None
+        return path, (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for path, ms, status in pool.map(one, range(requests)):
+            results[path].append(ms)
+            # 4xx from an empty or missing database still exercises the server path
+            if status is None or status >= 500:
+                errors[path] += 1
+    wall = time.perf_counter() - start
+    return {path: summarize(results[path], errors[path], wall) for path in endpoints}
+
+
+async def _one_offer(base, mode, kiosk):
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+
+    pc = RTCPeerConnection()
+    try:
+        pc.addTransceiver("video", direction="recvonly")
+        await pc.setLocalDescription(await pc.createOffer())
+        body = {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type, "kiosk": kiosk}
+
+        start = time.perf_counter()
+        status, raw = await asyncio.to_thread(_request, f"{base}/webrtc/offer/{mode}", "POST", body)
+        if status != 200:
+            return None
+        answer = json.loads(raw)["data"]
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=answer["sdp"], type=answer["type"]))
+        return (time.perf_counter() - start) * 1000
+    except Exception:
+        return None
+    finally:
+        await pc.close()
+
+
+async def offer_load(base, offers, concurrency, mode="main", kiosk=None):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with sem:
+            return await _one_offer(base, mode, kiosk)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited() for _ in range(offers)))
+    wall = time.perf_counter() - start
+    samples = [ms for ms in results if ms is not None]
+    return summarize(samples, len(results) - len(samples), wall)
+
+
+def run(base, endpoints, requests, offers, concurrency, kiosk=None):
+    """API calls and offers run together, so offer latency includes API pressure and vice versa."""
+    async def main():
+        # peers are closed while ICE is still starting on purpose; keep those tasks quiet
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: None)
+        api = asyncio.to_thread(api_load, base, endpoints, requests, concurrency)
+        rtc = offer_load(base, offers, max(1, concurrency // 4), kiosk=kiosk) if offers else asyncio.sleep(0)
+        return await asyncio.gather(api, rtc)
+
+    start = time.perf_counter()
+    api, rtc = asyncio.run(main())
+    return {"url": base, "concurrency": concurrency, "wall_seconds": round(time.perf_counter() - start, 3),
+            "api": api, "offers": rtc if offers else None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--endpoint", action="append", default=[], help="GET path to include (repeatable)")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--offers", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--kiosk", help="kiosk id for the offers (default kiosk if omitted)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    result = run(args.url.rstrip("/"), args.endpoint or DEFAULT_ENDPOINTS, args.requests,
+                 args.offers, args.concurrency, args.kiosk)
+    report = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# back_end/benchmarks/slot_fill_bench.py
+# Fills the 500x500 cabinet to 99% through the free_slots allocator and, at a few fill
+# levels, times one phone insert against the old trigger's cell-by-cell grid walk.
+# Each batch commits, as the API would (claims made inside one long transaction leave
+# index entries later scans cannot skip); the benchmark phones are deleted at the end,
+# which hands their slots back. Needs at least one student to own the phones.
+# Usage: python -m back_end.benchmarks.slot_fill_bench [--batch 5000] [--samples 20]
+import argparse
+import time
+import numpy as np
+from psycopg2.extras import execute_values
+from back_end.Database.db import get_conn, put_conn
+from back_end.Database.phones import slot_allocator, GRID_SIZE
+
+CHECKPOINTS = (0.10, 0.50, 0.90, 0.99)
+LEGACY_SAMPLES = 3
+
+# the walk auto_assign_location used to do: one EXISTS per cell until a free one
+LEGACY_WALK = """
+CREATE FUNCTION pg_temp.legacy_first_free()
+RETURNS SMALLINT[] AS $$
+DECLARE
+    x SMALLINT := 1;
+    y SMALLINT := 1;
+BEGIN
+    LOOP
+        EXIT WHEN NOT EXISTS (SELECT 1 FROM phones WHERE location = ARRAY[x, y]);
+        IF x < 500 THEN
+            x := x + 1;
+        ELSE
+            x := 1;
+            y := y + 1;
+        END IF;
+        IF y > 500 THEN
+            RETURN NULL;
+        END IF;
+    END LOOP;
+    RETURN ARRAY[x, y];
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+INSERT_SQL = "INSERT INTO phones (sid, model, imei, is_stored, location) VALUES %s"
+IMEI_PREFIX = "FILL"
+
+
+class Filler:
+    def __init__(self, conn, cur, sid):
+        self.conn = conn
+        self.cur = cur
+        self.sid = sid
+        self.serial = 0
+
+    def rows(self, slots):
+        rows = []
+        for slot in slots:
+            self.serial += 1
+            rows.append((self.sid, "Bench", f"{IMEI_PREFIX}{self.serial:016d}", True, slot))
+        return rows
+
+    def insert(self, count):
+        execute_values(self.cur, INSERT_SQL, self.rows(slot_allocator.claim(self.cur, count)), page_size=count)
+        self.conn.commit()
+
+
+def timed_ms(fn, samples):
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=5000, help="slots claimed per bulk reservation")
+    parser.add_argument("--samples", type=int, default=20, help="single inserts timed per fill level")
+    args = parser.parse_args()
+
+    total = GRID_SIZE[0] * GRID_SIZE[1]
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT sid FROM students ORDER BY sid LIMIT 1;")
+            row = cur.fetchone()
+            if row is None:
+                raise SystemExit("No students to own the phones; add one first")
+            cur.execute(LEGACY_WALK)
+            cur.execute("SELECT COUNT(*) FROM phones WHERE location IS NOT NULL;")
+            used = cur.fetchone()[0]
+            filler = Filler(conn, cur, row[0])
+
+            print(f"{total} slots, {used} already used, bulk batch {args.batch}")
+            fill_seconds, bulk = 0.0, 0
+            for level in CHECKPOINTS:
+                target = int(total * level)
+                start = time.perf_counter()
+                while used < target:
+                    count = min(args.batch, target - used)
+                    filler.insert(count)
+                    used += count
+                    bulk += count
+                fill_seconds += time.perf_counter() - start
+
+                single = timed_ms(lambda: filler.insert(1), args.samples)
+                used += args.samples
+                legacy = timed_ms(lambda: cur.execute("SELECT pg_temp.legacy_first_free();"), LEGACY_SAMPLES)
+                print(f"{level:>4.0%} full | allocator insert {single:>7.2f} ms | "
+                      f"old grid walk {legacy:>9.2f} ms (lookup only)")
+
+            print(f"bulk fill to {used / total:.1%}: {bulk} phones in {fill_seconds:.1f} s "
+                  f"({bulk / fill_seconds:,.0f} phones/s incl. triggers)")
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM phones WHERE imei LIKE %s;", (IMEI_PREFIX + "%",))
+            print(f"removed {cur.rowcount} benchmark phones")
+        conn.commit()
+        put_conn(conn)
+
+
+if __name__ == "__main__":
+    main()
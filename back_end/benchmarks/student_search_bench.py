@@ -0,0 +1,102 @@
+# back_end/benchmarks/student_search_bench.py
+# Student search at 50k students: typeahead (mode=prefix) next to the default admin
+# search (mode=contains, the full-row ILIKE query the frontend uses) run on what a user
+# types, with latency and response size. The sid CHECK caps
+# the real table at 10,000 students, so the rows go into a session-temporary copy of
+# students (same indexes, sid widened to CHAR(6)) that shadows the real table for this
+# connection only; nothing is written to the real table.
+# Usage: python -m back_end.benchmarks.student_search_bench [--students 50000] [--queries 300]
+import argparse
+import dataclasses
+import json
+import random
+import time
+import numpy as np
+from psycopg2.extras import execute_values
+from back_end.Database.db import get_conn, put_conn
+from back_end.Database.students import search_rows, TYPEAHEAD_LIMIT, _has_trigram_index
+from back_end.embeddings import embed_to_base64
+
+FIRST_NAMES = ("James Mary John Patricia Robert Jennifer Michael Linda William Elizabeth David Barbara "
+               "Richard Susan Joseph Jessica Thomas Sarah Charles Karen Daniel Nancy Matthew Lisa Anthony "
+               "Betty Mark Sandra Donald Ashley Steven Kimberly Paul Emily Andrew Donna Joshua Michelle "
+               "Kenneth Carol Kevin Amanda Brian Melissa George Deborah Timothy Stephanie Ronald Rebecca").split()
+SYLLABLES = "ab an ar ba be bo ca ce da de do el en er fa ga ha he in ka la le li lo ma me mi mo na ne " \
+            "no or pa pe ra re ri ro sa se si so ta te ti to va ve wa we ya zo".split()
+CONTAINS_QUERIES = 50  # contains on a one-letter prefix returns thousands of full rows
+
+
+def make_students(n, rnd, rng):
+    rows = []
+    for i in range(n):
+        last = "".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        embed = rng.standard_normal(128).astype(np.float32)
+        rows.append((f"E{i:05d}", last, rnd.choice(FIRST_NAMES), embed.tobytes()))
+    return rows
+
+
+def payload_bytes(rows):
+    rows = [dataclasses.asdict(row) if dataclasses.is_dataclass(row) else row for row in rows]
+    clean = [{k: (embed_to_base64(v) if isinstance(v, memoryview) else v) for k, v in row.items()} for row in rows]
+    return len(json.dumps({"status": "success", "data": clean}, default=str))
+
+
+def measure(cur, run, queries):
+    timings, sizes, counts = [], [], []
+    for q in queries:
+        start = time.perf_counter()
+        rows = run(q)
+        timings.append((time.perf_counter() - start) * 1000)
+        sizes.append(payload_bytes(rows))
+        counts.append(len(rows))
+    return (f"median {np.median(timings):7.3f} ms | p99 {np.percentile(timings, 99):7.3f} ms | "
+            f"{np.mean(counts):7.1f} rows | {np.mean(sizes) / 1024:8.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    rnd, rng = random.Random(0), np.random.default_rng(0)
+    students = make_students(args.students, rnd, rng)
+    sample = rnd.sample(students, args.queries)
+    typed = [row[2][:rnd.randint(1, 4)] for row in sample]                     # "Ja", "Mich"
+    full_names = [f"{row[2]} {row[1][:rnd.randint(1, 3)]}" for row in sample]  # "James Ba"
+    sid_prefixes = [row[0][:rnd.randint(2, 4)] for row in sample]              # "E1", "E123"
+    substrings = [(lambda s, k: s[k:k + 3])(row[1].lower(), rnd.randint(0, len(row[1]) - 3)) for row in sample]
+
+    conn = get_conn()
+    try:
+        with conn.cursor() as cur:
+            trigram = _has_trigram_index(cur)
+            cur.execute("""
+                CREATE TEMP TABLE students (LIKE public.students INCLUDING DEFAULTS INCLUDING INDEXES);
+                ALTER TABLE students ALTER COLUMN sid TYPE CHAR(6);
+            """)
+            start = time.perf_counter()
+            execute_values(cur, "INSERT INTO students (sid, last_name, first_name, embed) VALUES %s",
+                           students, page_size=5000)
+            cur.execute("ANALYZE students;")
+            print(f"{args.students} students loaded in {time.perf_counter() - start:.1f} s, "
+                  f"trigram index {'on' if trigram else 'off (pg_trgm not installed)'}, {args.queries} queries each")
+
+            def prefix(q):
+                return search_rows(cur, q, "prefix", TYPEAHEAD_LIMIT)
+
+            def contains(q):
+                return search_rows(cur, q, "contains")
+
+            print(f"prefix   first name  | {measure(cur, prefix, typed)}")
+            print(f"prefix   full name   | {measure(cur, prefix, full_names)}")
+            print(f"prefix   sid         | {measure(cur, prefix, sid_prefixes)}")
+            print(f"contains substring   | {measure(cur, contains, substrings)}")
+            print(f"contains first name  | {measure(cur, contains, typed[:CONTAINS_QUERIES])}")
+    finally:
+        conn.close()  # a closed connection is dropped by the pool, and the temp table with it
+        put_conn(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,20 @@
 # embedding_gen.py
 import asyncio
 import cv2
-import numpy as np
-from concurrent.futures import ThreadPoolExecutor
 from back_end.scanner_state import scanner_state
-from back_end.scanner_worker import _deepface_represent, l2_normalize
+from back_end.inference_service import inference_service
 
-# Create a dedicated thread pool for embeddings
-_embedding_executor = ThreadPoolExecutor(max_workers=2)
-
-async def generate_embedding():
+async def generate_embedding(state=scanner_state):
     """
-    Waits for photo_taken_event to be set,
+    Waits for the kiosk's photo_taken_event to be set,
     then reads latest_rframe, computes face embedding, and returns it.
     """
     # Wait until a photo is taken
     loop = asyncio.get_running_loop()
     # Wait for the threading.Event to be set without blocking the event loop
-    await loop.run_in_executor(None, scanner_state.photo_taken_event.wait)
+    await loop.run_in_executor(None, state.photo_taken_event.wait)
 
-    frame = scanner_state.get_rframe()
+    frame = state.get_rframe()
     if frame is None:
         return None
 
@@ -29,18 +24,17 @@ async def generate_embedding():
         scale = 720 / width
         resized = cv2.resize(frame, (720, int(height * scale)))
 
-        # Compute embedding in thread pool (non-blocking for asyncio)
-        loop = asyncio.get_running_loop()
-        results = await loop.run_in_executor(_embedding_executor, _deepface_represent, resized)
-
-        if not results:
-            return None
-
-        # Pick the largest detected face
-        largest = max(results, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
-        embed = l2_normalize(np.array(largest["embedding"], dtype=np.float32))
-        return embed
+        # Embedding of the largest face from the shared inference service (non-blocking for asyncio)
+        future = inference_service.submit(resized, key=f"enroll:{state.kiosk_id}")
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # the service cancels requests it drops (queue full, frame too old); that is a
+            # retry, like no face, not a cancellation of this request
+            if future.cancelled():
+                return None
+            raise
 
     finally:
         # Reset the event so it can be reused
-        scanner_state.photo_taken_event.clear()
+        state.photo_taken_event.clear()
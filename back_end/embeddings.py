@@ -0,0 +1,62 @@
+# back_end/embeddings.py
+import base64
+import json
+import re
+import numpy as np
+
+# Stored and transferred form of an embedding: little-endian float32 bytes, as BYTEA in
+# Postgres and base64 in JSON. 128 dims = 512 bytes; decoding is a frombuffer, not a parse.
+EMBED_DTYPE = np.dtype("<f4")
+EMBED_DIM = 128  # output size of face_engine.MODEL_NAME (SFace)
+
+
+def l2_normalize(vec):
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def parse_pg_array(embed_value):
+    if embed_value is None:
+        return None
+    if isinstance(embed_value, (list, tuple, np.ndarray)):
+        return np.array(embed_value, dtype=np.float32)
+    if isinstance(embed_value, str):
+        try:
+            if embed_value.startswith("["):
+                return np.array(json.loads(embed_value), dtype=np.float32)
+            if embed_value.startswith("{"):
+                clean = embed_value.strip("{}").strip()
+                if not clean:
+                    return None
+                return np.array(list(map(float, re.split(r",\s*", clean))), dtype=np.float32)
+        except Exception:
+            return None
+    return None
+
+
+def embed_to_bytes(vec):
+    return np.ascontiguousarray(vec, dtype=EMBED_DTYPE).tobytes()
+
+
+def embed_to_base64(value):
+    """float32 vector or raw BYTEA value -> base64 text for JSON."""
+    raw = bytes(value) if isinstance(value, (bytes, bytearray, memoryview)) else embed_to_bytes(value)
+    return base64.b64encode(raw).decode("ascii")
+
+
+def decode_embed(embed_value):
+    """
+    Any accepted embed form -> float32 vector, or None if unusable: raw bytes from a BYTEA
+    column, base64 from the API, or the legacy "{...}"/"[...]" literals and lists.
+    Byte input is returned as a read-only view over the buffer.
+    """
+    if isinstance(embed_value, str) and embed_value and embed_value[0] not in "{[":
+        try:
+            embed_value = base64.b64decode(embed_value, validate=True)
+        except ValueError:
+            return None
+    if not isinstance(embed_value, (bytes, bytearray, memoryview)):
+        return parse_pg_array(embed_value)
+    if len(embed_value) == 0 or len(embed_value) % EMBED_DTYPE.itemsize:
+        return None
+    return np.frombuffer(embed_value, dtype=EMBED_DTYPE)
@@ -0,0 +1,110 @@
+# back_end/face_engine.py
+import threading
+import time
+import numpy as np
+from deepface import DeepFace
+from back_end.embeddings import l2_normalize
+from back_end.stage_metrics import StageTimer
+
+MODEL_NAME = "SFace"
+DETECTOR_BACKEND = "opencv"
+WARMUP_SHAPE = (405, 720, 3)  # one scaled 1080p frame
+
+
+class FaceEngine:
+    """
+    Owns the face detector and SFace recognizer for the whole process.
+    load() builds the model and runs a dummy inference so the first real scan
+    doesn't pay for weight loading; detect and embed are timed separately.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, detector_backend=DETECTOR_BACKEND):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self._load_lock = threading.Lock()
+        self.ready = False
+        self.load_ms = 0.0
+        self.detect_timer = StageTimer()
+        self.embed_timer = StageTimer()
+
+    # ---------------- STARTUP ----------------
+    def load(self):
+        with self._load_lock:
+            if self.ready:
+                return
+            start = time.perf_counter()
+            DeepFace.build_model(self.model_name)
+            dummy = np.zeros(WARMUP_SHAPE, dtype=np.uint8)
+            self.embed(self._face_to_bgr(self.detect(dummy)[0]["face"]))
+            self.load_ms = (time.perf_counter() - start) * 1000
+            self.ready = True
+            # don't let the warm-up skew the stage averages
+            self.detect_timer = StageTimer()
+            self.embed_timer = StageTimer()
+
+    # ---------------- STAGES ----------------
+    def detect(self, img):
+        """Returns DeepFace face objects ("face", "facial_area", "confidence")."""
+        with self.detect_timer.measure():
+            return DeepFace.extract_faces(
+                img_path=img,
+                detector_backend=self.detector_backend,
+                enforce_detection=False
+            )
+
+    def embed(self, face_bgr):
+        """Embeds an already detected and aligned face crop."""
+        with self.embed_timer.measure():
+            results = DeepFace.represent(
+                img_path=face_bgr,
+                model_name=self.model_name,
+                detector_backend="skip",
+                enforce_detection=False
+            )
+            return l2_normalize(np.array(results[0]["embedding"], dtype=np.float32))
+
+    @staticmethod
+    def _face_to_bgr(face):
+        # extract_faces hands back RGB floats in [0, 1]
+        return np.ascontiguousarray((face[:, :, ::-1] * 255).astype(np.uint8))
+
+    def largest_face_embedding(self, img):
+        """Detects every face but only embeds the largest one. Returns None if none found."""
+        if not self.ready:
+            self.load()
+        faces = self.detect(img)
+        if not faces:
+            return None
+        largest = max(faces, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
+        return self.embed(self._face_to_bgr(largest["face"]))
+
+    def largest_face_embeddings(self, imgs):
+        """Batch form of largest_face_embedding: one entry (or None) per image."""
+        if not self.ready:
+            self.load()
+        crops = []
+        for img in imgs:
+            faces = self.detect(img)
+            if faces:
+                largest = max(faces, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
+                crops.append(self._face_to_bgr(largest["face"]))
+            else:
+                crops.append(None)
+        embeds = iter(self.embed_batch([c for c in crops if c is not None]))
+        return [next(embeds) if c is not None else None for c in crops]
+
+    def embed_batch(self, faces_bgr):
+        # SFace runs on OpenCV's FaceRecognizerSF, which only has a single-image
+        # forward, so a batch is embedded back-to-back on the calling thread.
+        return [self.embed(face) for face in faces_bgr]
+
+    def metrics(self):
+        return {
+            "ready": self.ready,
+            "load_ms": round(self.load_ms, 2),
+            "detect": self.detect_timer.snapshot(),
+            "embed": self.embed_timer.snapshot(),
+        }
+
+
+face_engine = FaceEngine()
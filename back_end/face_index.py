@@ -0,0 +1,366 @@
+# back_end/face_index.py
+import json
+import os
+import threading
+import numpy as np
+from back_end.embeddings import l2_normalize, decode_embed
+
+INITIAL_CAPACITY = 1024
+TOP_K = 5
+
+INDEX_BACKEND = "exact"  # "exact" or "ivf"
+INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "face_index")
+
+# IVF tuning
+IVF_MIN_TRAIN = 4096  # below this many faces the IVF backend just scans everything
+IVF_NPROBE = 32
+IVF_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 20000
+IVF_RETRAIN_GROWTH = 2.0  # retrain the lists once the index has grown this much since training
+_ASSIGN_CHUNK = 16384
+
+
+def _prepare(embed):
+    vec = decode_embed(embed)
+    if vec is None or vec.size == 0:
+        return None
+    return l2_normalize(vec.astype(np.float32, copy=False).ravel())
+
+
+def _db_watermark(cur):
+    cur.execute("SELECT COUNT(*), MAX(modified_at) FROM students;")
+    count, last_modified = cur.fetchone()
+    return f"{count}:{last_modified}"
+
+
+class FaceIndex:
+    """
+    Exact backend: every enrolled embedding in one contiguous float32 matrix
+    (one row per student) so a 1:N lookup is a single matrix-vector product.
+    Rows are kept dense: removing a student moves the last row into the freed slot.
+    """
+    backend = "exact"
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._lock = threading.RLock()
+        self._capacity = capacity
+        self._matrix = None
+        self._sids = []  # row -> sid
+        self._rows = {}  # sid -> row
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._sids)
+
+    # ---------------- BULK LOAD ----------------
+    def load(self, rows):
+        """Replaces the index with (sid, embed) pairs."""
+        sids, vecs = [], []
+        for sid, embed in rows:
+            vec = _prepare(embed)
+            if vec is not None:
+                sids.append(sid)
+                vecs.append(vec)
+
+        with self._lock:
+            if vecs:
+                capacity = max(self._capacity, len(vecs))
+                self._matrix = np.zeros((capacity, vecs[0].shape[0]), dtype=np.float32)
+                self._matrix[:len(vecs)] = np.stack(vecs)
+            else:
+                self._matrix = None
+            self._sids = sids
+            self._rows = {sid: i for i, sid in enumerate(sids)}
+            self._rebuild()
+            self.loaded = True
+        return len(sids)
+
+    def load_from_db(self, path=INDEX_DIR):
+        """
+        Loads from the on-disk snapshot when it matches the students table,
+        otherwise reads students.embed from Postgres and refreshes the snapshot.
+        """
+        from back_end.Database.db import get_conn, put_conn
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                watermark = _db_watermark(cur)
+                if path and self.open(path, watermark):
+                    return len(self)
+                cur.execute("SELECT sid, embed FROM students;")
+                rows = cur.fetchall()
+        finally:
+            put_conn(conn)
+
+        count = self.load(rows)
+        if path:
+            self.save(path, watermark)
+        return count
+
+    # ---------------- PERSISTENCE ----------------
+    def save(self, path=INDEX_DIR, watermark=None):
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            n = len(self._sids)
+            if self._matrix is not None:
+                np.save(os.path.join(path, "embeddings.npy"), self._matrix[:n])
+            self._save_extra(path)
+            meta = {"backend": self.backend, "watermark": watermark, "sids": self._sids}
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump(meta, f)
+
+    def open(self, path=INDEX_DIR, watermark=None):
+        """
+        Memory-maps a snapshot written by save(). Pages are copy-on-write, so
+        incremental updates never touch the file. Returns False if the snapshot
+        is missing, from another backend, or older than `watermark`.
+        """
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["backend"] != self.backend or (watermark is not None and meta["watermark"] != watermark):
+                return False
+            sids = meta["sids"]
+            matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="c") if sids else None
+        except (OSError, ValueError, KeyError):
+            return False
+
+        with self._lock:
+            self._matrix = matrix
+            self._sids = sids
+            self._rows = {sid: i for i, sid in enumerate(sids)}
+            if not self._open_extra(path):
+                self._rebuild()
+            self.loaded = True
+        return True
+
+    # ---------------- INCREMENTAL UPDATES ----------------
+    def upsert(self, sid, embed):
+        vec = _prepare(embed)
+        if vec is None:
+            return
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self._capacity, vec.shape[0]), dtype=np.float32)
+            if vec.shape[0] != self._matrix.shape[1]:
+                raise ValueError(f"Embedding size {vec.shape[0]} != index size {self._matrix.shape[1]}")
+
+            row = self._rows.get(sid)
+            if row is None:
+                row = len(self._sids)
+                if row == self._matrix.shape[0]:
+                    grown = np.zeros((max(row * 2, self._capacity), self._matrix.shape[1]), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._sids.append(sid)
+                self._rows[sid] = row
+            self._matrix[row] = vec
+            self._row_set(row, vec)
+
+    def remove(self, sid):
+        with self._lock:
+            row = self._rows.pop(sid, None)
+            if row is None:
+                return
+            last = len(self._sids) - 1
+            if row != last:
+                moved = self._sids[last]
+                self._matrix[row] = self._matrix[last]
+                self._sids[row] = moved
+                self._rows[moved] = row
+                self._row_moved(last, row)
+            self._sids.pop()
+            self._row_removed()
+
+    def rename(self, old_sid, new_sid):
+        with self._lock:
+            row = self._rows.pop(old_sid, None)
+            if row is None:
+                return
+            self._rows[new_sid] = row
+            self._sids[row] = new_sid
+
+    def apply_update(self, old_sid, new_sid, embed=None):
+        """Mirrors an update_student call; no-op until the index has been loaded."""
+        if not self.loaded:
+            return
+        with self._lock:
+            if new_sid and new_sid != old_sid:
+                self.rename(old_sid, new_sid)
+            if embed is not None:
+                self.upsert(new_sid or old_sid, embed)
+
+    # ---------------- LOOKUP ----------------
+    def search(self, vec, k=TOP_K):
+        """Returns up to k (sid, cosine similarity) pairs, best first. `vec` must be normalized."""
+        vec = np.asarray(vec, dtype=np.float32)
+        with self._lock:
+            n = len(self._sids)
+            if n == 0:
+                return []
+            rows = self._candidates(vec)
+            if rows is None:
+                rows = np.arange(n)
+                scores = self._matrix[:n] @ vec
+            else:
+                scores = self._matrix[rows] @ vec
+            k = min(k, scores.shape[0])
+            if k == 0:
+                return []
+            m = scores.shape[0]
+            top = np.argpartition(scores, m - k)[m - k:]
+            top = top[np.argsort(scores[top])[::-1]]
+            return [(self._sids[rows[i]], float(scores[i])) for i in top]
+
+    # ---------------- BACKEND HOOKS ----------------
+    def _candidates(self, vec):
+        """Row indices worth scoring, or None for all rows."""
+        return None
+
+    def _rebuild(self):
+        pass
+
+    def _row_set(self, row, vec):
+        pass
+
+    def _row_moved(self, src, dst):
+        pass
+
+    def _row_removed(self):
+        pass
+
+    def _save_extra(self, path):
+        pass
+
+    def _open_extra(self, path):
+        return True
+
+
+class IVFFaceIndex(FaceIndex):
+    """
+    Approximate backend: spherical k-means splits the rows into ~sqrt(n) lists
+    and a lookup only scores the rows in the `nprobe` closest lists. Upserts are
+    assigned to the existing lists; once the index has grown IVF_RETRAIN_GROWTH
+    times past the size it was trained at, the lists are retrained, so list count
+    and centroids keep up with the gallery instead of drifting.
+    """
+    backend = "ivf"
+
+    def __init__(self, capacity=INITIAL_CAPACITY, nprobe=IVF_NPROBE, nlist=None):
+        super().__init__(capacity)
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self._centroids = None
+        self._assign = np.zeros(capacity, dtype=np.int32)  # row -> list
+        self._order = None  # rows sorted by list, rebuilt lazily after updates
+        self._bounds = None
+        self._trained_size = 0  # rows the current centroids were trained on
+
+    def _candidates(self, vec):
+        if self._centroids is None:
+            return None
+        if self._order is None:
+            n = len(self._sids)
+            self._order = np.argsort(self._assign[:n], kind="stable")
+            self._bounds = np.searchsorted(self._assign[:n][self._order], np.arange(len(self._centroids) + 1))
+        nprobe = min(self.nprobe, len(self._centroids))
+        probe = np.argpartition(self._centroids @ vec, len(self._centroids) - nprobe)[-nprobe:]
+        return np.concatenate([self._order[self._bounds[c]:self._bounds[c + 1]] for c in probe])
+
+    def _rebuild(self):
+        n = len(self._sids)
+        self._order = None
+        self._assign = np.zeros(max(self._capacity, n), dtype=np.int32)
+        if n < IVF_MIN_TRAIN:
+            self._centroids = None
+            return
+        self._centroids = self._train(self._matrix[:n])
+        self._assign[:n] = self._nearest(self._matrix[:n])
+        self._trained_size = n
+
+    def _train(self, data):
+        rng = np.random.default_rng(0)
+        nlist = self.nlist or int(np.sqrt(data.shape[0]))
+        if data.shape[0] > IVF_TRAIN_SAMPLE:
+            data = data[rng.choice(data.shape[0], IVF_TRAIN_SAMPLE, replace=False)]
+        centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+        for _ in range(IVF_ITERATIONS):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            centroids = np.where(empty[:, None], centroids, sums / np.where(norms == 0, 1, norms))
+        return centroids.astype(np.float32)
+
+    def _nearest(self, data):
+        out = np.empty(data.shape[0], dtype=np.int32)
+        for start in range(0, data.shape[0], _ASSIGN_CHUNK):
+            chunk = data[start:start + _ASSIGN_CHUNK]
+            out[start:start + len(chunk)] = np.argmax(chunk @ self._centroids.T, axis=1)
+        return out
+
+    def _row_set(self, row, vec):
+        if row >= self._assign.shape[0]:
+            grown = np.zeros(max(row * 2, self._capacity), dtype=np.int32)
+            grown[:self._assign.shape[0]] = self._assign
+            self._assign = grown
+        if self._centroids is None:
+            if len(self._sids) >= IVF_MIN_TRAIN:
+                self._rebuild()
+            return
+        if len(self._sids) >= IVF_RETRAIN_GROWTH * self._trained_size:
+            self._rebuild()
+            return
+        self._assign[row] = int(np.argmax(self._centroids @ vec))
+        self._order = None
+
+    def _row_moved(self, src, dst):
+        self._assign[dst] = self._assign[src]
+        self._order = None
+
+    def _row_removed(self):
+        self._order = None
+
+    def _save_extra(self, path):
+        n = len(self._sids)
+        if self._centroids is not None:
+            np.save(os.path.join(path, "centroids.npy"), self._centroids)
+            np.save(os.path.join(path, "assign.npy"), self._assign[:n])
+        else:
+            for name in ("centroids.npy", "assign.npy"):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+
+    def _open_extra(self, path):
+        n = len(self._sids)
+        self._order = None
+        try:
+            self._centroids = np.load(os.path.join(path, "centroids.npy"))
+            assign = np.load(os.path.join(path, "assign.npy"))
+        except OSError:
+            return n < IVF_MIN_TRAIN and self._reset_untrained()
+        if assign.shape[0] != n:
+            return False
+        self._assign = np.zeros(max(self._capacity, n), dtype=np.int32)
+        self._assign[:n] = assign
+        self._trained_size = n  # growth is measured from the snapshot
+        return True
+
+    def _reset_untrained(self):
+        self._centroids = None
+        self._assign = np.zeros(max(self._capacity, len(self._sids)), dtype=np.int32)
+        return True
+
+
+BACKENDS = {"exact": FaceIndex, "ivf": IVFFaceIndex}
+
+
+def make_face_index(backend=INDEX_BACKEND, **kwargs):
+    try:
+        return BACKENDS[backend](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown face index backend '{backend}'") from None
+
+
+face_index = make_face_index()
@@ -0,0 +1,100 @@
+# back_end/face_tracker.py
+import cv2
+
+TRACK_WIDTH = 360        # tracking runs on frames downscaled to this width
+SEARCH_MARGIN = 0.5      # template search window around the last box, relative to box size
+CROP_MARGIN = 0.4        # context kept around the box so the face detector still sees a whole face
+MATCH_THRESHOLD = 0.6    # TM_CCOEFF_NORMED score under which the track counts as lost
+REDETECT_EVERY = 15      # forced re-detect after this many tracked updates, to stop template drift
+MIN_FACE = 24            # px at tracking scale
+
+
+class FaceTracker:
+    """
+    Finds the face once with a Haar cascade on a small grayscale frame, then follows
+    it by template matching inside a window around the last box. Only the crop around
+    the tracked face is handed to the embedding model; a lost track triggers a full re-detect.
+    """
+
+    def __init__(self):
+        self._cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        self.box = None  # (x, y, w, h) at tracking scale
+        self._template = None
+        self._scale = 1.0
+        self._since_detect = 0
+        self.detections = 0
+        self.tracked = 0
+        self.lost = 0
+
+    def reset(self):
+        self.box = None
+        self._template = None
+        self._since_detect = 0
+
+    # ---------------- UPDATE ----------------
+    def update(self, frame):
+        """Returns the face region (x0, y0, x1, y1) in frame coordinates, or None if there is no face."""
+        self._scale = TRACK_WIDTH / frame.shape[1]
+        small = cv2.resize(frame, (TRACK_WIDTH, int(frame.shape[0] * self._scale)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        if self.box is not None and self._since_detect < REDETECT_EVERY and self._track(gray):
+            self.tracked += 1
+        elif self._detect(gray):
+            self.detections += 1
+        else:
+            return None
+        return self._region(frame.shape)
+
+    def crop(self, frame):
+        region = self.update(frame)
+        if region is None:
+            return None
+        x0, y0, x1, y1 = region
+        return frame[y0:y1, x0:x1]
+
+    def _detect(self, gray):
+        faces = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(MIN_FACE, MIN_FACE))
+        if len(faces) == 0:
+            self.reset()
+            return False
+        self._set(gray, max(faces, key=lambda f: f[2] * f[3]))
+        self._since_detect = 0
+        return True
+
+    def _track(self, gray):
+        x, y, w, h = self.box
+        mx, my = int(w * SEARCH_MARGIN), int(h * SEARCH_MARGIN)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(gray.shape[1], x + w + mx), min(gray.shape[0], y + h + my)
+        window = gray[y0:y1, x0:x1]
+        if window.shape[0] < h or window.shape[1] < w:
+            self.lost += 1
+            return False
+
+        result = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(result)
+        if score < MATCH_THRESHOLD:
+            self.lost += 1
+            return False
+        self._set(gray, (x0 + loc[0], y0 + loc[1], w, h))
+        self._since_detect += 1
+        return True
+
+    def _set(self, gray, box):
+        x, y, w, h = (int(v) for v in box)
+        self.box = (x, y, w, h)
+        self._template = gray[y:y + h, x:x + w].copy()
+
+    def _region(self, shape):
+        x, y, w, h = self.box
+        mx, my = w * CROP_MARGIN, h * CROP_MARGIN
+        inv = 1.0 / self._scale
+        x0 = max(0, int((x - mx) * inv))
+        y0 = max(0, int((y - my) * inv))
+        x1 = min(shape[1], int((x + w + mx) * inv))
+        y1 = min(shape[0], int((y + h + my) * inv))
+        return x0, y0, x1, y1
+
+    def stats(self):
+        return {"detections": self.detections, "tracked": self.tracked, "lost": self.lost}
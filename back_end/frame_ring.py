@@ -0,0 +1,167 @@
+# back_end/frame_ring.py
+import asyncio
+import threading
+import numpy as np
+
+RING_SLOTS = 6
+COPY_RETRIES = 3  # copy_latest attempts before giving up on a torn copy
+
+
+class FrameRing:
+    """
+    Preallocated frame slots with sequence numbers. The capture thread writes into
+    the next slot (ideally straight from cap.read), readers get a view of the newest
+    slot they haven't seen. Slots are reused, so a reader that holds a frame for a
+    long time should check valid() before trusting it, or copy what it keeps.
+    """
+
+    def __init__(self, slots=RING_SLOTS):
+        self._cond = threading.Condition()
+        self._buffers = [None] * slots
+        self._seqs = [-1] * slots
+        self._stamps = [0.0] * slots
+        self._next = None  # (seq, index) handed out by next_buffer() but not committed
+        self.seq = -1      # last committed sequence number
+        self._async_waiters = set()  # (loop, future) of asyncio readers waiting for a frame
+
+    def __len__(self):
+        return len(self._buffers)
+
+    # ---------------- WRITER ----------------
+    def next_buffer(self, shape, dtype=np.uint8):
+        """Slot the next frame should be written into; reallocated only if the shape changes."""
+        with self._cond:
+            seq = self.seq + 1
+            i = seq % len(self._buffers)
+            self._seqs[i] = -1  # readers still holding this slot now see it as invalid
+            buf = self._buffers[i]
+            if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+                buf = self._buffers[i] = np.empty(shape, dtype=dtype)
+            self._next = (seq, i)
+            return buf
+
+    def commit(self, timestamp):
+        with self._cond:
+            seq, i = self._next
+            self._next = None
+            self._seqs[i] = seq
+            self._stamps[i] = timestamp
+            self.seq = seq
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, set()
+        # wake asyncio readers on their own loop instead of having them poll
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:  # loop already closed
+                pass
+        return seq
+
+    def write(self, frame, timestamp):
+        """Copies `frame` into the ring, unless it already is the pending slot from next_buffer()."""
+        pending = self._next
+        if pending is None or frame is not self._buffers[pending[1]]:
+            np.copyto(self.next_buffer(frame.shape, frame.dtype), frame)
+        return self.commit(timestamp)
+
+    # ---------------- READERS ----------------
+    def get(self, seq):
+        """(frame, timestamp) for `seq`, or None if it was never written or has been overwritten."""
+        with self._cond:
+            i = seq % len(self._buffers)
+            if seq < 0 or self._seqs[i] != seq:
+                return None
+            return self._buffers[i], self._stamps[i]
+
+    def valid(self, seq):
+        with self._cond:
+            return seq >= 0 and self._seqs[seq % len(self._buffers)] == seq
+
+    def latest(self):
+        """(seq, frame, timestamp) of the newest frame, or None before the first write."""
+        with self._cond:
+            item = self.get(self.seq)
+            return None if item is None else (self.seq, *item)
+
+    def copy_latest(self):
+        """Copy of the newest frame, or None. A copy the writer overwrote midway is retaken."""
+        for _ in range(COPY_RETRIES):
+            item = self.latest()
+            if item is None:
+                return None
+            seq, frame, _ = item
+            copy = frame.copy()
+            if self.valid(seq):
+                return copy
+        return None
+
+    def reader(self):
+        return RingReader(self)
+
+    def wait_newer(self, seq, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: self.seq > seq, timeout)
+
+    async def wait_newer_async(self, seq):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.seq > seq:
+                    return
+                future = loop.create_future()
+                waiter = (loop, future)
+                self._async_waiters.add(waiter)
+            try:
+                await future
+            finally:
+                with self._cond:
+                    self._async_waiters.discard(waiter)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RingReader:
+    """
+    One consumer's cursor into a FrameRing; counts the frames it never got to see and
+    the ones overwritten while it was still working on them (torn).
+    """
+
+    def __init__(self, ring):
+        self.ring = ring
+        self.seq = ring.seq  # start at "now", not at whatever is left in the ring
+        self.skipped = 0
+        self.torn = 0
+
+    def read(self, timeout=None):
+        """Newest unseen (frame, timestamp), waiting up to `timeout` (None = don't wait)."""
+        if self.ring.seq <= self.seq:
+            if not timeout or not self.ring.wait_newer(self.seq, timeout):
+                return None
+        item = self.ring.latest()
+        if item is None:
+            return None
+        seq, frame, timestamp = item
+        self.skipped += max(0, seq - self.seq - 1)
+        self.seq = seq
+        return frame, timestamp
+
+    async def read_async(self):
+        """Like read(), but awaits the next frame without blocking the event loop."""
+        while True:
+            await self.ring.wait_newer_async(self.seq)
+            item = self.read()
+            if item is not None:
+                return item
+
+    def valid(self):
+        """
+        False once the frame from the last read() has been overwritten. Call it after
+        the last use of the view: anything computed from a torn frame must be dropped.
+        """
+        if self.ring.valid(self.seq):
+            return True
+        self.torn += 1
+        return False
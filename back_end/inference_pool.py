@@ -0,0 +1,189 @@
+# back_end/inference_pool.py
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+from back_end.face_engine import FaceEngine
+from back_end.stage_metrics import StageTimer
+
+PROCESSES = 2
+SLOTS_PER_PROCESS = 2
+SLOT_BYTES = 1080 * 1920 * 3  # largest frame a slot can hold
+READY_TIMEOUT = 120  # seconds for a worker to build and warm its model
+RESULT_TIMEOUT = 30  # seconds a caller waits for one frame before giving up
+LIVENESS_INTERVAL = 1.0  # seconds between worker liveness checks when no results arrive
+
+
+def _worker_main(slot_names, tasks, results):
+    # spawned workers share the parent's resource tracker, so attaching here
+    # doesn't take ownership; the parent unlinks the segments in close()
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+
+    engine = FaceEngine()
+    engine.load()
+    results.put((None, mp.current_process().pid, None, 0.0, 0.0))
+
+    while True:
+        item = tasks.get()
+        if item is None:
+            break
+        req_id, slot, shape = item
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=slots[slot].buf)
+        try:
+            embed = engine.largest_face_embedding(frame)
+            results.put((req_id, embed, None, engine.detect_timer.last_ms, engine.embed_timer.last_ms))
+        except Exception as e:
+            results.put((req_id, None, repr(e), 0.0, 0.0))
+
+    for shm in slots:
+        shm.close()
+
+
+class ProcessFaceEngine:
+    """
+    FaceEngine drop-in that runs inference in worker processes, each with its own
+    loaded model, so detection/embedding don't compete with the server for the GIL.
+    Frames are copied once into preallocated shared-memory slots; only the slot
+    index and shape go through the task queue. Callers block while every slot is busy.
+    Each worker owns the slots with slot % processes == its index and has its own task
+    queue, so when a worker dies (segfault, OOM kill) the collector knows which
+    requests it took down: their futures fail, their slots come back and a fresh
+    worker is started in its place.
+    """
+
+    def __init__(self, processes=PROCESSES, slots_per_process=SLOTS_PER_PROCESS, slot_bytes=SLOT_BYTES):
+        self.processes = processes
+        self.slot_bytes = slot_bytes
+        self.n_slots = processes * slots_per_process
+        self._load_lock = threading.Lock()
+        self._futures_lock = threading.Lock()
+        self._futures = {}  # req_id -> (future, slot)
+        self._ids = itertools.count()
+        self._slots = []
+        self._free = queue.Queue()
+        self._procs = []
+        self._tasks = []  # one queue per worker
+        self._closing = False
+        self.ready = False
+        self.restarts = 0
+        self.detect_timer = StageTimer()
+        self.embed_timer = StageTimer()
+
+    # ---------------- STARTUP ----------------
+    def load(self):
+        with self._load_lock:
+            if self.ready:
+                return
+            self._ctx = mp.get_context("spawn")
+            self._closing = False
+            self._slots = [shared_memory.SharedMemory(create=True, size=self.slot_bytes) for _ in range(self.n_slots)]
+            for i in range(self.n_slots):
+                self._free.put(i)
+            self._results = self._ctx.Queue()
+            self._tasks = [self._ctx.Queue() for _ in range(self.processes)]
+            self._procs = [self._spawn(i) for i in range(self.processes)]
+            for _ in self._procs:
+                self._results.get(timeout=READY_TIMEOUT)
+            threading.Thread(target=self._collect, daemon=True).start()
+            self.ready = True
+
+    def _spawn(self, worker):
+        names = [shm.name for shm in self._slots]
+        proc = self._ctx.Process(target=_worker_main, args=(names, self._tasks[worker], self._results), daemon=True)
+        proc.start()
+        return proc
+
+    def close(self):
+        self._closing = True
+        for tasks in self._tasks:
+            tasks.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+        for shm in self._slots:
+            shm.close()
+            shm.unlink()
+        self._slots = []
+        self.ready = False
+
+    # ---------------- INFERENCE ----------------
+    def submit(self, img):
+        if not self.ready:
+            self.load()
+        img = np.ascontiguousarray(img, dtype=np.uint8)
+        if img.nbytes > self.slot_bytes:
+            raise ValueError(f"Frame of {img.nbytes} bytes exceeds slot size {self.slot_bytes}")
+        slot = self._free.get()
+        np.ndarray(img.shape, dtype=np.uint8, buffer=self._slots[slot].buf)[...] = img
+
+        future = Future()
+        req_id = next(self._ids)
+        with self._futures_lock:  # a restart can't swap the queue between these two
+            self._futures[req_id] = (future, slot)
+            self._tasks[slot % self.processes].put((req_id, slot, img.shape))
+        return future
+
+    def largest_face_embedding(self, img):
+        return self.submit(img).result(timeout=RESULT_TIMEOUT)
+
+    def largest_face_embeddings(self, imgs):
+        futures = [self.submit(img) for img in imgs]
+        deadline = time.monotonic() + RESULT_TIMEOUT
+        return [f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures]
+
+    def _collect(self):
+        while True:
+            try:
+                req_id, embed, error, detect_ms, embed_ms = self._results.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                req_id = None
+            self._check_workers()
+            if req_id is None:  # nothing arrived, or a (re)started worker saying it's ready
+                continue
+            with self._futures_lock:
+                entry = self._futures.pop(req_id, None)
+            if entry is None:  # already failed when its worker died
+                continue
+            future, slot = entry
+            self._free.put(slot)
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+                continue
+            self.detect_timer.record(detect_ms)
+            if embed is not None:
+                self.embed_timer.record(embed_ms)
+            future.set_result(embed)
+
+    # ---------------- LIVENESS ----------------
+    def _check_workers(self):
+        if self._closing:
+            return
+        for worker, proc in enumerate(self._procs):
+            if not proc.is_alive():
+                self._restart(worker, proc.exitcode)
+
+    def _restart(self, worker, exitcode):
+        """Fails the dead worker's requests, frees its slots and starts a replacement."""
+        with self._futures_lock:
+            lost = [req_id for req_id, (_, slot) in self._futures.items() if slot % self.processes == worker]
+            lost = [self._futures.pop(req_id) for req_id in lost]
+            self._tasks[worker] = self._ctx.Queue()  # tasks left in the old queue are in `lost`
+            self._procs[worker] = self._spawn(worker)
+        self.restarts += 1
+        print(f"[-] Inference worker {worker} exited ({exitcode}); {len(lost)} request(s) failed, restarting.")
+        for future, slot in lost:
+            self._free.put(slot)
+            future.set_exception(RuntimeError(f"Inference worker exited ({exitcode})"))
+
+    def metrics(self):
+        return {
+            "ready": self.ready,
+            "processes": self.processes,
+            "restarts": self.restarts,
+            "free_slots": self._free.qsize(),
+            "detect": self.detect_timer.snapshot(),
+            "embed": self.embed_timer.snapshot(),
+        }
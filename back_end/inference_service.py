@@ -0,0 +1,132 @@
+# back_end/inference_service.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from back_end.face_engine import face_engine
+
+MAX_BATCH_SIZE = 8
+MAX_WAIT = 0.01   # seconds to wait for a batch to fill after the first request
+MAX_QUEUE = 16    # pending requests across all sources
+MAX_AGE = 1.0     # seconds; older frames are dropped instead of embedded
+WORKERS = 1
+BACKEND = "thread"  # "thread" runs the model in this process, "process" uses inference_pool workers
+
+
+class InferenceService:
+    """
+    Single face-embedding queue for every caller (scanner, enrollment, extra kiosks).
+    Pending frames are keyed by source: a newer frame from the same source replaces
+    the queued one, and when the queue is full the oldest request is dropped.
+    Dropped requests get their future cancelled.
+    """
+
+    def __init__(self, engine=face_engine, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT,
+                 max_queue=MAX_QUEUE, max_age=MAX_AGE, workers=WORKERS, clock=time.time):
+        self.engine = engine
+        self.clock = clock  # must match the clock frame timestamps come from
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.max_age = max_age
+        self.workers = workers
+
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # key -> (img, timestamp, future)
+        self._anon_keys = itertools.count()
+        self._threads = []
+
+        self._stats = {"submitted": 0, "replaced": 0, "dropped_full": 0, "dropped_stale": 0,
+                       "batches": 0, "embedded": 0}
+
+    # ---------------- LIFECYCLE ----------------
+    def start(self):
+        with self._cond:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                t = threading.Thread(target=self._run, daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    # ---------------- SUBMIT ----------------
+    def submit(self, img, key=None, timestamp=None):
+        """Queues one image; the future resolves to a normalized embedding or None."""
+        if len(self._threads) < self.workers:
+            self.start()
+        future = Future()
+        if key is None:
+            key = ("anon", next(self._anon_keys))
+        with self._cond:
+            self._stats["submitted"] += 1
+            old = self._pending.pop(key, None)
+            if old is not None:
+                old[2].cancel()
+                self._stats["replaced"] += 1
+            while len(self._pending) >= self.max_queue:
+                _, (_, _, dropped) = self._pending.popitem(last=False)
+                dropped.cancel()
+                self._stats["dropped_full"] += 1
+            self._pending[key] = (img, timestamp if timestamp is not None else self.clock(), future)
+            self._cond.notify()
+        return future
+
+    # ---------------- WORKER ----------------
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            now = self.clock()
+            while self._pending and len(batch) < self.max_batch_size:
+                _, (img, ts, future) = self._pending.popitem(last=False)
+                if now - ts > self.max_age:
+                    future.cancel()
+                    self._stats["dropped_stale"] += 1
+                elif future.set_running_or_notify_cancel():
+                    batch.append((img, future))
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                embeds = self.engine.largest_face_embeddings([img for img, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), embed in zip(batch, embeds):
+                future.set_result(embed)
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["embedded"] += len(batch)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queued"] = len(self._pending)
+            stats["avg_batch"] = round(stats["embedded"] / stats["batches"], 2) if stats["batches"] else 0.0
+            return stats
+
+
+def make_inference_service(backend=BACKEND):
+    if backend == "process":
+        from back_end.inference_pool import ProcessFaceEngine, PROCESSES
+        # one dispatcher thread per worker process keeps every process busy
+        return InferenceService(engine=ProcessFaceEngine(), workers=PROCESSES)
+    if backend == "thread":
+        return InferenceService()
+    raise ValueError(f"Unknown inference backend '{backend}'")
+
+
+inference_service = make_inference_service()
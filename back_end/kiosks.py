@@ -0,0 +1,71 @@
+# back_end/kiosks.py
+import threading
+from back_end.scanner_state import ScannerState, scanner_state, DEFAULT_KIOSK
+from back_end.scanner_loop import scanner_loop
+
+# kiosk id -> camera source (device index, video file path or RTSP URL)
+KIOSK_SOURCES = {DEFAULT_KIOSK: 0}
+
+_states = {DEFAULT_KIOSK: scanner_state}
+_loop_threads = {}
+_socketio = None
+
+
+def get_state(kiosk_id=None):
+    """ScannerState for a kiosk, or None if it isn't configured."""
+    return _states.get(kiosk_id or DEFAULT_KIOSK)
+
+
+def all_states():
+    return list(_states.values())
+
+
+def add_kiosk(kiosk_id):
+    state = _states.get(kiosk_id)
+    if state is None:
+        state = ScannerState(kiosk_id)
+        if _socketio is not None:
+            state.set_socketio(_socketio)
+        _states[kiosk_id] = state
+    return state
+
+
+def set_socketio(sio):
+    global _socketio
+    _socketio = sio
+    for state in _states.values():
+        state.set_socketio(sio)
+
+
+def start_kiosks(sources=None, debugwindow=False, debugroi=True, loop_file=True):
+    """
+    Starts one capture loop per kiosk. Each kiosk gets its own ScannerState (frame
+    rings, scan pipeline, preview/photo events, Socket.IO room); inference and the
+    student cache are shared. The WebRTC endpoints pick the kiosk with ?kiosk=<id>
+    (main stream, preview, take_photo, cancel) and default to DEFAULT_KIOSK.
+    """
+    for kiosk_id, source in (sources or KIOSK_SOURCES).items():
+        thread = _loop_threads.get(kiosk_id)
+        if thread and thread.is_alive():
+            continue
+        state = add_kiosk(kiosk_id)
+        thread = threading.Thread(
+            target=scanner_loop,
+            kwargs={"debugwindow": debugwindow, "debugroi": debugroi, "state": state,
+                    "source": source, "loop_file": loop_file},
+            daemon=True
+        )
+        _loop_threads[kiosk_id] = thread
+        thread.start()
+    return all_states()
+
+
+def parse_sources(specs):
+    """["lobby=0", "gym=rtsp://...", "clip.mp4"] -> {"lobby": "0", "gym": "rtsp://...", "kiosk2": "clip.mp4"}"""
+    sources = {}
+    for i, spec in enumerate(specs):
+        kiosk_id, sep, source = spec.partition("=")
+        if not sep or "/" in kiosk_id:
+            kiosk_id, source = (DEFAULT_KIOSK if i == 0 else f"kiosk{i}"), spec
+        sources[kiosk_id] = source
+    return sources
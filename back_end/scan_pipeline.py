@@ -0,0 +1,126 @@
+# back_end/scan_pipeline.py
+import threading
+import time
+from back_end.stage_metrics import StageTimer
+
+
+class LatestValue:
+    """
+    Single-slot channel between two scan stages. put() overwrites a value the consumer
+    hasn't taken yet (counted as overwritten), so a slow consumer always gets the newest
+    result instead of a backlog. get()/task_done() mirror queue.Queue so the pipeline can
+    tell when everything in flight has been handled.
+    """
+
+    def __init__(self, name, wakeup=None):
+        self.name = name
+        self._cond = threading.Condition()
+        self._wakeup = wakeup  # optional Event shared by a consumer reading several channels
+        self._value = None
+        self._put_at = 0.0
+        self._pending = False
+        self._in_flight = 0
+        self.puts = 0
+        self.overwritten = 0
+        self.wait_timer = StageTimer()  # time a value sat in the slot before it was taken
+
+    def put(self, value):
+        with self._cond:
+            if self._pending:
+                self.overwritten += 1
+            self._value = value
+            self._put_at = time.perf_counter()
+            self._pending = True
+            self.puts += 1
+            self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def get(self, timeout=None):
+        """Next value, or None after `timeout`. Call task_done() once it is handled."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending, timeout):
+                return None
+            return self._take()
+
+    def poll(self):
+        with self._cond:
+            return self._take() if self._pending else None
+
+    def _take(self):
+        self._pending = False
+        self._in_flight += 1
+        self.wait_timer.record((time.perf_counter() - self._put_at) * 1000)
+        value, self._value = self._value, None
+        return value
+
+    def task_done(self):
+        with self._cond:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    @property
+    def depth(self):
+        return int(self._pending)
+
+    def idle(self):
+        with self._cond:
+            return not self._pending and not self._in_flight
+
+    def stats(self):
+        return {"depth": self.depth, "puts": self.puts, "overwritten": self.overwritten,
+                "wait": self.wait_timer.snapshot()}
+
+
+class ScanPipeline:
+    """
+    Stage threads and channels of one scan session. Frame stages record the last frame
+    they finished with, so the replay benchmark can advance its clock only once the whole
+    pipeline has settled.
+    """
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.channels = {}
+        self.readers = {}   # frame stage -> RingReader
+        self.done_seq = {}  # frame stage -> seq of the last frame it finished
+        self.threads = []
+        # decisions published by the fusion stage, read by the frame stages
+        self.barcode_ok = False
+        self.face_ok = False
+
+    def channel(self, name, wakeup=None):
+        channel = self.channels[name] = LatestValue(name, wakeup)
+        return channel
+
+    def add_reader(self, stage, reader):
+        self.readers[stage] = reader
+        self.done_seq[stage] = reader.seq
+
+    def finished(self, stage):
+        self.done_seq[stage] = self.readers[stage].seq
+
+    def start(self, name, target, *args):
+        thread = threading.Thread(target=target, args=args, name=f"scan-{name}", daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def join(self, timeout=2.0):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    @property
+    def frames_dropped(self):
+        return max((reader.skipped for reader in self.readers.values()), default=0)
+
+    def settled(self, seq):
+        """True once every frame stage is done with `seq` and no channel has work left."""
+        return all(done >= seq for done in self.done_seq.values()) and \
+            all(channel.idle() for channel in self.channels.values())
+
+    def stats(self):
+        return {
+            "channels": {name: channel.stats() for name, channel in self.channels.items()},
+            "skipped": {stage: reader.skipped for stage, reader in self.readers.items()},
+            "torn": {stage: reader.torn for stage, reader in self.readers.items()},
+        }
@@ -0,0 +1,89 @@
+# back_end/scan_scheduler.py
+import threading
+import cv2
+import numpy as np
+
+MOTION_WIDTH = 160       # frame difference runs on a tiny grayscale copy
+MOTION_THRESHOLD = 3.0   # mean absolute difference (0-255) that counts as motion
+IDLE_AFTER = 2.0         # seconds without motion before scans back off
+MAX_INTERVAL = 2.0       # ceiling for backed-off scan intervals
+
+
+class ScanScheduler:
+    """
+    Decides when scan_worker should run barcode decoding and face checks.
+    - no motion: intervals double up to MAX_INTERVAL
+    - badge decoded and face tracked: face checks run whenever inference is free
+    - match confirmed (or badge locked in): barcode decoding stops
+    """
+
+    def __init__(self, barcode_interval, face_interval, tracked_face_interval):
+        self.barcode_interval = barcode_interval
+        self.face_interval = face_interval
+        self.tracked_face_interval = tracked_face_interval
+        self._lock = threading.Lock()
+        self._prev = None
+        self._last_motion = 0.0
+        self._backoff = 1
+        self._last_barcode = 0.0
+        self._last_face = 0.0
+        self.skipped_idle = 0
+
+    # ---------------- MOTION ----------------
+    def observe(self, frame, timestamp):
+        scale = MOTION_WIDTH / frame.shape[1]
+        small = cv2.resize(frame, (MOTION_WIDTH, int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        with self._lock:
+            self._observe(gray, timestamp)
+
+    def _observe(self, gray, timestamp):
+        if self._prev is None or float(np.mean(cv2.absdiff(gray, self._prev))) > MOTION_THRESHOLD:
+            self._last_motion = timestamp
+            self._backoff = 1
+        self._prev = gray
+
+    def idle(self, timestamp):
+        return timestamp - self._last_motion > IDLE_AFTER
+
+    def _interval(self, base, timestamp):
+        if not self.idle(timestamp):
+            return base
+        return min(base * self._backoff, MAX_INTERVAL)
+
+    def _ran_idle(self, timestamp):
+        if self.idle(timestamp):
+            self._backoff = min(self._backoff * 2, 64)
+
+    # ---------------- DECISIONS ----------------
+    def barcode_due(self, timestamp, barcode_ok, face_ok):
+        with self._lock:
+            return self._barcode_due(timestamp, barcode_ok, face_ok)
+
+    def face_due(self, timestamp, barcode_ok, tracking):
+        with self._lock:
+            return self._face_due(timestamp, barcode_ok, tracking)
+
+    def _barcode_due(self, timestamp, barcode_ok, face_ok):
+        if barcode_ok or face_ok:
+            return False
+        if timestamp - self._last_barcode <= self._interval(self.barcode_interval, timestamp):
+            if self.idle(timestamp):
+                self.skipped_idle += 1
+            return False
+        self._last_barcode = timestamp
+        self._ran_idle(timestamp)
+        return True
+
+    def _face_due(self, timestamp, barcode_ok, tracking):
+        if barcode_ok and tracking:
+            # badge is in and a face is held: go as fast as the inference service lets us
+            self._last_face = timestamp
+            return True
+        # looking for a face means a full re-detect, so keep that on an interval
+        base = self.tracked_face_interval if (tracking or barcode_ok) else self.face_interval
+        if timestamp - self._last_face <= self._interval(base, timestamp):
+            return False
+        self._last_face = timestamp
+        self._ran_idle(timestamp)
+        return True
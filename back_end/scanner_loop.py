@@ -1,83 +1,105 @@
 import threading, time, asyncio
 import cv2
+import numpy as np
 from back_end.scanner_state import scanner_state
-from back_end.scanner_worker import scan_worker
+from back_end.scanner_worker import scan_worker, barcode_roi
 
-worker_thread = None
-current_overlay = {"face_verified": False, "barcode_verified": False, "current_name": "Idle"}
-
-# ---------------- CALLBACK ----------------
-def overlay_update(new_state):
-    global current_overlay
-    current_overlay = new_state
-
-# Register callback once
-scanner_state.register_callback(overlay_update)
+worker_threads = {}  # kiosk_id -> scan worker thread
 
 # ---------------- WORKER ----------------
-def start_worker():
-    global worker_thread
-    if not worker_thread or not worker_thread.is_alive():
-        worker_thread = threading.Thread(target=scan_worker, daemon=True)
-        worker_thread.start()
+def start_worker(state=scanner_state):
+    thread = worker_threads.get(state.kiosk_id)
+    if not thread or not thread.is_alive():
+        thread = threading.Thread(target=scan_worker, args=(state,), daemon=True)
+        worker_threads[state.kiosk_id] = thread
+        thread.start()
 
 # ---------------- FRAME PROCESSING ----------------
-def process_frame(frame, timestamp, scanning=False, debug=True):
-    h, w = frame.shape[:2]
-    roi_coords = (0, h // 2, w // 2, h)
-    rframe = frame.copy() if debug else frame
-    if scanning and not scanner_state.stop_requested:
-        if scanner_state.task_queue.full():
-            try:
-                scanner_state.task_queue.get_nowait()
-            except Exception:
-                pass
-        scanner_state.task_queue.put((rframe, roi_coords, timestamp))
+def process_frame(frame, timestamp, debug=True, state=scanner_state):
+    """
+    Publishes a captured frame to the kiosk's raw ring (no copy if it was read into
+    raw_frames.next_buffer()) and, with debug on, an annotated copy to the main ring.
+    """
+    state.annotate = debug
+    state.raw_frames.write(frame, timestamp)
+    if not debug:
+        return frame
 
-    if scanner_state.preview_requested.is_set() and not scanner_state.photo_taken_event.is_set():
-        scanner_state.set_rframe(rframe)
-        scanner_state._preview_frame_event.set()
+    out = state.main_frames.next_buffer(frame.shape, frame.dtype)
+    np.copyto(out, frame)
+    roi_coords = barcode_roi(frame.shape)
+    cv2.rectangle(out, (roi_coords[0], roi_coords[1]), (roi_coords[2], roi_coords[3]), (255, 255, 0), 2)
+    face_ok = state.overlay.get("face_verified", False)
+    barcode_ok = state.overlay.get("barcode_verified", False)
+    name = state.overlay.get("current_name", "Idle")
+    color = (0, 255, 0) if (face_ok and barcode_ok) else (0, 0, 255)
+    cv2.putText(out, f"Face:{face_ok} | Barcode:{barcode_ok} | {name}", (10, 50),
+                cv2.FONT_HERSHEY_SIMPLEX, 2, color, 4)
+    state.main_frames.commit(timestamp)
+    return out
 
-    if debug:
-        cv2.rectangle(frame, (roi_coords[0], roi_coords[1]), (roi_coords[2], roi_coords[3]), (255, 255, 0), 2)
-        face_ok = current_overlay.get("face_verified", False)
-        barcode_ok = current_overlay.get("barcode_verified", False)
-        name = current_overlay.get("current_name", "Idle")
-        color = (0, 255, 0) if (face_ok and barcode_ok) else (0, 0, 255)
-        cv2.putText(frame, f"Face:{face_ok} | Barcode:{barcode_ok} | {name}", (10, 50),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, color, 4)
+# ---------------- CAPTURE SOURCE ----------------
+def open_source(source):
+    """Device index, video file path or RTSP/HTTP URL."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    cap = cv2.VideoCapture(source)
+    if isinstance(source, int):
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+    return cap
 
-    scanner_state.set_frame(frame)
-    scanner_state._main_frame_event.set()
-    return frame
+def is_file_source(source):
+    return isinstance(source, str) and not source.isdigit() and "://" not in source
 
 # ---------------- SCANNER LOOP ----------------
-def scanner_loop(debugwindow=True, debugroi=True):
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+def scanner_loop(debugwindow=True, debugroi=True, state=scanner_state, source=0, loop_file=True):
+    cap = open_source(source)
     if not cap.isOpened():
-        print("[-] Cannot open camera.")
+        print(f"[-] Cannot open camera ({state.kiosk_id}: {source}).")
         return
 
+    # recorded video: replay at its own frame rate and rewind at the end
+    from_file = is_file_source(source)
+    frame_period = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30) if from_file else 0
+    next_frame_at = time.time()
+    shape = None
+
     while True:
-        ret, frame = cap.read()
+        # decode straight into the next ring slot once the frame size is known
+        if shape is not None:
+            ret, frame = cap.read(state.raw_frames.next_buffer(shape))
+        else:
+            ret, frame = cap.read()
         if not ret:
+            if from_file:
+                if not loop_file:
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             continue
 
+        shape = frame.shape
+        if from_file:
+            next_frame_at += frame_period
+            delay = next_frame_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame_at = time.time()
+
         # Restart worker if scanning restarted
-        if scanner_state.scan_request["running"] and not scanner_state.stop_requested:
-            start_worker()
+        if state.scan_request["running"] and not state.stop_requested:
+            start_worker(state)
 
         processed_frame = process_frame(
             frame,
             time.time(),
-            scanning=scanner_state.scan_request["running"],
-            debug=debugroi
+            debug=debugroi,
+            state=state
         )
 
         if debugwindow:
-            cv2.imshow("Scanner Debug", processed_frame)
+            cv2.imshow(f"Scanner Debug ({state.kiosk_id})", processed_frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
@@ -1,24 +1,32 @@
 import threading
-from queue import Queue
 import time
+from back_end.frame_ring import FrameRing
+from back_end.stage_metrics import StageMetrics
+
+DEFAULT_KIOSK = "default"
 
 class ScannerState:
-    def __init__(self):
-        self._frame_lock = threading.Lock()
-        self._latest_frame = None
-        self._main_frame_event = threading.Event()
+    def __init__(self, kiosk_id=DEFAULT_KIOSK):
+        self.kiosk_id = kiosk_id
+        self.clock = time.time  # swapped for a fake clock by the replay benchmark
+        # --------- FRAMES ----------
+        # raw camera frames (scan worker, preview) and the annotated ROI stream (main track)
+        self.raw_frames = FrameRing()
+        self.main_frames = FrameRing()
+        self.annotate = True  # False: the main stream is the raw ring, no overlay copy
+        self.frames_dropped = 0  # frames the scan worker skipped
+        self.scan_pipeline = None  # ScanPipeline of the running scan session
+        self.stage_metrics = StageMetrics()
+        self.barcode_reader = None  # BarcodeReader created by the first scan worker
 
         # --------- Managing students ----------
-        self._rframe_lock = threading.Lock()
-        self._latest_rframe = None
-        self._preview_frame_event = threading.Event()
+        self._photo_frame = None  # raw frame frozen by mark_photo_taken()
 
         # --------- PREVIEW EVENTS ----------
         # Signals for event-driven WebRTC preview
         self.preview_requested = threading.Event()
         self.photo_taken_event = threading.Event()
 
-        self.task_queue = Queue(maxsize=1)
         self._scan_request = {"running": False}
         self._auth_status = {"authorized": False, "user": None}
         self._scan_results = {
@@ -33,34 +41,51 @@ class ScannerState:
         self.face_lock_until = 0
         self.barcode_lock_until = 0
         self.stop_requested = False
+        self.face_first = False  # 1:N face identification instead of badge-first
 
         self.no_badge_timeout = 10  # seconds
-        self._last_barcode_time = time.time()
+        self._last_barcode_time = self.clock()
 
         self._scan_callbacks = []
+        self.overlay = self._scan_results.copy()  # last emitted results, drawn on the debug ROI
 
         self._socketio = None  # <-- socketio placeholder
 
     def set_socketio(self, sio):
         self._socketio = sio
 
-    # ---------------- RAW FRAME ----------------
-    def set_rframe(self, frame):
-        with self._rframe_lock:
-            self._latest_rframe = frame if frame is not None else None
+    @property
+    def room(self):
+        # the default kiosk keeps broadcasting to every client; others emit to their own room
+        return None if self.kiosk_id == DEFAULT_KIOSK else self.kiosk_id
 
+    # ---------------- RAW FRAME ----------------
     def get_rframe(self):
-        with self._rframe_lock:
-            return self._latest_rframe if self._latest_rframe is not None else None
+        """Frame captured for enrollment once a photo was taken, else a copy of the latest raw frame."""
+        if self.photo_taken_event.is_set() and self._photo_frame is not None:
+            return self._photo_frame
+        return self.raw_frames.copy_latest()
 
     # ---------------- FRAME WITH ROI ------------
-    def set_frame(self, frame):
-        with self._frame_lock:
-            self._latest_frame = frame if frame is not None else None
+    @property
+    def main_ring(self):
+        return self.main_frames if self.annotate else self.raw_frames
 
     def get_frame(self):
-        with self._frame_lock:
-            return self._latest_frame if self._latest_frame is not None else None
+        return self.main_ring.copy_latest()
+
+    @property
+    def frame_count(self):
+        return self.raw_frames.seq + 1
+
+    def pipeline_stats(self):
+        return {
+            "frames": self.frame_count,
+            "frames_dropped": self.frames_dropped,
+            "stages": self.stage_metrics.snapshot(),
+            "barcode": self.barcode_reader.stats() if self.barcode_reader is not None else None,
+            "pipeline": self.scan_pipeline.stats() if self.scan_pipeline is not None else None,
+        }
 
     # ---------------- PROPERTIES ----------------
     @property
@@ -91,12 +116,31 @@ class ScannerState:
     def current_embed(self, embed):
         self._current_embed = embed
 
+    # ---------------- SCAN CONTROL ----------------
+    def toggle_scan(self, face_first=False):
+        """Starts or stops scanning (the capture loop starts the worker); returns the new running flag."""
+        running = not self._scan_request["running"]
+        self.stop_requested = not running
+        self._scan_request["running"] = running
+
+        if running:
+            self.face_first = face_first
+            self.update_last_barcode()
+            self._auth_status.update({"authorized": False, "user": None})
+            self._scan_results.update({
+                "face_verified": False,
+                "barcode_verified": False,
+                "current_name": "Idle",
+                "badge_timeout_exceeded": False,
+            })
+        return running
+
     # ---------------- BARCODE TIMEOUT ----------------
     def update_last_barcode(self):
-        self._last_barcode_time = time.time()
+        self._last_barcode_time = self.clock()
 
     def badge_timeout_exceeded(self):
-        return (time.time() - self._last_barcode_time) > self.no_badge_timeout
+        return (self.clock() - self._last_barcode_time) > self.no_badge_timeout
 
     # ---------------- EMIT ----------------
     def register_callback(self, callback):
@@ -110,6 +154,8 @@ class ScannerState:
             except Exception:
                 pass
 
+        self.overlay = self._scan_results.copy()
+
         # Call all local callbacks
         for cb in self._scan_callbacks:
             try:
@@ -119,6 +165,7 @@ class ScannerState:
 
     def _emit_socket(self):
         self._socketio.emit("scan_status", {
+            "kiosk": self.kiosk_id,
             "running": self._scan_request["running"],
             "authorized": self._auth_status["authorized"],
             "user": self._auth_status["user"],
@@ -126,7 +173,7 @@ class ScannerState:
             "barcode_verified": self._scan_results["barcode_verified"],
             "current_name": self._scan_results["current_name"],
             "badge_timeout_exceeded": self._scan_results["badge_timeout_exceeded"],
-        }, namespace="/")
+        }, namespace="/", to=self.room)
 
     # ---- Preview async methods ----
     def request_preview(self):
@@ -137,6 +184,7 @@ class ScannerState:
         self.preview_requested.clear()
 
     def mark_photo_taken(self):
+        self._photo_frame = self.raw_frames.copy_latest()
         self.photo_taken_event.set()
 
 
@@ -1,178 +1,308 @@
-import time
+import threading
+from concurrent.futures import TimeoutError
 import cv2
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
-from deepface import DeepFace
-from pyzbar.pyzbar import decode, ZBarSymbol
-import requests
 from back_end.scanner_state import scanner_state
+from back_end.inference_service import inference_service
+from back_end.face_tracker import FaceTracker
+from back_end.barcode_reader import BarcodeReader
+from back_end.scan_scheduler import ScanScheduler
+from back_end.scan_pipeline import ScanPipeline
+from back_end.Database.student_cache import student_cache
+from back_end.face_index import face_index, TOP_K
 
-API_BASE = "http://127.0.0.1:5000/api/students"
 SIMILARITY_THRESHOLD = 0.5
 VALID_TIME = 7
 SCALED_WIDTH = 720
 FACE_INTERVAL = 0.5
+TRACKED_FACE_INTERVAL = 0.2  # verify interval while a face is being tracked
 BARCODE_INTERVAL = 0.5
+FACE_FIRST = False  # opt-in 1:N identification against every enrolled student
+FACE_MAX_AGE = 2.0  # seconds a face embedding stays usable while its badge is looked up
+FUSION_INTERVAL = 0.05  # fusion re-checks timeouts at least this often without new results
 
-_executor = ThreadPoolExecutor(max_workers=2)
-
-def l2_normalize(vec):
-    norm = np.linalg.norm(vec)
-    return vec / norm if norm > 0 else vec
-
-def parse_pg_array(embed_value):
-    import json, re
-    if embed_value is None:
-        return None
-    if isinstance(embed_value, (list, tuple, np.ndarray)):
-        return np.array(embed_value, dtype=np.float32)
-    if isinstance(embed_value, str):
-        try:
-            if embed_value.startswith("["):
-                return np.array(json.loads(embed_value), dtype=np.float32)
-            if embed_value.startswith("{"):
-                clean = embed_value.strip("{}").strip()
-                if not clean:
-                    return None
-                return np.array(list(map(float, re.split(r",\s*", clean))), dtype=np.float32)
-        except Exception:
-            return None
-    return None
+def barcode_roi(shape):
+    """Bottom-left quadrant, where the badge is held."""
+    h, w = shape[:2]
+    return 0, h // 2, w // 2, h
 
 def fetch_student_by_sid(sid):
     try:
-        r = requests.get(f"{API_BASE}/{sid}", timeout=3)
-        if r.status_code == 200:
-            wrapper = r.json()
-            student = wrapper["data"]
-            embed = student.get("embed", None)
-            student["embed"] = parse_pg_array(embed)
-            return student
+        return student_cache.get(sid)
     except Exception:
-        pass
-    return None
+        return None
 
 
-def _deepface_represent(resized):
-    return DeepFace.represent(
-        img_path=resized,
-        model_name="SFace",
-        detector_backend="opencv",
-        enforce_detection=False
-    )
+_index_lock = threading.Lock()
+_index_loader = None  # background thread loading face_index
+
 
-def emit_if_changed(new_auth, new_results):
+def preload_face_index():
+    """Starts loading face_index on a background thread, unless it is loaded or loading."""
+    global _index_loader
+    with _index_lock:
+        if face_index.loaded or (_index_loader is not None and _index_loader.is_alive()):
+            return
+        _index_loader = threading.Thread(target=_load_face_index, name="face-index-load", daemon=True)
+        _index_loader.start()
+
+
+def _load_face_index():
+    try:
+        count = face_index.load_from_db()
+        print(f"[+] Face index loaded with {count} embeddings.")
+    except Exception as e:
+        print(f"[-] Face index load failed: {e}")
+
+
+def identify_face(live_embed):
+    """
+    1:N lookup: returns the best matching student above threshold, or None. Never loads
+    the index on the caller's (fusion) thread: until the background load finishes there
+    is simply no match, and the badge path still works.
+    """
+    if not face_index.loaded:
+        preload_face_index()
+        return None
+    matches = face_index.search(live_embed, k=TOP_K)
+    if not matches or matches[0][1] < SIMILARITY_THRESHOLD:
+        return None
+    return fetch_student_by_sid(matches[0][0])
+
+
+def emit_if_changed(new_auth, new_results, state=scanner_state):
     changed = False
-    if new_auth != scanner_state.auth_status:
-        scanner_state.auth_status.update(new_auth)
+    if new_auth != state.auth_status:
+        state.auth_status.update(new_auth)
         changed = True
-    if new_results != scanner_state.scan_results:
-        scanner_state.scan_results.update(new_results)
+    if new_results != state.scan_results:
+        state.scan_results.update(new_results)
         changed = True
     if changed:
-        scanner_state.emit_scan_status()
+        state.emit_scan_status()
 
-def scan_worker():
+# ---------------- STAGES ----------------
+def barcode_stage(state, pipeline, scheduler, badges):
+    """Frames -> decoded badge sids, on the scheduler's barcode interval."""
+    reader = pipeline.readers["barcode"]
+    stages = state.stage_metrics
+    while not pipeline.stop.is_set():
+        item = reader.read(timeout=0.5)
+        if item is None:
+            continue
+        # a view into the ring slot: the capture thread may reuse it while zbar runs,
+        # so a result only counts if the slot still holds this frame afterwards
+        frame, timestamp = item
+        try:
+            with stages.measure("motion"):
+                scheduler.observe(frame, timestamp)
+            if scheduler.barcode_due(timestamp, pipeline.barcode_ok, pipeline.face_ok):
+                x0, y0, x1, y1 = barcode_roi(frame.shape)
+                with stages.measure("barcode"):
+                    sid = state.barcode_reader.read(frame[y0:y1, x0:x1])
+                if sid and reader.valid():
+                    print(sid)
+                    badges.put((sid, timestamp))
+        except Exception:
+            pass
+        finally:
+            pipeline.finished("barcode")
+
+
+def identity_stage(state, pipeline, lookup, badges, identities):
+    """Badge sids -> student rows; a slow lookup only delays this stage."""
+    stages = state.stage_metrics
+    while not pipeline.stop.is_set():
+        item = badges.get(timeout=0.5)
+        if item is None:
+            continue
+        sid, timestamp = item
+        try:
+            with stages.measure("identity"):
+                student = lookup(sid)
+            identities.put((sid, student, timestamp))
+        except Exception:
+            pass
+        finally:
+            badges.task_done()
+
+
+def face_stage(state, pipeline, inference, scheduler, faces):
+    """
+    Frames -> embeddings of the tracked face, until the face is verified. In badge-first
+    mode the model only runs once a badge is in; before that the face is just tracked.
+    """
+    reader = pipeline.readers["face"]
+    stages = state.stage_metrics
+    tracker = FaceTracker()
+    while not pipeline.stop.is_set():
+        item = reader.read(timeout=0.5)
+        if item is None:
+            continue
+        frame, timestamp = item
+        try:
+            # before a badge (and without face-first) there is nothing to verify against:
+            # keep the slower interval and only keep the tracker warm
+            wanted = pipeline.barcode_ok or state.face_first
+            fast = tracker.box is not None and wanted
+            if pipeline.face_ok or not scheduler.face_due(timestamp, pipeline.barcode_ok, tracking=fast):
+                continue
+            # only the tracked face crop goes to the model; no face, no inference
+            with stages.measure("track"):
+                crop = tracker.crop(frame)
+            if crop is None or not wanted:
+                continue
+            if crop.shape[1] > SCALED_WIDTH:
+                scale = SCALED_WIDTH / crop.shape[1]
+                crop = cv2.resize(crop, (SCALED_WIDTH, int(crop.shape[0] * scale)))
+            else:
+                crop = crop.copy()  # the ring slot is reused while inference is queued
+            if not reader.valid():
+                continue  # the slot was rewritten under tracking / the copy: torn crop
+            with stages.measure("face"):
+                live_embed = _wait(inference.submit(crop, key=state.kiosk_id, timestamp=timestamp), pipeline.stop)
+            if live_embed is not None:
+                faces.put((live_embed, timestamp))
+        except Exception:
+            pass
+        finally:
+            pipeline.finished("face")
+
+
+def _wait(future, stop):
+    while not stop.is_set():
+        try:
+            return future.result(timeout=0.5)
+        except TimeoutError:
+            continue
+    future.cancel()
+    return None
+
+
+# ---------------- FUSION ----------------
+def scan_worker(state=scanner_state, inference=inference_service, lookup=fetch_student_by_sid):
+    """
+    Runs one scan session. Barcode decoding, identity lookup and face embedding run
+    as separate stage threads feeding latest-value channels; this thread is the
+    fusion stage that combines their results into the verification decision.
+    """
     emit_if_changed(
         {"authorized": False, "user": None},
-        {"face_verified": False, "barcode_verified": False, "current_name": "Idle"}
+        {"face_verified": False, "barcode_verified": False, "current_name": "Idle"},
+        state
     )
-    face_ok = scanner_state.scan_results["face_verified"]
-    barcode_ok = scanner_state.scan_results["barcode_verified"]
-    name = scanner_state.scan_results["current_name"]
+    face_ok = state.scan_results["face_verified"]
+    barcode_ok = state.scan_results["barcode_verified"]
+    name = state.scan_results["current_name"]
     timeout = False
-    last_face_scan = 0
-    last_barcode_scan = 0
-    face_future = None
-    student = None
     sid = None
+    identified = False  # face-first match, no badge needed
+    last_face = None    # (embedding, timestamp) waiting for a badge to compare against
+    stages = state.stage_metrics
+    if state.barcode_reader is None:
+        state.barcode_reader = BarcodeReader()  # outlives the worker so its stats add up
+    if state.face_first:
+        preload_face_index()  # face-first can be switched on per session, not just at startup
+
+    pipeline = ScanPipeline()
+    wakeup = threading.Event()
+    badges = pipeline.channel("badges")
+    identities = pipeline.channel("identities", wakeup)
+    faces = pipeline.channel("faces", wakeup)
+    scheduler = ScanScheduler(BARCODE_INTERVAL, FACE_INTERVAL, TRACKED_FACE_INTERVAL)
+    pipeline.add_reader("barcode", state.raw_frames.reader())
+    pipeline.add_reader("face", state.raw_frames.reader())
+    pipeline.start("barcode", barcode_stage, state, pipeline, scheduler, badges)
+    pipeline.start("identity", identity_stage, state, pipeline, lookup, badges, identities)
+    pipeline.start("face", face_stage, state, pipeline, inference, scheduler, faces)
+    state.scan_pipeline = pipeline
 
-    while not scanner_state.stop_requested and scanner_state.scan_request["running"]:
+    while not state.stop_requested and state.scan_request["running"]:
+        wakeup.wait(FUSION_INTERVAL)
+        wakeup.clear()
+        identity = identities.poll()
+        face = faces.poll()
+        state.frames_dropped = pipeline.frames_dropped
         try:
-            task = scanner_state.task_queue.get(timeout=0.5)
-        except Exception:
-            continue
+            with stages.measure("fusion"):
+                now = state.clock()
+
+                # --- BADGE ---
+                if identity is not None:
+                    sid, student, timestamp = identity
+                    if student is not None and student.get("embed") is not None:
+                        barcode_ok = True
+                        state.barcode_lock_until = timestamp + VALID_TIME
+                        state.current_student = student
+                        state.current_embed = student["embed"]  # already normalized by the cache
+                        name = f"{student.get('first_name', '')} {student.get('last_name', '')}".strip()
+                        state.update_last_barcode()
+                    else:
+                        barcode_ok = False
+                        state.current_embed = None
+                        state.current_student = None
 
-        if task is None or scanner_state.stop_requested:
-            break
-
-        frame, roi_coords, timestamp = task
-        # --- BARCODE DETECTION ---
-        if timestamp - last_barcode_scan > BARCODE_INTERVAL:
-            last_barcode_scan = timestamp
-            roi = frame[roi_coords[1]:roi_coords[3], roi_coords[0]:roi_coords[2]]
-            if student is None:
-                decoded = decode(cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY), symbols=[ZBarSymbol.CODE128])
-
-            if decoded:
-                sid = decoded[0].data.decode("utf-8").strip()
-                print(sid)
-                student = fetch_student_by_sid(sid)
-
-                if student is not None and student.get("embed") is not None:
-                    barcode_ok = True
-                    scanner_state.barcode_lock_until = timestamp + VALID_TIME
-                    scanner_state.current_student = student
-                    scanner_state.current_embed = l2_normalize(student["embed"])
-                    name = f"{student.get('first_name', '')} {student.get('last_name', '')}".strip()
-                    scanner_state.update_last_barcode()
-                else:
+                # --- FACE ---
+                if face is not None:
+                    last_face = face
+                if last_face is not None and now - last_face[1] > FACE_MAX_AGE:
+                    last_face = None
+                if last_face is not None:
+                    live_embed = last_face[0]
+                    if barcode_ok and state.current_embed is not None:
+                        last_face = None
+                        sim = float(np.dot(live_embed, state.current_embed))
+                        if sim >= SIMILARITY_THRESHOLD:
+                            face_ok = True
+                            break
+                    elif state.face_first:
+                        last_face = None
+                        student = identify_face(live_embed)
+                        if student is not None:
+                            face_ok = True
+                            identified = True
+                            sid = student["sid"]
+                            state.current_student = student
+                            state.current_embed = student["embed"]
+                            name = f"{student.get('first_name', '')} {student.get('last_name', '')}".strip()
+                            break
+
+                # --- TIMEOUT ---
+                if state.badge_timeout_exceeded() and not barcode_ok:
+                    print("[-] Badge timeout exceeded.")
+                    timeout = True
+                    barcode_ok = False
+                    face_ok = False
+                    break
+
+                # --- EXPIRATION ---
+                if now > state.face_lock_until:
+                    face_ok = False
+                if now > state.barcode_lock_until:
                     barcode_ok = False
-                    scanner_state.current_embed = None
-                    scanner_state.current_student = None
-
-        # --- TIMEOUT ---
-        if scanner_state.badge_timeout_exceeded() and not barcode_ok:
-            print("[-] Badge timeout exceeded.")
-            timeout = True
-            barcode_ok = False
-            face_ok = False
-            break
-
-        # --- FACE VERIFICATION ---
-        if barcode_ok and scanner_state.current_embed is not None:
-            if timestamp - last_face_scan > FACE_INTERVAL:
-                last_face_scan = timestamp
-                try:
-                    scale = SCALED_WIDTH / frame.shape[1]
-                    resized = cv2.resize(frame, (SCALED_WIDTH, int(frame.shape[0] * scale)))
-                    if face_future is None or face_future.done():
-                        face_future = _executor.submit(_deepface_represent, resized)
-                except Exception:
-                    continue
-
-        if face_future and face_future.done():
-            try:
-                results = face_future.result(timeout=0)
-                if results:
-                    largest = max(results, key=lambda f: f["facial_area"]["w"] * f["facial_area"]["h"])
-                    live_embed = l2_normalize(np.array(largest["embedding"], dtype=np.float32))
-                    sim = float(np.dot(live_embed, scanner_state.current_embed))
-                    if sim >= SIMILARITY_THRESHOLD:
-                        face_ok = True
-                        break
-            except Exception:
-                pass
-            finally:
-                face_future = None
-
-        # --- EXPIRATION ---
-        now = time.time()
-        if now > scanner_state.face_lock_until:
-            face_ok = False
-        if now > scanner_state.barcode_lock_until:
-            barcode_ok = False
-
-        emit_if_changed(
-            scanner_state.auth_status,
-            {"face_verified": face_ok, "barcode_verified": barcode_ok, "current_name": name}
-        )
+                pipeline.barcode_ok, pipeline.face_ok = barcode_ok, face_ok
+
+                emit_if_changed(
+                    state.auth_status,
+                    {"face_verified": face_ok, "barcode_verified": barcode_ok, "current_name": name},
+                    state
+                )
+        except Exception:
+            pass
+        finally:
+            if identity is not None:
+                identities.task_done()
+            if face is not None:
+                faces.task_done()
 
     # Clean shutdown
-    print("[+] Scan worker finished.")
-    scanner_state.stop_requested = False
-    scanner_state.scan_request["running"] = False
+    pipeline.join()
+    print(f"[+] Scan worker finished ({state.kiosk_id}).")
+    state.scan_pipeline = None
+    state.stop_requested = False
+    state.scan_request["running"] = False
     emit_if_changed(
-        {"authorized": face_ok and barcode_ok, "user": sid if not None else None},
-        {"face_verified": face_ok, "barcode_verified": barcode_ok, "current_name": name, "badge_timeout_exceeded": timeout}
-    )
\ No newline at end of file
+        {"authorized": face_ok and (barcode_ok or identified), "user": sid if not None else None},
+        {"face_verified": face_ok, "barcode_verified": barcode_ok, "current_name": name, "badge_timeout_exceeded": timeout},
+        state
+    )
@@ -0,0 +1,346 @@
+# back_end/server/asgi_main.py
+# Asyncio deployment: Starlette + python-socketio (ASGI) served by uvicorn. HTTP routes,
+# Socket.IO events and aiortc signalling all run on the one server event loop, so an
+# offer or take_photo awaits instead of parking a request thread. Blocking work goes to
+# explicit executors: the psycopg2 data layer to db_executor (sized to the connection
+# pool, so no thread ever waits for a connection) and warm-up/model loading to
+# blocking_executor. Capture loops, scan workers and inference keep their own threads.
+#
+#   pip install starlette uvicorn python-socketio
+#   python -m back_end.server.asgi_main [--source kiosk=source ...] [--port 5000]
+import argparse
+import asyncio
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from email.utils import format_datetime
+
+import socketio
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from back_end.Database.db import POOL_MAX_CONN
+from back_end.Database.listing import RowStream
+from back_end.Database.students import (
+    create_student, get_student, list_students, update_student, delete_student,
+    search_students, recently_modified_students, import_students, export_students
+)
+from back_end.Database.phones import (
+    create_phone, get_phones, list_phones, update_phone, delete_phone,
+    phones_not_stored, phones_by_condition, phone_stats, reassign_phone, regenerate_pid, phones_near_location,
+    free_slots_near_location, phones_in_box, import_phones, export_phones
+)
+from back_end.kiosks import get_state, set_socketio, start_kiosks, parse_sources
+from back_end.scanner_worker import FACE_FIRST
+from back_end.server.startup import warm_student_cache, load_face_engine, metrics_snapshot
+from back_end.server.webrtc_handler import offer_request, take_photo_request, close_connections
+
+PHOTO_TIMEOUT = 10  # seconds, same budget the Flask routes give the aiortc loop
+OFFER_TIMEOUT = 10
+
+db_executor = ThreadPoolExecutor(max_workers=POOL_MAX_CONN, thread_name_prefix="db")
+blocking_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="blocking")
+
+sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
+
+
+# ===========================================================
+# Helpers
+# ===========================================================
+def _json_default(value):
+    # what Flask's jsonify does for the types our rows contain
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return format_datetime(value.astimezone(datetime.timezone.utc), usegmt=True)
+    if isinstance(value, datetime.date):
+        return format_datetime(datetime.datetime.combine(value, datetime.time(), datetime.timezone.utc), usegmt=True)
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+
+class APIResponse(JSONResponse):
+    def render(self, content):
+        return _dumps(content).encode("utf-8")
+
+
+async def _stream_chunks(stream):
+    # each chunk runs one STREAM_BATCH keyset query on db_executor
+    chunks = stream.render(_dumps)
+    try:
+        while True:
+            chunk = await run_db(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        await run_db(stream.close)
+
+
+def handle_response(res):
+    data, code = res if isinstance(res, tuple) else (res, 200)
+    if isinstance(data, RowStream):
+        return StreamingResponse(_stream_chunks(data), status_code=code, media_type=data.mimetype)
+    return APIResponse(data, status_code=code)
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, fn, *args)
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(blocking_executor, fn, *args)
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def db_route(fn, *path_params, body=False):
+    """Endpoint that calls a data-layer function with path params (+ the JSON body) on db_executor."""
+    async def endpoint(request):
+        args = [request.path_params[name] for name in path_params]
+        if body:
+            data = await _json_body(request)
+            if data is None:
+                return handle_response(({"status": "error", "message": "Invalid JSON body"}, 400))
+            args.append(data)
+        return handle_response(await run_db(fn, *args))
+    return endpoint
+
+
+def list_route(fn):
+    """Endpoint for a streamed list: after/limit/fields come from the query string."""
+    async def endpoint(request):
+        query = request.query_params
+        return handle_response(await run_db(fn, query.get("after"), query.get("limit"), query.get("fields")))
+    return endpoint
+
+
+def import_route(fn):
+    """Bulk upload endpoint: the raw CSV / NDJSON body, ?format= and ?atomic= go to `fn`."""
+    async def endpoint(request):
+        body = await request.body()
+        mimetype = request.headers.get("content-type", "").split(";")[0].strip()
+        atomic = request.query_params.get("atomic", "").lower() in ("1", "true", "yes")
+        return handle_response(await run_db(fn, body, mimetype, request.query_params.get("format"), atomic))
+    return endpoint
+
+
+def export_route(fn):
+    """Streamed export: ?format=csv|ndjson plus the list parameters."""
+    async def endpoint(request):
+        query = request.query_params
+        return handle_response(await run_db(fn, query.get("format"), query.get("after"),
+                                            query.get("limit"), query.get("fields")))
+    return endpoint
+
+
+# ===========================================================
+# Students / phones API (same routes as the Flask blueprints)
+# ===========================================================
+async def api_search_students(request):
+    query = request.query_params
+    return handle_response(await run_db(search_students, query.get("q", "").strip(), query.get("mode"), query.get("limit")))
+
+
+async def api_recent_students(request):
+    return handle_response(await run_db(recently_modified_students, request.query_params.get("since")))
+
+
+async def api_reassign_phone(request):
+    data = await _json_body(request) or {}
+    return handle_response(await run_db(reassign_phone, data.get("old_sid"), data.get("new_sid")))
+
+
+def nearby_route(fn):
+    """Endpoint for a nearest-first lookup: x, y and limit from the query string."""
+    async def endpoint(request):
+        try:
+            x = int(request.query_params.get("x"))
+            y = int(request.query_params.get("y"))
+            limit = int(request.query_params.get("limit", 10))
+        except (TypeError, ValueError):
+            return handle_response(({"status": "error", "message": "Invalid x, y, or limit"}, 400))
+        return handle_response(await run_db(fn, x, y, limit))
+    return endpoint
+
+
+async def api_phones_in_box(request):
+    query = request.query_params
+    try:
+        corners = [int(query.get(name)) for name in ("x1", "y1", "x2", "y2")]
+    except (TypeError, ValueError):
+        return handle_response(({"status": "error", "message": "Invalid x1, y1, x2, or y2"}, 400))
+    return handle_response(await run_db(phones_in_box, *corners, query.get("after"), query.get("limit"), query.get("fields")))
+
+
+async def api_metrics(request):
+    return handle_response({"status": "success", "data": metrics_snapshot()})
+
+
+# ===========================================================
+# WebRTC signalling
+# ===========================================================
+async def webrtc_offer(request):
+    data = await _json_body(request)
+    try:
+        res = await asyncio.wait_for(
+            offer_request(request.path_params["mode"], data, request.query_params.get("kiosk")),
+            OFFER_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        res = {"status": "error", "message": "Offer timed out"}, 500
+    return handle_response(res)
+
+
+async def webrtc_take_photo(request):
+    try:
+        res = await asyncio.wait_for(take_photo_request(request.query_params.get("kiosk")), PHOTO_TIMEOUT)
+    except asyncio.TimeoutError:
+        res = {"status": "error", "message": "Timed out waiting for the photo embedding"}, 200
+    return handle_response(res)
+
+
+async def webrtc_cancel(request):
+    return handle_response(await close_connections(request.path_params["mode"], request.query_params.get("kiosk")))
+
+
+routes = [
+    Route("/api/metrics", api_metrics, methods=["GET"]),
+
+    Route("/api/students/", list_route(list_students), methods=["GET"]),
+    Route("/api/students/", db_route(create_student, body=True), methods=["POST"]),
+    Route("/api/students/search", api_search_students, methods=["GET"]),
+    Route("/api/students/recent", api_recent_students, methods=["GET"]),
+    Route("/api/students/import", import_route(import_students), methods=["POST"]),
+    Route("/api/students/export", export_route(export_students), methods=["GET"]),
+    Route("/api/students/{sid}", db_route(get_student, "sid"), methods=["GET"]),
+    Route("/api/students/{sid}", db_route(update_student, "sid", body=True), methods=["PUT"]),
+    Route("/api/students/{sid}", db_route(delete_student, "sid"), methods=["DELETE"]),
+
+    Route("/api/phones/", list_route(list_phones), methods=["GET"]),
+    Route("/api/phones/", db_route(create_phone, body=True), methods=["POST"]),
+    Route("/api/phones/not_stored", list_route(phones_not_stored), methods=["GET"]),
+    Route("/api/phones/condition/{cond}", db_route(phones_by_condition, "cond"), methods=["GET"]),
+    Route("/api/phones/stats", db_route(phone_stats), methods=["GET"]),
+    Route("/api/phones/reassign", api_reassign_phone, methods=["PATCH"]),
+    Route("/api/phones/nearby", nearby_route(phones_near_location), methods=["GET"]),
+    Route("/api/phones/free_nearby", nearby_route(free_slots_near_location), methods=["GET"]),
+    Route("/api/phones/box", api_phones_in_box, methods=["GET"]),
+    Route("/api/phones/import", import_route(import_phones), methods=["POST"]),
+    Route("/api/phones/export", export_route(export_phones), methods=["GET"]),
+    Route("/api/phones/regenerate_pid/{sid}", db_route(regenerate_pid, "sid"), methods=["PATCH"]),
+    Route("/api/phones/{sid}", db_route(get_phones, "sid"), methods=["GET"]),
+    Route("/api/phones/{sid}", db_route(update_phone, "sid", body=True), methods=["PUT"]),
+    Route("/api/phones/{sid}", db_route(delete_phone, "sid"), methods=["DELETE"]),
+
+    Route("/webrtc/offer/{mode}", webrtc_offer, methods=["POST"]),
+    Route("/webrtc/take_photo", webrtc_take_photo, methods=["POST"]),
+    Route("/webrtc/cancel/{mode}", webrtc_cancel, methods=["POST"]),
+]
+
+
+# ===========================================================
+# Socket.IO
+# ===========================================================
+class LoopEmitter:
+    """
+    What ScannerState expects from flask_socketio (start_background_task + emit), backed by
+    the AsyncServer. Scanner threads only schedule the emit on the server loop; they never wait.
+    """
+
+    def __init__(self, server, loop):
+        self.server = server
+        self.loop = loop
+
+    def start_background_task(self, target, *args, **kwargs):
+        target(*args, **kwargs)
+
+    def emit(self, event, data=None, namespace=None, to=None):
+        asyncio.run_coroutine_threadsafe(
+            self.server.emit(event, data, namespace=namespace, to=to), self.loop
+        )
+
+
+def _kiosk_state(data):
+    kiosk_id = data.get("kiosk") if isinstance(data, dict) else None
+    return get_state(kiosk_id)
+
+
+@sio.on("join_kiosk")
+async def handle_join_kiosk(sid, data):
+    state = _kiosk_state(data)
+    if state is None:
+        return
+    if state.room is not None:
+        await sio.enter_room(sid, state.room)
+    state._emit_socket()
+
+
+@sio.on("toggle_scan")
+async def handle_toggle_scan(sid, data):
+    state = _kiosk_state(data)
+    if state is None:
+        return
+    face_first = bool(data.get("face_first", FACE_FIRST)) if isinstance(data, dict) else FACE_FIRST
+    state.toggle_scan(face_first)
+    state._emit_socket()
+
+
+@sio.on("get_status")
+async def handle_get_status(sid, data):
+    state = _kiosk_state(data)
+    if state is not None:
+        state._emit_socket()
+
+
+# ===========================================================
+# App
+# ===========================================================
+def create_asgi_app(sources=None):
+    @asynccontextmanager
+    async def lifespan(app):
+        set_socketio(LoopEmitter(sio, asyncio.get_running_loop()))
+        await run_blocking(warm_student_cache)
+        await run_blocking(load_face_engine)
+        start_kiosks(sources, debugwindow=False, debugroi=True)
+        yield
+        db_executor.shutdown(wait=False)
+        blocking_executor.shutdown(wait=False)
+
+    api = Starlette(
+        routes=routes,
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+        lifespan=lifespan,
+    )
+    return socketio.ASGIApp(sio, other_asgi_app=api)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", action="append", default=[],
+                        help="kiosk=source, source is a device index, video file or RTSP URL (repeatable)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    uvicorn.run(create_asgi_app(parse_sources(args.source) or None), host=args.host, port=args.port)
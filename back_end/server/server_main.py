@@ -1,45 +1,65 @@
-import threading, asyncio
+import argparse, threading, asyncio
+from flask import jsonify
+from flask_socketio import join_room
 from back_end.server.app import create_app
 from back_end.server.webrtc_handler import webrtc_bp, async_loop
-from back_end.scanner_loop import scanner_loop
-from back_end.scanner_state import scanner_state
+from back_end.server.startup import warm_student_cache, load_face_engine, metrics_snapshot
+from back_end.kiosks import get_state, set_socketio, start_kiosks, parse_sources
+from back_end.scanner_worker import FACE_FIRST
 
 app, socketio = create_app()
 app.register_blueprint(webrtc_bp, url_prefix="/webrtc")
 
-# Pass socketio to scanner_state for emissions
-scanner_state.set_socketio(socketio)
+# Pass socketio to every kiosk's scanner state for emissions
+set_socketio(socketio)
 
 def _start_async_loop(loop):
     asyncio.set_event_loop(loop)
     loop.run_forever()
 
-# --- WebSocket Events ---
-@socketio.on("toggle_scan")
-def handle_toggle_scan(_):
-    new_state = not scanner_state.scan_request["running"]
+# --- Metrics ---
+@app.route("/api/metrics", methods=["GET"])
+def api_metrics():
+    return jsonify({"status": "success", "data": metrics_snapshot()})
 
+# --- WebSocket Events ---
+def _kiosk_state(data):
+    kiosk_id = data.get("kiosk") if isinstance(data, dict) else None
+    return get_state(kiosk_id)
 
-    scanner_state.stop_requested = not new_state
-    scanner_state.scan_request["running"] = new_state
+@socketio.on("join_kiosk")
+def handle_join_kiosk(data):
+    state = _kiosk_state(data)
+    if state is None:
+        return
+    if state.room is not None:
+        join_room(state.room)
+    state._emit_socket()
 
-    if new_state:
-        scanner_state.update_last_barcode()
-        scanner_state.auth_status.update({"authorized": False, "user": None})
-        scanner_state.scan_results.update({
-            "face_verified": False,
-            "barcode_verified": False,
-            "current_name": "Idle",
-            "badge_timeout_exceeded": False,
-        })
-    scanner_state._emit_socket()
+@socketio.on("toggle_scan")
+def handle_toggle_scan(data):
+    state = _kiosk_state(data)
+    if state is None:
+        return
+    face_first = bool(data.get("face_first", FACE_FIRST)) if isinstance(data, dict) else FACE_FIRST
+    state.toggle_scan(face_first)
+    state._emit_socket()
 
 @socketio.on("get_status")
-def handle_get_status(_):
-    scanner_state._emit_socket()
+def handle_get_status(data):
+    state = _kiosk_state(data)
+    if state is not None:
+        state._emit_socket()
 
 # --- Threads ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", action="append", default=[],
+                        help="kiosk=source, source is a device index, video file or RTSP URL (repeatable)")
+    args = parser.parse_args()
+
+    warm_student_cache()
+    load_face_engine()
     threading.Thread(target=_start_async_loop, args=(async_loop,), daemon=True).start()
-    threading.Thread(target=lambda: scanner_loop(debugwindow=False, debugroi=True), daemon=True).start()
+    start_kiosks(parse_sources(args.source) or None, debugwindow=False, debugroi=True)
     socketio.run(app, host="0.0.0.0", port=5000, allow_unsafe_werkzeug=True)
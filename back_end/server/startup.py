@@ -0,0 +1,45 @@
+# back_end/server/startup.py
+# Warm-up and metrics shared by the Flask (server_main) and asyncio (asgi_main) servers.
+from back_end.kiosks import all_states
+from back_end.scanner_worker import FACE_FIRST
+from back_end.Database.db import pool_stats
+from back_end.Database.student_cache import student_cache
+from back_end.Database.phones import slot_allocator
+from back_end.face_index import face_index
+from back_end.inference_service import inference_service
+from back_end.server.webrtc_handler import stream_stats
+
+
+def warm_student_cache():
+    try:
+        count = student_cache.warm()
+        print(f"[+] Student cache warmed with {count} students.")
+    except Exception as e:
+        print(f"[-] Student cache warm-up failed: {e}")
+    if FACE_FIRST:
+        try:
+            count = face_index.load_from_db()
+            print(f"[+] Face index loaded with {count} embeddings.")
+        except Exception as e:
+            print(f"[-] Face index load failed: {e}")
+
+
+def load_face_engine():
+    try:
+        inference_service.engine.load()
+        print("[+] Face engine ready.")
+        inference_service.start()
+    except Exception as e:
+        print(f"[-] Face engine warm-up failed: {e}")
+
+
+def metrics_snapshot():
+    return {
+        "face_engine": inference_service.engine.metrics(),
+        "inference": inference_service.stats(),
+        "student_cache": student_cache.stats(),
+        "db": pool_stats(),
+        "slots": slot_allocator.stats(),
+        "streams": stream_stats(),
+        "kiosks": {state.kiosk_id: state.pipeline_stats() for state in all_states()},
+    }
@@ -1,110 +1,208 @@
 # back_end/server/webrtc_handler.py
 import asyncio
-import numpy as np
+import time
 
 from flask import Blueprint, jsonify, request
 from aiortc import RTCPeerConnection, RTCSessionDescription, VideoStreamTrack
+from aiortc.contrib.media import MediaRelay
+from aiortc.mediastreams import MediaStreamError, VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
 from av import VideoFrame
 
 from back_end.scanner_state import scanner_state
 from back_end.embedding_gen import generate_embedding
+from back_end.embeddings import embed_to_base64
+from back_end.kiosks import get_state
+from back_end.stream_profiles import ProfileLadder, FrameScaler, placeholder_frame
 
 webrtc_bp = Blueprint("webrtc", __name__)
 
-# Separate sets for main and preview connections
-pcs_main = set()
-pcs_preview = set()
+# Separate pools for main and preview connections
+# pc -> kiosk_id, so one kiosk's connections can be cancelled without the others
+pcs_main = {}
+pcs_preview = {}
 
 # Dedicated async loop for aiortc + async tasks
 async_loop = asyncio.new_event_loop()
 
+# One MainVideoTrack per kiosk feeds every main-stream viewer through the relay,
+# so each captured frame is converted to a VideoFrame once, not once per viewer.
+SHARED_MAIN_TRACK = True
+_relay = MediaRelay()
+_main_sources = {}  # kiosk_id -> MainVideoTrack
+
+STATS_INTERVAL = 2.0  # seconds between congestion checks per viewer
+
 
 # ===========================================================
-# Utility: build a VideoFrame from ndarray or generate black frame
+# Utility: build a VideoFrame from ndarray or the black placeholder
 # ===========================================================
-def make_video_frame(frame, pts, time_base):
+def make_video_frame(frame, pts, time_base, fmt="bgr24"):
     if frame is None:
-        arr = np.zeros((480, 640, 3), dtype=np.uint8)
-        vf = VideoFrame.from_ndarray(arr, format="bgr24")
-    else:
-        vf = VideoFrame.from_ndarray(frame, format="bgr24")
+        frame, fmt = placeholder_frame(), "bgr24"
+    vf = VideoFrame.from_ndarray(frame, format=fmt)
 
     vf.pts = pts
     vf.time_base = time_base
     return vf
 
 
+class ProfiledVideoTrack(VideoStreamTrack):
+    """
+    Paces frames at the active profile's fps and downscales/converts each frame once
+    before it is handed to the encoder(s).
+    """
+
+    kind = "video"
+
+    def __init__(self, mode):
+        super().__init__()
+        self.ladder = ProfileLadder(mode)
+        self.scaler = FrameScaler()
+
+    async def next_timestamp(self):
+        if self.readyState != "live":
+            raise MediaStreamError
+
+        if hasattr(self, "_timestamp"):
+            self._timestamp += int(VIDEO_CLOCK_RATE / self.ladder.profile["fps"])
+            wait = self._start + (self._timestamp / VIDEO_CLOCK_RATE) - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        else:
+            self._start = time.time()
+            self._timestamp = 0
+        return self._timestamp, VIDEO_TIME_BASE
+
+    def encode_ready(self, frame, pts, time_base):
+        arr, fmt = self.scaler.scale(frame, self.ladder.profile)
+        return make_video_frame(arr, pts, time_base, fmt)
+
+    async def encode_latest(self, pts, time_base):
+        """
+        Scales and copies the reader's newest ring frame into a VideoFrame. The capture
+        thread can rewrite the slot while cv2 works on it; a torn result is thrown away
+        and the (by then newer) latest frame is used instead.
+        """
+        while True:
+            frame, _ = await self.reader.read_async()
+            video_frame = self.encode_ready(frame, pts, time_base)
+            if self.reader.valid():
+                return video_frame
+
+
 # ===========================================================
 # MAIN STREAM (ROI)
 # ===========================================================
-class MainVideoTrack(VideoStreamTrack):
-    kind = "video"
+class MainVideoTrack(ProfiledVideoTrack):
+    def __init__(self, state=scanner_state):
+        super().__init__("main")
+        self.state = state
+        self.reader = None
 
     async def recv(self):
         pts, time_base = await self.next_timestamp()
 
-        # Wait until a new frame is available
-        while not scanner_state._main_frame_event.wait(timeout=0.01):
-            await asyncio.sleep(0.001)
+        # main ring flips between annotated and raw with the debug ROI setting
+        ring = self.state.main_ring
+        if self.reader is None or self.reader.ring is not ring:
+            self.reader = ring.reader()
 
-        frame = scanner_state.get_frame()
-        scanner_state._main_frame_event.clear()
-        return make_video_frame(frame, pts, time_base)
+        # Woken by the capture thread as soon as a new frame is committed
+        return await self.encode_latest(pts, time_base)
 
 
 # ===========================================================
 # PREVIEW STREAM (RAW)
 # ===========================================================
-class PreviewVideoTrack(VideoStreamTrack):
-    kind = "video"
+class PreviewVideoTrack(ProfiledVideoTrack):
+    def __init__(self, state=scanner_state):
+        super().__init__("preview")
+        self.state = state
+        self.reader = state.raw_frames.reader()
 
     async def recv(self):
         # Stop immediately if preview is cancelled
-        if not scanner_state.preview_requested.is_set():
+        if not self.state.preview_requested.is_set():
             raise ConnectionError("Preview not active")
 
         # Stop immediately if photo was taken
-        if scanner_state.photo_taken_event.is_set():
+        if self.state.photo_taken_event.is_set():
             raise ConnectionError("Preview finished")
 
         pts, time_base = await self.next_timestamp()
+        return await self.encode_latest(pts, time_base)
 
-        while not scanner_state._preview_frame_event.wait(timeout=0.01):
-            await asyncio.sleep(0.001)
 
-        frame = scanner_state.get_rframe()
-        scanner_state._preview_frame_event.clear()
-        return make_video_frame(frame, pts, time_base)
+def main_track_for(state):
+    """(track to add to the peer connection, track whose ladder it follows)"""
+    if not SHARED_MAIN_TRACK:
+        track = MainVideoTrack(state)
+        return track, track
+    source = _main_sources.get(state.kiosk_id)
+    if source is None or source.readyState == "ended":
+        source = _main_sources[state.kiosk_id] = MainVideoTrack(state)
+    # unbuffered: a slow viewer gets the latest frame instead of a growing backlog
+    return _relay.subscribe(source, buffered=False), source
+
+
+# ===========================================================
+# CONGESTION FEEDBACK
+# ===========================================================
+async def _watch_congestion(pc, sender, ladder):
+    """Feeds the receiver reports of one viewer into its track's ladder."""
+    ladder.add(pc)
+    try:
+        while pc.connectionState not in ("closed", "failed"):
+            await asyncio.sleep(STATS_INTERVAL)
+            try:
+                report = await sender.getStats()
+            except Exception:
+                continue
+            for stats in report.values():
+                if stats.type != "remote-inbound-rtp":
+                    continue
+                if ladder.report(pc, stats.fractionLost, stats.roundTripTime):
+                    profile = ladder.profile
+                    print(f"[+] {ladder.mode} stream now {profile['width']}px @ {profile['fps']} fps")
+    finally:
+        ladder.remove(pc)
+
+
+def stream_stats():
+    """Active rung of each kiosk's shared main stream."""
+    return {kiosk_id: track.ladder.stats()
+            for kiosk_id, track in _main_sources.items() if track.readyState == "live"}
 
 
 # ===========================================================
 # WebRTC OFFER HANDLER
 # ===========================================================
-async def _handle_offer(offer_sdp, offer_type, mode):
+async def _handle_offer(offer_sdp, offer_type, mode, state=scanner_state):
     pc = RTCPeerConnection()
 
     # === Choose correct pool & track type ===
     if mode == "main":
-        pcs_main.add(pc)
-        video_track = MainVideoTrack()
+        pcs_main[pc] = state.kiosk_id
+        video_track, source = main_track_for(state)
     else:
-        pcs_preview.add(pc)
-        scanner_state.request_preview()
-        """if not scanner_state.preview_requested.is_set():
+        pcs_preview[pc] = state.kiosk_id
+        state.request_preview()
+        """if not state.preview_requested.is_set():
             raise RuntimeError("Preview not requested")"""
 
-        video_track = PreviewVideoTrack()
+        video_track = source = PreviewVideoTrack(state)
 
-    pc.addTrack(video_track)
+    sender = pc.addTrack(video_track)
+    asyncio.ensure_future(_watch_congestion(pc, sender, source.ladder))
 
     # Cleanup on disconnect
     @pc.on("connectionstatechange")
     async def on_state_change():
         if pc.connectionState in ("closed", "failed", "disconnected"):
             if mode == "main":
-                pcs_main.discard(pc)
+                pcs_main.pop(pc, None)
             else:
-                pcs_preview.discard(pc)
+                pcs_preview.pop(pc, None)
             await pc.close()
 
     # Set remote → create answer
@@ -125,23 +223,79 @@ async def _handle_offer(offer_sdp, offer_type, mode):
 
 
 # ===========================================================
-# HTTP ENDPOINTS
+# REQUEST HANDLERS (shared by the Flask routes and the asyncio server)
 # ===========================================================
-@webrtc_bp.route("/offer/<mode>", methods=["POST"])
-def offer(mode):
+async def offer_request(mode, data, kiosk_id=None):
     if mode not in ("main", "preview"):
-        return jsonify({"status": "error", "message": "Invalid mode"}), 400
+        return {"status": "error", "message": "Invalid mode"}, 400
 
-    data = request.get_json()
     if not data or "sdp" not in data or "type" not in data:
-        return jsonify({"status": "error", "message": "Invalid offer"}), 400
+        return {"status": "error", "message": "Invalid offer"}, 400
+
+    state = get_state(data.get("kiosk") or kiosk_id)
+    if state is None:
+        return {"status": "error", "message": "Unknown kiosk"}, 404
 
+    try:
+        return await _handle_offer(data["sdp"], data["type"], mode, state), 200
+    except Exception as e:
+        return {"status": "error", "message": str(e)}, 500
+
+
+async def take_photo_request(kiosk_id=None):
+    state = get_state(kiosk_id)
+    if state is None:
+        return {"status": "error", "message": "Unknown kiosk"}, 404
+
+    try:
+        state.mark_photo_taken()
+        embed = await generate_embedding(state)
+
+        if embed is None:
+            return {"status": "error", "message": "No face detected"}, 200
+
+        # opaque to the admin UI: it posts the string back as the student's embed
+        return {"status": "success", "embed": embed_to_base64(embed)}, 200
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}, 200
+
+    finally:
+        state.stop_preview()
+
+
+async def close_connections(mode, kiosk_id=None):
+    state = get_state(kiosk_id)
+    if state is None:
+        return {"status": "error", "message": "Unknown kiosk"}, 404
+
+    if mode == "main":
+        pool = pcs_main
+    else:
+        pool = pcs_preview
+        state.stop_preview()
+
+    pcs = [pc for pc, kiosk in pool.items() if kiosk == state.kiosk_id]
+    for pc in pcs:
+        pool.pop(pc, None)
+
+    for pc in pcs:
+        await pc.close()
+    return {"status": "success"}, 200
+
+
+# ===========================================================
+# HTTP ENDPOINTS
+# ===========================================================
+@webrtc_bp.route("/offer/<mode>", methods=["POST"])
+def offer(mode):
     try:
         future = asyncio.run_coroutine_threadsafe(
-            _handle_offer(data["sdp"], data["type"], mode),
+            offer_request(mode, request.get_json(silent=True), request.args.get("kiosk")),
             async_loop,
         )
-        return jsonify(future.result(timeout=10))
+        data, code = future.result(timeout=10)
+        return jsonify(data), code
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -153,35 +307,19 @@ def offer(mode):
 @webrtc_bp.route("/take_photo", methods=["POST"])
 def take_photo():
     try:
-        scanner_state.mark_photo_taken()
-
-        future = asyncio.run_coroutine_threadsafe(
-            generate_embedding(), async_loop
-        )
-        embed = future.result(timeout=10)
-
-        if embed is None:
-            return jsonify({"status": "error", "message": "No face detected"})
-
-        return jsonify({"status": "success", "embed": "{" + ",".join(str(x) for x in embed.tolist()) + "}"})
+        future = asyncio.run_coroutine_threadsafe(take_photo_request(request.args.get("kiosk")), async_loop)
+        data, code = future.result(timeout=10)
+        return jsonify(data), code
 
     except Exception as e:
+        state = get_state(request.args.get("kiosk"))
+        if state is not None:
+            state.stop_preview()
         return jsonify({"status": "error", "message": str(e)})
 
-    finally:
-        scanner_state.stop_preview()
-
 
 @webrtc_bp.route("/cancel/<mode>", methods=["POST"])
 def cancel_connection(mode):
-    if mode == "main":
-        pcs = pcs_main
-    else:
-        pcs = pcs_preview
-        scanner_state.stop_preview()
-
-    for pc in list(pcs):
-        asyncio.run_coroutine_threadsafe(pc.close(), async_loop)
-        pcs.discard(pc)
+    # closing happens on the aiortc loop; the client doesn't wait for it
+    asyncio.run_coroutine_threadsafe(close_connections(mode, request.args.get("kiosk")), async_loop)
     return jsonify({"status": "success"})
-
@@ -0,0 +1,61 @@
+# back_end/stage_metrics.py
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Wall-clock and (calling thread) CPU time for one pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.cpu_ms = 0.0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, ms, cpu_ms=0.0):
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            self.cpu_ms += cpu_ms
+            self.last_ms = ms
+            self.max_ms = max(self.max_ms, ms)
+
+    @contextmanager
+    def measure(self):
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.record((time.perf_counter() - start) * 1000, (time.thread_time() - cpu_start) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            avg = self.total_ms / self.count if self.count else 0.0
+            return {"count": self.count, "avg_ms": round(avg, 2), "last_ms": round(self.last_ms, 2),
+                    "max_ms": round(self.max_ms, 2), "cpu_ms": round(self.cpu_ms, 2)}
+
+
+class StageMetrics:
+    """Named StageTimers, created on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+
+    def __getitem__(self, name):
+        with self._lock:
+            timer = self._timers.get(name)
+            if timer is None:
+                timer = self._timers[name] = StageTimer()
+            return timer
+
+    def measure(self, name):
+        return self[name].measure()
+
+    def snapshot(self):
+        with self._lock:
+            timers = dict(self._timers)
+        return {name: timer.snapshot() for name, timer in timers.items()}
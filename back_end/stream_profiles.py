@@ -0,0 +1,130 @@
+# back_end/stream_profiles.py
+import cv2
+import numpy as np
+
+# Per-mode ladders, best first. Height follows the source aspect ratio.
+# "yuv420p" frames go to the encoder as-is, so the colour conversion happens once
+# here instead of once per viewer inside every encoder.
+STREAM_PROFILES = {
+    "main": [
+        {"width": 1280, "fps": 24, "format": "yuv420p"},
+        {"width": 960, "fps": 20, "format": "yuv420p"},
+        {"width": 640, "fps": 15, "format": "yuv420p"},
+        {"width": 480, "fps": 10, "format": "yuv420p"},
+    ],
+    "preview": [
+        {"width": 960, "fps": 30, "format": "yuv420p"},
+        {"width": 640, "fps": 20, "format": "yuv420p"},
+        {"width": 480, "fps": 15, "format": "yuv420p"},
+    ],
+}
+
+# Congestion thresholds on the receiver reports aiortc exposes through getStats()
+LOSS_STEP_DOWN = 0.05   # fraction of packets lost in the last report interval
+RTT_STEP_DOWN = 0.4     # seconds
+GOOD_REPORTS_UP = 5     # consecutive clean reports before trying the next rung up
+
+PLACEHOLDER_SIZE = (640, 480)  # shown until the first frame arrives
+
+
+class ProfileLadder:
+    """
+    Current rung of a mode's ladder. Each viewer is stepped down on loss/RTT and
+    back up after a run of clean reports; a track shared by several viewers follows
+    the most congested one.
+    """
+
+    def __init__(self, mode, profiles=None):
+        self.mode = mode
+        self.profiles = profiles or STREAM_PROFILES[mode]
+        self._levels = {}  # viewer -> rung index
+        self._clean = {}   # viewer -> consecutive clean reports
+        self.changes = 0
+
+    @property
+    def level(self):
+        return max(self._levels.values(), default=0)
+
+    @property
+    def profile(self):
+        return self.profiles[self.level]
+
+    def add(self, viewer):
+        self._levels.setdefault(viewer, 0)
+        self._clean.setdefault(viewer, 0)
+
+    def remove(self, viewer):
+        self._levels.pop(viewer, None)
+        self._clean.pop(viewer, None)
+
+    def report(self, viewer, fraction_lost=0.0, rtt=None):
+        """Feeds one receiver report; returns True if the shared rung changed."""
+        before = self.level
+        level = self._levels.get(viewer, 0)
+        if fraction_lost > LOSS_STEP_DOWN or (rtt is not None and rtt > RTT_STEP_DOWN):
+            level = min(level + 1, len(self.profiles) - 1)
+            self._clean[viewer] = 0
+        else:
+            self._clean[viewer] = self._clean.get(viewer, 0) + 1
+            if level > 0 and self._clean[viewer] >= GOOD_REPORTS_UP:
+                level -= 1
+                self._clean[viewer] = 0
+        self._levels[viewer] = level
+        if self.level != before:
+            self.changes += 1
+            return True
+        return False
+
+    def stats(self):
+        return {"mode": self.mode, "level": self.level, "viewers": len(self._levels),
+                "changes": self.changes, **self.profile}
+
+
+class FrameScaler:
+    """
+    The downscale stage: resizes a captured frame to the active profile and converts
+    it to the profile's pixel format, writing into buffers reused between frames.
+    """
+
+    def __init__(self):
+        self._scaled = None
+        self._converted = None
+
+    @staticmethod
+    def target_size(shape, width):
+        h, w = shape[:2]
+        if w <= width:
+            width, height = w, h
+        else:
+            height = int(round(h * width / w))
+        return width - width % 2, height - height % 2  # yuv420p needs even dimensions
+
+    def scale(self, frame, profile):
+        """Returns (array, format) ready for VideoFrame.from_ndarray."""
+        w, h = self.target_size(frame.shape, profile["width"])
+        if (w, h) != (frame.shape[1], frame.shape[0]):
+            if self._scaled is None or self._scaled.shape != (h, w, 3):
+                self._scaled = np.empty((h, w, 3), dtype=np.uint8)
+            cv2.resize(frame, (w, h), dst=self._scaled, interpolation=cv2.INTER_AREA)
+            frame = self._scaled
+
+        if profile.get("format", "bgr24") != "yuv420p":
+            return frame, "bgr24"
+        shape = (h * 3 // 2, w)
+        if self._converted is None or self._converted.shape != shape:
+            self._converted = np.empty(shape, dtype=np.uint8)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=self._converted)
+        return self._converted, "yuv420p"
+
+
+_placeholder = None
+
+
+def placeholder_frame():
+    """Black frame, allocated once."""
+    global _placeholder
+    if _placeholder is None:
+        w, h = PLACEHOLDER_SIZE
+        _placeholder = np.zeros((h, w, 3), dtype=np.uint8)
+        _placeholder.flags.writeable = False
+    return _placeholder
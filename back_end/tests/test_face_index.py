@@ -0,0 +1,54 @@
+# back_end/tests/test_face_index.py
+# IVF recall@1 against the exact FaceIndex on a seeded synthetic gallery (the same
+# setup as benchmarks/face_index_recall.py, small enough for the test run).
+#   python -m pytest back_end/tests
+import numpy as np
+from back_end.face_index import FaceIndex, IVFFaceIndex, IVF_MIN_TRAIN, IVF_RETRAIN_GROWTH
+
+DIM = 128
+QUERIES = 300
+NOISE = 0.06  # per-dimension noise, roughly a re-capture of the same face
+MIN_RECALL = 0.95
+
+
+def random_unit(shape, rng):
+    vecs = rng.standard_normal(shape).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=-1, keepdims=True)
+
+
+def noisy_queries(enrolled, rng):
+    picks = rng.integers(0, len(enrolled), QUERIES)
+    queries = enrolled[picks] + rng.normal(0, NOISE, (QUERIES, DIM)).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall_at_1(index, exact, queries):
+    return np.mean([index.search(q, k=1)[0][0] == exact.search(q, k=1)[0][0] for q in queries])
+
+
+def test_ivf_recall_at_1_matches_exact():
+    rng = np.random.default_rng(0)
+    enrolled = random_unit((2 * IVF_MIN_TRAIN, DIM), rng)
+    rows = [(f"E{i:05d}", enrolled[i]) for i in range(len(enrolled))]
+    exact, ivf = FaceIndex(), IVFFaceIndex()
+    exact.load(rows)
+    ivf.load(rows)
+    assert ivf._centroids is not None  # really the approximate path
+
+    assert recall_at_1(ivf, exact, noisy_queries(enrolled, rng)) >= MIN_RECALL
+
+
+def test_ivf_retrains_as_the_gallery_grows():
+    rng = np.random.default_rng(1)
+    total = int(IVF_MIN_TRAIN * IVF_RETRAIN_GROWTH) + 1
+    enrolled = random_unit((total, DIM), rng)
+    exact, ivf = FaceIndex(), IVFFaceIndex()
+    exact.load([(f"E{i:05d}", enrolled[i]) for i in range(total)])
+    ivf.load([(f"E{i:05d}", enrolled[i]) for i in range(IVF_MIN_TRAIN)])
+    lists = len(ivf._centroids)
+
+    for i in range(IVF_MIN_TRAIN, total):
+        ivf.upsert(f"E{i:05d}", enrolled[i])
+
+    assert len(ivf._centroids) > lists
+    assert recall_at_1(ivf, exact, noisy_queries(enrolled, rng)) >= MIN_RECALL
@@ -345,7 +345,7 @@ class _CreateStudentPageState extends State<CreateStudentPage> {
 
     if (result != null && result is String) {
       setState(() {
-        _embedding = result; // Returned embed string "{1.2,2.3,...}"
+        _embedding = result; // Returned embed string (base64 float32)
       });
     }
   }